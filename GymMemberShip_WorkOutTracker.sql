@@ -158,11 +158,15 @@ ALTER TABLE Equipment ADD CONSTRAINT chk_equip_qty  CHECK (Quantity >= 0);
 
 -- Helpful indexes for joins/lookups
 CREATE INDEX ix_member_package   ON Member(PackageId);
-CREATE INDEX ix_member_trainer   ON Member(TrainerId);
+-- (TrainerId, Name) also serves trainer-scoped name prefix search; Email/PhoneNo prefixes use their UNIQUE indexes
+CREATE INDEX ix_member_trainer   ON Member(TrainerId, Name);
+CREATE INDEX ix_member_name      ON Member(Name);
 CREATE INDEX ix_payment_member   ON Payment(MemberId);
 CREATE INDEX ix_payment_package  ON Payment(PackageId);
 CREATE INDEX ix_exercise_equipment ON Exercise(EquipmentId);
 -- Note: Attendance(MemberId) is automatically indexed as part of composite PK (MemberId, Date)
+-- Newest-first keyset pagination over attendance (Date, CheckInTime, MemberId)
+CREATE INDEX ix_attendance_recent ON Attendance(Date, CheckInTime, MemberId);
 
 
 -- Seed data: explicit IDs work with AUTO_INCREMENT (MySQL auto-adjusts counter)
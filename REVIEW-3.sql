@@ -10,8 +10,14 @@ USE GymMemberShip_WorkOutTracker;
 
 
 -- STEP 2 — CREATE AUDIT TABLE
+-- Range-partitioned by month on ActionTS (hot/cold split): p_old holds everything before
+-- partitioning started, pYYYYMM holds that month and p_future catches the rest.
+-- sp_extend_payment_audit_partitions() splits monthly partitions off p_future ahead of time;
+-- old months are archived to compressed files and dropped (flask archive-payment-audit).
+-- MySQL requires the partitioning column in every unique key, hence PK (AuditId, ActionTS).
+-- Member-scoped reads use the two member indexes instead of joining Payment.
 CREATE TABLE Payment_Audit (
-  AuditId      BIGINT PRIMARY KEY AUTO_INCREMENT,
+  AuditId      BIGINT AUTO_INCREMENT,
   PaymentId    INT,
   ActionType   ENUM('INSERT','UPDATE','DELETE'),
   OldAmount    DECIMAL(8,2),
@@ -24,9 +30,167 @@ CREATE TABLE Payment_Audit (
   NewMemberId  INT,
   OldPackageId INT,
   NewPackageId INT,
-  ActionTS     DATETIME DEFAULT CURRENT_TIMESTAMP
+  ActionTS     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (AuditId, ActionTS),
+  INDEX ix_pa_new_member (NewMemberId, AuditId),
+  INDEX ix_pa_old_member (OldMemberId, AuditId)
+)
+PARTITION BY RANGE COLUMNS (ActionTS) (
+  PARTITION p_old    VALUES LESS THAN ('2025-01-01'),
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
 );
 
+-- STEP 2b — MATERIALIZED MEMBERSHIP STATUS
+-- One row per member with at least one payment, maintained by the payment triggers below.
+-- EndDate is what fn_membership_end_date(MemberId) would return; LastPaymentId is the
+-- payment it was derived from. Rebuild with CALL sp_rebuild_membership_status().
+CREATE TABLE MembershipStatus (
+  MemberId      INT PRIMARY KEY,
+  EndDate       DATE NOT NULL,
+  LastPaymentId INT NOT NULL,
+  UpdatedAt     DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  CONSTRAINT fk_ms_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE,
+  INDEX ix_ms_end_date (EndDate)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- STEP 2c — ATTENDANCE ROLLUPS
+-- Pre-aggregated attendance so analytics never scan Attendance. Maintained row by row by the
+-- attendance triggers below (through sp_apply_attendance_rollup); rebuild with
+-- CALL sp_rebuild_attendance_rollups().
+-- One row per (day, hour): CheckIns started in that hour, Present = visits in the gym at
+-- some point during that hour, TimedVisits/TotalMinutes = check-ins with a check-out and
+-- their summed duration (credited to the check-in hour).
+CREATE TABLE Attendance_HourlyRollup (
+  BucketDate   DATE NOT NULL,
+  BucketHour   TINYINT NOT NULL,
+  CheckIns     INT NOT NULL DEFAULT 0,
+  Present      INT NOT NULL DEFAULT 0,
+  TimedVisits  INT NOT NULL DEFAULT 0,
+  TotalMinutes BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (BucketDate, BucketHour)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- One row per (day, trainer): visits by that trainer's members. Attendance is one row per
+-- member per day, so Visits is also the number of distinct clients seen that day.
+-- Visits are credited to the member's current trainer: trg_member_trainer_rollup moves a
+-- member's history when their TrainerId changes, so this matches a rebuild.
+CREATE TABLE Attendance_TrainerDaily (
+  BucketDate   DATE NOT NULL,
+  TrainerId    INT NOT NULL,
+  Visits       INT NOT NULL DEFAULT 0,
+  TimedVisits  INT NOT NULL DEFAULT 0,
+  TotalMinutes BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (BucketDate, TrainerId),
+  INDEX ix_atd_trainer (TrainerId, BucketDate),
+  CONSTRAINT fk_atd_trainer FOREIGN KEY (TrainerId) REFERENCES Trainer(TrainerId)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- STEP 2d — MEMBERSHIP EXPIRY (written by the nightly batch, read by the pages)
+-- Members whose membership ends within the next HorizonDays or lapsed in the last LapsedDays,
+-- as of the latest run. Replaced as a whole by CALL sp_compute_membership_expiry(...).
+CREATE TABLE MembershipExpiry (
+  MemberId   INT PRIMARY KEY,
+  EndDate    DATE NOT NULL,
+  DaysLeft   INT NOT NULL,   -- negative once expired
+  Status     ENUM('Expiring','Expired') NOT NULL,
+  CONSTRAINT fk_me_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE,
+  INDEX ix_me_status (Status, EndDate)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- One row per batch run; the latest row tells the pages how fresh MembershipExpiry is
+CREATE TABLE MembershipExpiryRun (
+  RunId       INT PRIMARY KEY AUTO_INCREMENT,
+  AsOf        DATE NOT NULL,
+  HorizonDays INT NOT NULL,
+  LapsedDays  INT NOT NULL,
+  Expiring    INT NOT NULL,
+  Expired     INT NOT NULL,
+  FinishedAt  DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+
+-- STEP 2e — WORKOUT LOG
+-- Weekly session target per plan, used for adherence (a member's target is the highest
+-- target among their plans)
+ALTER TABLE WorkOutPlan
+  ADD COLUMN SessionsPerWeek TINYINT NOT NULL DEFAULT 3,
+  ADD CONSTRAINT chk_plan_sessions CHECK (SessionsPerWeek BETWEEN 1 AND 7);
+
+-- One row per logged set. Append-only: the AUTO_INCREMENT clustered key makes every insert
+-- land on the right edge of the B-tree, uq_ws_set rejects re-submitted sets and serves
+-- per-member reads. Rows are never updated (trg_workout_set_no_update); corrections are a
+-- delete plus a new set. Progress pages read only the aggregate tables below.
+CREATE TABLE WorkoutSet (
+  SetId       BIGINT PRIMARY KEY AUTO_INCREMENT,
+  MemberId    INT NOT NULL,
+  SessionDate DATE NOT NULL,
+  ExerciseId  INT NOT NULL,
+  SetNo       SMALLINT NOT NULL,
+  Reps        SMALLINT NOT NULL,
+  WeightKg    DECIMAL(6,2) NOT NULL DEFAULT 0,
+  LoggedAt    DATETIME DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE KEY uq_ws_set (MemberId, SessionDate, ExerciseId, SetNo),
+  CONSTRAINT chk_ws_set CHECK (SetNo > 0),
+  CONSTRAINT chk_ws_reps CHECK (Reps > 0),
+  CONSTRAINT chk_ws_weight CHECK (WeightKg >= 0),
+  CONSTRAINT fk_ws_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT fk_ws_exercise FOREIGN KEY (ExerciseId) REFERENCES Exercise(ExerciseId)
+    ON UPDATE CASCADE ON DELETE RESTRICT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- The aggregates below are maintained set by set by the WorkoutSet triggers (through
+-- sp_apply_workout_set); rebuild with CALL sp_rebuild_workout_aggregates().
+-- One row per member per training day
+CREATE TABLE WorkoutSession (
+  MemberId    INT NOT NULL,
+  SessionDate DATE NOT NULL,
+  Sets        INT NOT NULL DEFAULT 0,
+  Reps        INT NOT NULL DEFAULT 0,
+  VolumeKg    DECIMAL(12,2) NOT NULL DEFAULT 0,   -- sum of Reps x WeightKg
+  PRIMARY KEY (MemberId, SessionDate),
+  CONSTRAINT fk_wss_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- One row per member per ISO week (WeekStart = Monday). TargetSessions is the member's plan
+-- target when the week's first set was logged, so past adherence does not shift with plan changes.
+CREATE TABLE WorkoutWeeklyVolume (
+  MemberId       INT NOT NULL,
+  WeekStart      DATE NOT NULL,
+  Sessions       INT NOT NULL DEFAULT 0,
+  Sets           INT NOT NULL DEFAULT 0,
+  Reps           INT NOT NULL DEFAULT 0,
+  VolumeKg       DECIMAL(12,2) NOT NULL DEFAULT 0,
+  TargetSessions TINYINT NOT NULL DEFAULT 0,          -- 0 = no plan
+  PRIMARY KEY (MemberId, WeekStart),
+  CONSTRAINT fk_wwv_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Per member and exercise: heaviest set (ties: more reps, then earliest), best estimated
+-- one-rep max (fn_estimated_1rm) and most reps in a set, each with the day it was first reached
+CREATE TABLE WorkoutPersonalRecord (
+  MemberId      INT NOT NULL,
+  ExerciseId    INT NOT NULL,
+  MaxWeightKg   DECIMAL(6,2) NOT NULL,
+  MaxWeightReps SMALLINT NOT NULL,
+  MaxWeightDate DATE NOT NULL,
+  BestE1RM      DECIMAL(7,2) NOT NULL,
+  BestE1RMDate  DATE NOT NULL,
+  MaxReps       SMALLINT NOT NULL,
+  MaxRepsDate   DATE NOT NULL,
+  PRIMARY KEY (MemberId, ExerciseId),
+  CONSTRAINT fk_wpr_member FOREIGN KEY (MemberId) REFERENCES Member(MemberId)
+    ON UPDATE CASCADE ON DELETE CASCADE,
+  CONSTRAINT fk_wpr_exercise FOREIGN KEY (ExerciseId) REFERENCES Exercise(ExerciseId)
+    ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 
 -- STEP 3 — TRIGGERS
 -- 3.1 Attendance triggers (validate times on INSERT and UPDATE)
@@ -83,6 +247,7 @@ FOR EACH ROW
 BEGIN
   INSERT INTO Payment_Audit(PaymentId,ActionType,NewAmount,NewMode,NewMemberId,NewPackageId)
   VALUES(NEW.PaymentId,'INSERT',NEW.Amount,NEW.Mode,NEW.MemberId,NEW.PackageId);
+  CALL sp_refresh_membership_status(NEW.MemberId);
 END//
 DELIMITER ;
 
@@ -128,6 +293,10 @@ BEGIN
     OLD.MemberId,NEW.MemberId,
     OLD.PackageId,NEW.PackageId
   );
+  CALL sp_refresh_membership_status(NEW.MemberId);
+  IF NOT (OLD.MemberId <=> NEW.MemberId) THEN
+    CALL sp_refresh_membership_status(OLD.MemberId);
+  END IF;
 END//
 DELIMITER ;
 
@@ -145,9 +314,95 @@ BEGIN
     OLD.PaymentId,'DELETE',
     OLD.Amount,OLD.Mode,OLD.TimeStamp,OLD.MemberId,OLD.PackageId
   );
+  CALL sp_refresh_membership_status(OLD.MemberId);
+END//
+DELIMITER ;
+
+-- 3.7 Package duration change re-derives end dates that were based on that package
+DELIMITER //
+CREATE TRIGGER trg_package_duration_upd
+AFTER UPDATE ON Package
+FOR EACH ROW
+BEGIN
+  IF NEW.DurationWeeks <> OLD.DurationWeeks THEN
+    UPDATE MembershipStatus MS
+    JOIN Payment P ON MS.LastPaymentId = P.PaymentId
+    SET MS.EndDate = DATE_ADD(DATE(P.TimeStamp), INTERVAL NEW.DurationWeeks WEEK)
+    WHERE P.PackageId = NEW.PackageId;
+  END IF;
+END//
+DELIMITER ;
+
+
+-- 3.8 Attendance rollup maintenance (after the row is written, so rejected rows never count)
+DELIMITER //
+CREATE TRIGGER trg_attendance_rollup_ins
+AFTER INSERT ON Attendance
+FOR EACH ROW
+BEGIN
+  CALL sp_apply_attendance_rollup(NEW.MemberId, NEW.Date, NEW.CheckInTime, NEW.CheckOutTime, 1);
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_attendance_rollup_upd
+AFTER UPDATE ON Attendance
+FOR EACH ROW
+BEGIN
+  CALL sp_apply_attendance_rollup(OLD.MemberId, OLD.Date, OLD.CheckInTime, OLD.CheckOutTime, -1);
+  CALL sp_apply_attendance_rollup(NEW.MemberId, NEW.Date, NEW.CheckInTime, NEW.CheckOutTime, 1);
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_attendance_rollup_del
+AFTER DELETE ON Attendance
+FOR EACH ROW
+BEGIN
+  CALL sp_apply_attendance_rollup(OLD.MemberId, OLD.Date, OLD.CheckInTime, OLD.CheckOutTime, -1);
+END//
+DELIMITER ;
+
+-- A trainer change moves the member's past visits to the new trainer, so later edits and
+-- deletes (which subtract from the current trainer) find them there
+DELIMITER //
+CREATE TRIGGER trg_member_trainer_rollup
+AFTER UPDATE ON Member
+FOR EACH ROW
+BEGIN
+  IF NOT (OLD.TrainerId <=> NEW.TrainerId) THEN
+    CALL sp_move_attendance_rollup(NEW.MemberId, OLD.TrainerId, NEW.TrainerId);
+  END IF;
+END//
+DELIMITER ;
+
+-- 3.9 Workout log: aggregate maintenance and append-only guard
+DELIMITER //
+CREATE TRIGGER trg_workout_set_ins
+AFTER INSERT ON WorkoutSet
+FOR EACH ROW
+BEGIN
+  CALL sp_apply_workout_set(NEW.MemberId, NEW.SessionDate, NEW.ExerciseId, NEW.Reps, NEW.WeightKg, 1);
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE TRIGGER trg_workout_set_no_update
+BEFORE UPDATE ON WorkoutSet
+FOR EACH ROW
+BEGIN
+  SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT='Workout sets are append-only; delete the set and log it again';
 END//
 DELIMITER ;
 
+DELIMITER //
+CREATE TRIGGER trg_workout_set_del
+AFTER DELETE ON WorkoutSet
+FOR EACH ROW
+BEGIN
+  CALL sp_apply_workout_set(OLD.MemberId, OLD.SessionDate, OLD.ExerciseId, OLD.Reps, OLD.WeightKg, -1);
+END//
+DELIMITER ;
 
 -- STEP 4 — STORED PROCEDURES
 -- 4.1 Authentication helpers
@@ -172,6 +427,35 @@ BEGIN
 END//
 DELIMITER ;
 
+-- Login in one round trip: every account using this email as (Role, UserId, Name, Password).
+-- Each branch is a lookup on the table's UNIQUE Email key; the app tries admin, member, trainer.
+DELIMITER //
+CREATE PROCEDURE sp_get_identity_by_email(IN p_email VARCHAR(150))
+BEGIN
+  SELECT 'admin' AS Role, AdminId AS UserId, Name, Password FROM Admin WHERE Email = p_email
+  UNION ALL
+  SELECT 'member', MemberId, Name, Password FROM Member WHERE Email = p_email
+  UNION ALL
+  SELECT 'trainer', TrainerId, TrainerName, Password FROM Trainer WHERE Email = p_email;
+END//
+DELIMITER ;
+
+-- Store a rehashed password after a successful login (plaintext or an outdated hash cost).
+-- Only replaces p_old, so a password changed in the meantime is never overwritten.
+DELIMITER //
+CREATE PROCEDURE sp_set_password_hash(IN p_role VARCHAR(10), IN p_id INT, IN p_old VARCHAR(255), IN p_hash VARCHAR(255))
+BEGIN
+  CASE p_role
+    WHEN 'admin' THEN
+      UPDATE Admin SET Password = p_hash WHERE AdminId = p_id AND Password = p_old COLLATE utf8mb4_bin;
+    WHEN 'member' THEN
+      UPDATE Member SET Password = p_hash WHERE MemberId = p_id AND Password = p_old COLLATE utf8mb4_bin;
+    WHEN 'trainer' THEN
+      UPDATE Trainer SET Password = p_hash WHERE TrainerId = p_id AND Password = p_old COLLATE utf8mb4_bin;
+  END CASE;
+END//
+DELIMITER ;
+
 -- 4.2 Reference data lookups
 DELIMITER //
 CREATE PROCEDURE sp_list_packages()
@@ -228,6 +512,49 @@ BEGIN
 END//
 DELIMITER ;
 
+-- Typeahead search: top p_limit members whose name, email or phone starts with p_term.
+-- Each branch is an index range scan (ix_member_name / ix_member_trainer, uq_member_email,
+-- uq_member_phone); name matches rank first. LIKE wildcards in p_term are matched literally.
+DELIMITER //
+CREATE PROCEDURE sp_search_members(IN p_term VARCHAR(150), IN p_trainer INT, IN p_limit INT)
+BEGIN
+  DECLARE v_prefix VARCHAR(320) DEFAULT CONCAT(
+    REPLACE(REPLACE(REPLACE(p_term, '\\', '\\\\'), '%', '\\%'), '_', '\\_'), '%');
+
+  IF p_trainer IS NULL THEN
+    SELECT MemberId, Name, Email, PhoneNo
+    FROM (
+      (SELECT MemberId, Name, Email, PhoneNo, 1 AS MatchRank FROM Member
+       WHERE Name LIKE v_prefix ORDER BY Name LIMIT p_limit)
+      UNION ALL
+      (SELECT MemberId, Name, Email, PhoneNo, 2 AS MatchRank FROM Member
+       WHERE Email LIKE v_prefix ORDER BY Email LIMIT p_limit)
+      UNION ALL
+      (SELECT MemberId, Name, Email, PhoneNo, 3 AS MatchRank FROM Member
+       WHERE PhoneNo LIKE v_prefix ORDER BY PhoneNo LIMIT p_limit)
+    ) hits
+    GROUP BY MemberId, Name, Email, PhoneNo
+    ORDER BY MIN(MatchRank), Name, MemberId
+    LIMIT p_limit;
+  ELSE
+    SELECT MemberId, Name, Email, PhoneNo
+    FROM (
+      (SELECT MemberId, Name, Email, PhoneNo, 1 AS MatchRank FROM Member
+       WHERE TrainerId = p_trainer AND Name LIKE v_prefix ORDER BY Name LIMIT p_limit)
+      UNION ALL
+      (SELECT MemberId, Name, Email, PhoneNo, 2 AS MatchRank FROM Member
+       WHERE TrainerId = p_trainer AND Email LIKE v_prefix ORDER BY Email LIMIT p_limit)
+      UNION ALL
+      (SELECT MemberId, Name, Email, PhoneNo, 3 AS MatchRank FROM Member
+       WHERE TrainerId = p_trainer AND PhoneNo LIKE v_prefix ORDER BY PhoneNo LIMIT p_limit)
+    ) hits
+    GROUP BY MemberId, Name, Email, PhoneNo
+    ORDER BY MIN(MatchRank), Name, MemberId
+    LIMIT p_limit;
+  END IF;
+END//
+DELIMITER ;
+
 DELIMITER //
 CREATE PROCEDURE sp_get_package_price(IN p_package INT)
 BEGIN
@@ -237,23 +564,39 @@ BEGIN
 END//
 DELIMITER ;
 
+-- Keyset page of the audit log, newest first. p_cursor NULL = first page;
+-- p_backward = 1 returns the rows newer than p_cursor (nearest first) for a "previous" link
 DELIMITER //
-CREATE PROCEDURE sp_get_payment_audit_all()
+CREATE PROCEDURE sp_get_payment_audit_all(IN p_cursor BIGINT, IN p_backward TINYINT, IN p_limit INT)
 BEGIN
-  SELECT *
-  FROM Payment_Audit
-  ORDER BY AuditId DESC;
+  IF p_cursor IS NULL THEN
+    SELECT * FROM Payment_Audit
+    ORDER BY AuditId DESC
+    LIMIT p_limit;
+  ELSEIF p_backward = 1 THEN
+    SELECT * FROM Payment_Audit
+    WHERE AuditId > p_cursor
+    ORDER BY AuditId ASC
+    LIMIT p_limit;
+  ELSE
+    SELECT * FROM Payment_Audit
+    WHERE AuditId < p_cursor
+    ORDER BY AuditId DESC
+    LIMIT p_limit;
+  END IF;
 END//
 DELIMITER ;
 
+-- Every audit row that names the member on either side of the change, newest first.
+-- Each branch is a ref lookup on ix_pa_new_member / ix_pa_old_member (no Payment join,
+-- so deleted payments stay visible); UNION drops the rows that match both.
 DELIMITER //
 CREATE PROCEDURE sp_get_payment_audit_for_member(IN p_member INT)
 BEGIN
-  SELECT PA.*
-  FROM Payment_Audit PA
-  JOIN Payment P ON PA.PaymentId = P.PaymentId
-  WHERE P.MemberId = p_member
-  ORDER BY PA.AuditId DESC;
+  SELECT PA.* FROM Payment_Audit PA WHERE PA.NewMemberId = p_member
+  UNION
+  SELECT PA.* FROM Payment_Audit PA WHERE PA.OldMemberId = p_member
+  ORDER BY AuditId DESC;
 END//
 DELIMITER ;
 
@@ -283,26 +626,49 @@ END//
 DELIMITER ;
 
 -- 4.3 Member CRUD
+-- Keyset page ordered by MemberId. p_cursor NULL = first page;
+-- p_backward = 1 returns the members before p_cursor (nearest first)
 DELIMITER //
-CREATE PROCEDURE sp_get_members()
+CREATE PROCEDURE sp_get_members(IN p_cursor INT, IN p_backward TINYINT, IN p_limit INT)
 BEGIN
-  SELECT M.MemberId,
-         M.Name,
-         M.Email,
-         M.PhoneNo,
-         M.Password,
-         M.Address,
-         M.DoB,
-         M.JoinDate,
-         M.Gender,
-         M.PackageId,
-         M.TrainerId,
-         P.PackageName,
-         T.TrainerName
-  FROM Member M
-  LEFT JOIN Package P ON M.PackageId = P.PackageId
-  LEFT JOIN Trainer T ON M.TrainerId = T.TrainerId
-  ORDER BY M.MemberId;
+  DECLARE v_after INT DEFAULT IFNULL(p_cursor, 0);
+  IF p_backward = 1 THEN
+    SELECT M.MemberId,
+           M.Name,
+           M.Email,
+           M.PhoneNo,
+           M.DoB,
+           M.JoinDate,
+           M.Gender,
+           M.PackageId,
+           M.TrainerId,
+           P.PackageName,
+           T.TrainerName
+    FROM Member M
+    LEFT JOIN Package P ON M.PackageId = P.PackageId
+    LEFT JOIN Trainer T ON M.TrainerId = T.TrainerId
+    WHERE M.MemberId < p_cursor
+    ORDER BY M.MemberId DESC
+    LIMIT p_limit;
+  ELSE
+    SELECT M.MemberId,
+           M.Name,
+           M.Email,
+           M.PhoneNo,
+           M.DoB,
+           M.JoinDate,
+           M.Gender,
+           M.PackageId,
+           M.TrainerId,
+           P.PackageName,
+           T.TrainerName
+    FROM Member M
+    LEFT JOIN Package P ON M.PackageId = P.PackageId
+    LEFT JOIN Trainer T ON M.TrainerId = T.TrainerId
+    WHERE M.MemberId > v_after
+    ORDER BY M.MemberId
+    LIMIT p_limit;
+  END IF;
 END//
 DELIMITER ;
 
@@ -313,7 +679,6 @@ BEGIN
          M.Name,
          M.Email,
          M.PhoneNo,
-         M.Password,
          M.Address,
          M.DoB,
          M.JoinDate,
@@ -415,6 +780,8 @@ BEGIN
   
   -- Delete payment records (audit trail in Payment_Audit will remain)
   DELETE FROM Payment WHERE MemberId = p_member;
+
+  -- The workout log and its aggregates go with the member (ON DELETE CASCADE)
   
   -- Now delete the member
   DELETE FROM Member WHERE MemberId = p_member;
@@ -496,15 +863,71 @@ BEGIN
 END//
 DELIMITER ;
 
--- 4.5 Membership insights
+-- 4.4b Batched loaders (one round trip per page instead of one per member)
+-- One row per member/plan pair; members without plans appear once with NULL plan columns
+DELIMITER //
+CREATE PROCEDURE sp_get_trainer_members_with_plans(IN p_trainer INT)
+BEGIN
+  SELECT M.MemberId,
+         M.Name,
+         M.Email,
+         M.PhoneNo,
+         M.Address,
+         M.DoB,
+         M.Gender,
+         M.JoinDate,
+         P.PackageName,
+         P.Price,
+         WP.PlanId,
+         WP.Goal,
+         WP.DurationWeeks
+  FROM Member M
+  LEFT JOIN Package P ON M.PackageId = P.PackageId
+  LEFT JOIN Member_WorkOutPlan MWP ON MWP.MemberId = M.MemberId
+  LEFT JOIN WorkOutPlan WP ON MWP.PlanId = WP.PlanId
+  WHERE M.TrainerId = p_trainer
+  ORDER BY M.Name, M.MemberId, WP.Goal;
+END//
+DELIMITER ;
+
+-- Member's own trainer plus every assigned plan (with the plan author's name)
+DELIMITER //
+CREATE PROCEDURE sp_get_member_trainer_and_plans(IN p_member INT)
+BEGIN
+  SELECT M.MemberId,
+         T.TrainerId,
+         T.TrainerName,
+         T.Email,
+         T.PhoneNo,
+         T.DoB,
+         WP.PlanId,
+         WP.Goal,
+         WP.DurationWeeks,
+         WP.TrainerId AS PlanTrainerId,
+         PT.TrainerName AS PlanTrainerName
+  FROM Member M
+  LEFT JOIN Trainer T ON M.TrainerId = T.TrainerId
+  LEFT JOIN Member_WorkOutPlan MWP ON MWP.MemberId = M.MemberId
+  LEFT JOIN WorkOutPlan WP ON MWP.PlanId = WP.PlanId
+  LEFT JOIN Trainer PT ON WP.TrainerId = PT.TrainerId
+  WHERE M.MemberId = p_member
+  ORDER BY WP.Goal;
+END//
+DELIMITER ;
+
+-- 4.5 Membership insights (read the materialized MembershipStatus table)
 DELIMITER //
 CREATE PROCEDURE sp_get_membership_end_dates()
 BEGIN
   SELECT M.MemberId,
          M.Name,
          M.Email,
-         fn_membership_end_date(M.MemberId) AS EndDate
+         MS.EndDate,
+         CASE WHEN MS.EndDate IS NULL THEN 'No Membership'
+              WHEN MS.EndDate >= CURDATE() THEN 'Active'
+              ELSE 'Expired' END AS Status
   FROM Member M
+  LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId
   ORDER BY M.Name;
 END//
 DELIMITER ;
@@ -515,8 +938,12 @@ BEGIN
   SELECT M.MemberId,
          M.Name,
          M.Email,
-         fn_membership_end_date(M.MemberId) AS EndDate
+         MS.EndDate,
+         CASE WHEN MS.EndDate IS NULL THEN 'No Membership'
+              WHEN MS.EndDate >= CURDATE() THEN 'Active'
+              ELSE 'Expired' END AS Status
   FROM Member M
+  LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId
   WHERE M.MemberId = p_member;
 END//
 DELIMITER ;
@@ -527,9 +954,10 @@ BEGIN
   SELECT M.MemberId,
          M.Name,
          M.Email,
-         fn_is_member_active(M.MemberId) AS IsActive,
-         fn_membership_end_date(M.MemberId) AS EndDate
+         (MS.EndDate IS NOT NULL AND MS.EndDate >= CURDATE()) AS IsActive,
+         MS.EndDate
   FROM Member M
+  LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId
   ORDER BY M.Name;
 END//
 DELIMITER ;
@@ -540,130 +968,1331 @@ BEGIN
   SELECT M.MemberId,
          M.Name,
          M.Email,
-         fn_is_member_active(M.MemberId) AS IsActive,
-         fn_membership_end_date(M.MemberId) AS EndDate
+         (MS.EndDate IS NOT NULL AND MS.EndDate >= CURDATE()) AS IsActive,
+         MS.EndDate
   FROM Member M
+  LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId
   WHERE M.TrainerId = p_trainer
   ORDER BY M.Name;
 END//
 DELIMITER ;
 
--- 4.6 Attendance queries (Weak Entity: PK is (MemberId, Date))
+-- 4.5b Membership expiry batch (flask --app app membership-expiry)
+-- One set-based pass: a range scan on ix_ms_end_date picks every membership ending in
+-- [p_as_of - p_lapsed, p_as_of + p_horizon] and replaces MembershipExpiry in one transaction.
 DELIMITER //
-CREATE PROCEDURE sp_get_attendance_all()
+CREATE PROCEDURE sp_compute_membership_expiry(IN p_as_of DATE, IN p_horizon INT, IN p_lapsed INT)
 BEGIN
-  SELECT A.MemberId,
-         M.Name AS MemberName,
-         A.Date,
-         A.CheckInTime,
-         A.CheckOutTime,
-         TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
-  FROM Attendance A
-  JOIN Member M ON A.MemberId = M.MemberId
-  ORDER BY A.Date DESC, A.CheckInTime DESC
-  LIMIT 100;
+  DECLARE v_as_of DATE DEFAULT IFNULL(p_as_of, CURDATE());
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  DELETE FROM MembershipExpiry;
+  INSERT INTO MembershipExpiry(MemberId, EndDate, DaysLeft, Status)
+  SELECT MS.MemberId,
+         MS.EndDate,
+         DATEDIFF(MS.EndDate, v_as_of),
+         IF(MS.EndDate < v_as_of, 'Expired', 'Expiring')
+  FROM MembershipStatus MS
+  WHERE MS.EndDate >= DATE_SUB(v_as_of, INTERVAL p_lapsed DAY)
+    AND MS.EndDate <= DATE_ADD(v_as_of, INTERVAL p_horizon DAY);
+  INSERT INTO MembershipExpiryRun(AsOf, HorizonDays, LapsedDays, Expiring, Expired)
+  SELECT v_as_of, p_horizon, p_lapsed,
+         COALESCE(SUM(Status = 'Expiring'), 0),
+         COALESCE(SUM(Status = 'Expired'), 0)
+  FROM MembershipExpiry;
+  COMMIT;
+  SELECT * FROM MembershipExpiryRun ORDER BY RunId DESC LIMIT 1;
 END//
 DELIMITER ;
 
+-- Latest batch results, soonest first (all members if p_trainer is NULL)
 DELIMITER //
-CREATE PROCEDURE sp_get_attendance_for_trainer(IN p_trainer INT)
+CREATE PROCEDURE sp_get_membership_expiry(IN p_trainer INT)
 BEGIN
-  SELECT A.MemberId,
-         M.Name AS MemberName,
-         A.Date,
-         A.CheckInTime,
-         A.CheckOutTime,
-         TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
-  FROM Attendance A
-  JOIN Member M ON A.MemberId = M.MemberId
-  WHERE M.TrainerId = p_trainer
-  ORDER BY A.Date DESC, A.CheckInTime DESC
-  LIMIT 100;
+  IF p_trainer IS NULL THEN
+    SELECT E.MemberId, M.Name, M.Email, M.PhoneNo, E.EndDate, E.DaysLeft, E.Status
+    FROM MembershipExpiry E
+    JOIN Member M ON M.MemberId = E.MemberId
+    ORDER BY E.EndDate, M.Name;
+  ELSE
+    SELECT E.MemberId, M.Name, M.Email, M.PhoneNo, E.EndDate, E.DaysLeft, E.Status
+    FROM MembershipExpiry E
+    JOIN Member M ON M.MemberId = E.MemberId
+    WHERE M.TrainerId = p_trainer
+    ORDER BY E.EndDate, M.Name;
+  END IF;
 END//
 DELIMITER ;
 
--- 4.7 Business actions (existing)
 DELIMITER //
-CREATE PROCEDURE sp_enroll_member_to_plan(IN p_member INT, IN p_plan INT)
+CREATE PROCEDURE sp_get_membership_expiry_run()
 BEGIN
-  DECLARE EXIT HANDLER FOR SQLEXCEPTION
-  BEGIN
-    ROLLBACK;
-    RESIGNAL;
-  END;
-  
-  START TRANSACTION;
-  IF NOT EXISTS(SELECT 1 FROM Member_WorkOutPlan WHERE MemberId=p_member AND PlanId=p_plan) THEN
-    INSERT INTO Member_WorkOutPlan(MemberId,PlanId) VALUES(p_member,p_plan);
+  SELECT * FROM MembershipExpiryRun ORDER BY RunId DESC LIMIT 1;
+END//
+DELIMITER ;
+
+-- Recompute one member's status row from their latest payment (called by payment triggers;
+-- no transaction control here so it runs inside the triggering statement)
+DELIMITER //
+CREATE PROCEDURE sp_refresh_membership_status(IN p_member INT)
+BEGIN
+  DECLARE v_payment INT DEFAULT NULL;
+  DECLARE v_end DATE DEFAULT NULL;
+
+  SELECT p.PaymentId, DATE_ADD(DATE(p.TimeStamp), INTERVAL pkg.DurationWeeks WEEK)
+  INTO v_payment, v_end
+  FROM Payment p JOIN Package pkg ON p.PackageId = pkg.PackageId
+  WHERE p.MemberId = p_member
+  ORDER BY p.TimeStamp DESC, p.PaymentId DESC
+  LIMIT 1;
+
+  IF v_payment IS NULL OR v_end IS NULL THEN
+    DELETE FROM MembershipStatus WHERE MemberId = p_member;
+  ELSE
+    INSERT INTO MembershipStatus(MemberId, EndDate, LastPaymentId)
+    VALUES(p_member, v_end, v_payment)
+    ON DUPLICATE KEY UPDATE EndDate = VALUES(EndDate), LastPaymentId = VALUES(LastPaymentId);
   END IF;
-  COMMIT;
 END//
 DELIMITER ;
 
+-- Set-based backfill of MembershipStatus from Payment (after bulk loads or to repair drift)
 DELIMITER //
-CREATE PROCEDURE sp_record_attendance(
-  IN p_member INT, IN p_date DATE,
-  IN p_in TIME, IN p_out TIME)
+CREATE PROCEDURE sp_rebuild_membership_status()
 BEGIN
   DECLARE EXIT HANDLER FOR SQLEXCEPTION
   BEGIN
     ROLLBACK;
     RESIGNAL;
   END;
-  
+
   START TRANSACTION;
-  INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
-  VALUES(p_member, p_date, p_in, p_out);
+  DELETE FROM MembershipStatus;
+  INSERT INTO MembershipStatus(MemberId, EndDate, LastPaymentId)
+  SELECT latest.MemberId, latest.EndDate, latest.PaymentId
+  FROM (
+    SELECT p.MemberId,
+           p.PaymentId,
+           DATE_ADD(DATE(p.TimeStamp), INTERVAL pkg.DurationWeeks WEEK) AS EndDate,
+           ROW_NUMBER() OVER (PARTITION BY p.MemberId ORDER BY p.TimeStamp DESC, p.PaymentId DESC) AS rn
+    FROM Payment p JOIN Package pkg ON p.PackageId = pkg.PackageId
+    WHERE p.MemberId IS NOT NULL
+  ) latest
+  WHERE latest.rn = 1;
   COMMIT;
+  SELECT COUNT(*) AS MembersWithStatus FROM MembershipStatus;
 END//
 DELIMITER ;
 
+-- 4.6 Attendance queries (Weak Entity: PK is (MemberId, Date))
+-- Keyset pages, newest first, on (Date, CheckInTime, MemberId) backed by ix_attendance_recent.
+-- p_date NULL = first page; otherwise the page continues after the (p_date, p_time, p_member)
+-- cursor row, or (p_backward = 1) returns the rows before it, nearest first.
 DELIMITER //
-CREATE PROCEDURE sp_make_payment(
-  IN p_member INT, IN p_package INT, IN p_amount DECIMAL(8,2), IN p_mode VARCHAR(50))
+CREATE PROCEDURE sp_get_attendance_all(
+  IN p_date DATE, IN p_time TIME, IN p_member INT,
+  IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  IF p_date IS NULL THEN
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    ORDER BY A.Date DESC, A.CheckInTime DESC, A.MemberId DESC
+    LIMIT p_limit;
+  ELSEIF p_backward = 1 THEN
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    WHERE (A.Date > p_date
+       OR (A.Date = p_date AND (A.CheckInTime > p_time
+       OR (A.CheckInTime = p_time AND A.MemberId > p_member))))
+    ORDER BY A.Date ASC, A.CheckInTime ASC, A.MemberId ASC
+    LIMIT p_limit;
+  ELSE
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    WHERE (A.Date < p_date
+       OR (A.Date = p_date AND (A.CheckInTime < p_time
+       OR (A.CheckInTime = p_time AND A.MemberId < p_member))))
+    ORDER BY A.Date DESC, A.CheckInTime DESC, A.MemberId DESC
+    LIMIT p_limit;
+  END IF;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_get_attendance_for_trainer(IN p_trainer INT,
+  IN p_date DATE, IN p_time TIME, IN p_member INT,
+  IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  IF p_date IS NULL THEN
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    WHERE M.TrainerId = p_trainer
+    ORDER BY A.Date DESC, A.CheckInTime DESC, A.MemberId DESC
+    LIMIT p_limit;
+  ELSEIF p_backward = 1 THEN
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    WHERE M.TrainerId = p_trainer AND (A.Date > p_date
+       OR (A.Date = p_date AND (A.CheckInTime > p_time
+       OR (A.CheckInTime = p_time AND A.MemberId > p_member))))
+    ORDER BY A.Date ASC, A.CheckInTime ASC, A.MemberId ASC
+    LIMIT p_limit;
+  ELSE
+    SELECT A.MemberId,
+           M.Name AS MemberName,
+           A.Date,
+           A.CheckInTime,
+           A.CheckOutTime,
+           TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+    FROM Attendance A
+    JOIN Member M ON A.MemberId = M.MemberId
+    WHERE M.TrainerId = p_trainer AND (A.Date < p_date
+       OR (A.Date = p_date AND (A.CheckInTime < p_time
+       OR (A.CheckInTime = p_time AND A.MemberId < p_member))))
+    ORDER BY A.Date DESC, A.CheckInTime DESC, A.MemberId DESC
+    LIMIT p_limit;
+  END IF;
+END//
+DELIMITER ;
+
+-- 4.6b Attendance rollups (analytics read only these tables)
+-- Add (p_sign = 1) or remove (p_sign = -1) one visit from the rollups. Called by the attendance
+-- triggers; no transaction control here so it runs inside the triggering statement.
+DELIMITER //
+CREATE PROCEDURE sp_apply_attendance_rollup(
+  IN p_member INT, IN p_date DATE, IN p_in TIME, IN p_out TIME, IN p_sign INT)
+BEGIN
+  DECLARE v_trainer INT DEFAULT NULL;
+  DECLARE v_minutes INT DEFAULT NULL;
+  DECLARE v_first INT;
+  DECLARE v_hour INT;
+  DECLARE v_last INT;
+
+  IF p_date IS NOT NULL AND p_in IS NOT NULL THEN
+    SET v_minutes = TIMESTAMPDIFF(MINUTE, p_in, p_out);
+    SET v_first = HOUR(p_in);
+    SET v_hour = v_first;
+    SET v_last = IFNULL(HOUR(p_out), v_first);
+
+    WHILE v_hour <= v_last DO
+      INSERT INTO Attendance_HourlyRollup(BucketDate, BucketHour, CheckIns, Present, TimedVisits, TotalMinutes)
+      VALUES(p_date, v_hour,
+             IF(v_hour = v_first, p_sign, 0),
+             p_sign,
+             IF(v_hour = v_first AND v_minutes IS NOT NULL, p_sign, 0),
+             IF(v_hour = v_first, p_sign * IFNULL(v_minutes, 0), 0))
+      ON DUPLICATE KEY UPDATE
+        CheckIns = CheckIns + VALUES(CheckIns),
+        Present = Present + VALUES(Present),
+        TimedVisits = TimedVisits + VALUES(TimedVisits),
+        TotalMinutes = TotalMinutes + VALUES(TotalMinutes);
+      SET v_hour = v_hour + 1;
+    END WHILE;
+
+    SELECT TrainerId INTO v_trainer FROM Member WHERE MemberId = p_member;
+    IF v_trainer IS NOT NULL THEN
+      INSERT INTO Attendance_TrainerDaily(BucketDate, TrainerId, Visits, TimedVisits, TotalMinutes)
+      VALUES(p_date, v_trainer, p_sign,
+             IF(v_minutes IS NOT NULL, p_sign, 0),
+             p_sign * IFNULL(v_minutes, 0))
+      ON DUPLICATE KEY UPDATE
+        Visits = Visits + VALUES(Visits),
+        TimedVisits = TimedVisits + VALUES(TimedVisits),
+        TotalMinutes = TotalMinutes + VALUES(TotalMinutes);
+    END IF;
+  END IF;
+END//
+DELIMITER ;
+
+-- Move one member's visits from trainer p_from to p_to in Attendance_TrainerDaily (either may
+-- be NULL = no trainer). Called by trg_member_trainer_rollup; no transaction control here.
+DELIMITER //
+CREATE PROCEDURE sp_move_attendance_rollup(IN p_member INT, IN p_from INT, IN p_to INT)
+BEGIN
+  IF p_from IS NOT NULL THEN
+    UPDATE Attendance_TrainerDaily R
+    JOIN (SELECT Date,
+                 COUNT(*) AS Visits,
+                 COUNT(CheckOutTime) AS TimedVisits,
+                 IFNULL(SUM(TIMESTAMPDIFF(MINUTE, CheckInTime, CheckOutTime)), 0) AS TotalMinutes
+          FROM Attendance
+          WHERE MemberId = p_member AND Date IS NOT NULL AND CheckInTime IS NOT NULL
+          GROUP BY Date) A ON A.Date = R.BucketDate
+    SET R.Visits = R.Visits - A.Visits,
+        R.TimedVisits = R.TimedVisits - A.TimedVisits,
+        R.TotalMinutes = R.TotalMinutes - A.TotalMinutes
+    WHERE R.TrainerId = p_from;
+  END IF;
+
+  IF p_to IS NOT NULL THEN
+    INSERT INTO Attendance_TrainerDaily(BucketDate, TrainerId, Visits, TimedVisits, TotalMinutes)
+    SELECT Date,
+           p_to,
+           COUNT(*),
+           COUNT(CheckOutTime),
+           IFNULL(SUM(TIMESTAMPDIFF(MINUTE, CheckInTime, CheckOutTime)), 0)
+    FROM Attendance
+    WHERE MemberId = p_member AND Date IS NOT NULL AND CheckInTime IS NOT NULL
+    GROUP BY Date
+    ON DUPLICATE KEY UPDATE
+      Visits = Visits + VALUES(Visits),
+      TimedVisits = TimedVisits + VALUES(TimedVisits),
+      TotalMinutes = TotalMinutes + VALUES(TotalMinutes);
+  END IF;
+END//
+DELIMITER ;
+
+-- Set-based rebuild of both rollups from Attendance (after bulk loads or to repair drift)
+DELIMITER //
+CREATE PROCEDURE sp_rebuild_attendance_rollups()
 BEGIN
   DECLARE EXIT HANDLER FOR SQLEXCEPTION
   BEGIN
     ROLLBACK;
     RESIGNAL;
   END;
-  
+
   START TRANSACTION;
-  INSERT INTO Payment(Amount, Mode, TimeStamp, MemberId, PackageId)
-  VALUES(p_amount, p_mode, NOW(), p_member, p_package);
-  -- Trigger validates amount and creates audit entry atomically
+  DELETE FROM Attendance_HourlyRollup;
+  DELETE FROM Attendance_TrainerDaily;
+
+  INSERT INTO Attendance_HourlyRollup(BucketDate, BucketHour, CheckIns, Present, TimedVisits, TotalMinutes)
+  WITH RECURSIVE hours(h) AS (SELECT 0 UNION ALL SELECT h + 1 FROM hours WHERE h < 23)
+  SELECT A.Date,
+         H.h,
+         SUM(HOUR(A.CheckInTime) = H.h),
+         COUNT(*),
+         SUM(HOUR(A.CheckInTime) = H.h AND A.CheckOutTime IS NOT NULL),
+         SUM(IF(HOUR(A.CheckInTime) = H.h, IFNULL(TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime), 0), 0))
+  FROM Attendance A
+  JOIN hours H ON H.h BETWEEN HOUR(A.CheckInTime) AND IFNULL(HOUR(A.CheckOutTime), HOUR(A.CheckInTime))
+  WHERE A.Date IS NOT NULL AND A.CheckInTime IS NOT NULL
+  GROUP BY A.Date, H.h;
+
+  INSERT INTO Attendance_TrainerDaily(BucketDate, TrainerId, Visits, TimedVisits, TotalMinutes)
+  SELECT A.Date,
+         M.TrainerId,
+         COUNT(*),
+         COUNT(A.CheckOutTime),
+         IFNULL(SUM(TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime)), 0)
+  FROM Attendance A
+  JOIN Member M ON A.MemberId = M.MemberId
+  WHERE M.TrainerId IS NOT NULL AND A.Date IS NOT NULL AND A.CheckInTime IS NOT NULL
+  GROUP BY A.Date, M.TrainerId;
   COMMIT;
+
+  SELECT (SELECT COUNT(*) FROM Attendance_HourlyRollup) AS HourlyBuckets,
+         (SELECT COUNT(*) FROM Attendance_TrainerDaily) AS TrainerDays;
 END//
 DELIMITER ;
 
-
--- STEP 5 — STORED FUNCTIONS
--- 5.1 Get membership end date (returns NULL if member has no payments)
+-- Per-day totals for [p_from, p_to]: visits, average duration and the busiest hour's headcount
 DELIMITER //
-CREATE FUNCTION fn_membership_end_date(p_member INT)
-RETURNS DATE
-READS SQL DATA
+CREATE PROCEDURE sp_attendance_daily(IN p_from DATE, IN p_to DATE)
 BEGIN
-  DECLARE v_ts DATETIME; 
-  DECLARE v_weeks INT;
-  DECLARE v_result DATE;
-  
-  SELECT p.TimeStamp, pkg.DurationWeeks
-  INTO v_ts, v_weeks
-  FROM Payment p JOIN Package pkg ON p.PackageId=pkg.PackageId
-  WHERE p.MemberId=p_member ORDER BY p.TimeStamp DESC LIMIT 1;
-  
-  IF v_ts IS NULL OR v_weeks IS NULL THEN
-    RETURN NULL;
-  END IF;
-  
-  SET v_result = DATE_ADD(DATE(v_ts), INTERVAL v_weeks WEEK);
-  RETURN v_result;
+  SELECT BucketDate AS Date,
+         CAST(SUM(CheckIns) AS SIGNED) AS Visits,
+         ROUND(SUM(TotalMinutes) / NULLIF(SUM(TimedVisits), 0), 1) AS AvgMinutes,
+         MAX(Present) AS PeakPresent
+  FROM Attendance_HourlyRollup
+  WHERE BucketDate BETWEEN p_from AND p_to
+  GROUP BY BucketDate
+  ORDER BY BucketDate;
 END//
 DELIMITER ;
 
-
--- 5.2 Check if member is active (returns 0 if no membership or expired)
+-- Weekday x hour occupancy totals for [p_from, p_to] (Weekday: 1 = Sunday ... 7 = Saturday)
+DELIMITER //
+CREATE PROCEDURE sp_attendance_heatmap(IN p_from DATE, IN p_to DATE)
+BEGIN
+  SELECT DAYOFWEEK(BucketDate) AS Weekday,
+         BucketHour AS Hour,
+         CAST(SUM(CheckIns) AS SIGNED) AS CheckIns,
+         CAST(SUM(Present) AS SIGNED) AS Present
+  FROM Attendance_HourlyRollup
+  WHERE BucketDate BETWEEN p_from AND p_to
+  GROUP BY DAYOFWEEK(BucketDate), BucketHour
+  ORDER BY Weekday, Hour;
+END//
+DELIMITER ;
+
+-- Per-trainer client visits and average session length for [p_from, p_to] (all trainers if p_trainer is NULL)
+-- (Visits > 0 skips days emptied by deletes or trainer moves, which keep a zero row)
+DELIMITER //
+CREATE PROCEDURE sp_attendance_trainer_summary(IN p_from DATE, IN p_to DATE, IN p_trainer INT)
+BEGIN
+  IF p_trainer IS NULL THEN
+    SELECT T.TrainerId,
+           T.TrainerName,
+           CAST(SUM(R.Visits) AS SIGNED) AS Visits,
+           COUNT(*) AS ActiveDays,
+           ROUND(SUM(R.TotalMinutes) / NULLIF(SUM(R.TimedVisits), 0), 1) AS AvgMinutes
+    FROM Attendance_TrainerDaily R
+    JOIN Trainer T ON T.TrainerId = R.TrainerId
+    WHERE R.BucketDate BETWEEN p_from AND p_to AND R.Visits > 0
+    GROUP BY T.TrainerId, T.TrainerName
+    ORDER BY Visits DESC;
+  ELSE
+    SELECT T.TrainerId,
+           T.TrainerName,
+           CAST(SUM(R.Visits) AS SIGNED) AS Visits,
+           COUNT(*) AS ActiveDays,
+           ROUND(SUM(R.TotalMinutes) / NULLIF(SUM(R.TimedVisits), 0), 1) AS AvgMinutes
+    FROM Attendance_TrainerDaily R
+    JOIN Trainer T ON T.TrainerId = R.TrainerId
+    WHERE R.TrainerId = p_trainer AND R.BucketDate BETWEEN p_from AND p_to AND R.Visits > 0
+    GROUP BY T.TrainerId, T.TrainerName;
+  END IF;
+END//
+DELIMITER ;
+
+-- 4.6c Live occupancy (feeds the in-process index in occupancy.py; never polled per page view)
+-- One day's visits with the member's trainer; Date = p_date is a range on ix_attendance_recent
+DELIMITER //
+CREATE PROCEDURE sp_occupancy_day(IN p_date DATE)
+BEGIN
+  SELECT A.MemberId, A.Date, M.Name, M.TrainerId, T.TrainerName, A.CheckInTime, A.CheckOutTime
+  FROM Attendance A
+  JOIN Member M ON M.MemberId = A.MemberId
+  LEFT JOIN Trainer T ON T.TrainerId = M.TrainerId
+  WHERE A.Date = p_date;
+END//
+DELIMITER ;
+
+-- The same columns for just-written {"MemberId", "Date"} keys (primary-key lookups)
+DELIMITER //
+CREATE PROCEDURE sp_occupancy_entries(IN p_keys JSON)
+BEGIN
+  SELECT A.MemberId, A.Date, M.Name, M.TrainerId, T.TrainerName, A.CheckInTime, A.CheckOutTime
+  FROM JSON_TABLE(p_keys, '$[*]' COLUMNS(
+    MemberId INT  PATH '$.MemberId',
+    AttDate  DATE PATH '$.Date'
+  )) J
+  JOIN Attendance A ON A.MemberId = J.MemberId AND A.Date = J.AttDate
+  JOIN Member M ON M.MemberId = A.MemberId
+  LEFT JOIN Trainer T ON T.TrainerId = M.TrainerId;
+END//
+DELIMITER ;
+
+-- Check a member out of an open visit; Updated = 0 when there is no open visit that day.
+-- trg_attendance_check_times_upd rejects a time before check-in, the rollup trigger re-buckets the visit.
+DELIMITER //
+CREATE PROCEDURE sp_record_checkout(IN p_member INT, IN p_date DATE, IN p_out TIME)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  UPDATE Attendance
+  SET CheckOutTime = p_out
+  WHERE MemberId = p_member AND Date = p_date AND CheckOutTime IS NULL;
+  SELECT ROW_COUNT() AS Updated;
+  COMMIT;
+END//
+DELIMITER ;
+
+-- 4.7 Business actions (existing)
+DELIMITER //
+CREATE PROCEDURE sp_enroll_member_to_plan(IN p_member INT, IN p_plan INT)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+  
+  START TRANSACTION;
+  IF NOT EXISTS(SELECT 1 FROM Member_WorkOutPlan WHERE MemberId=p_member AND PlanId=p_plan) THEN
+    INSERT INTO Member_WorkOutPlan(MemberId,PlanId) VALUES(p_member,p_plan);
+  END IF;
+  COMMIT;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_record_attendance(
+  IN p_member INT, IN p_date DATE,
+  IN p_in TIME, IN p_out TIME)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+  
+  START TRANSACTION;
+  INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
+  VALUES(p_member, p_date, p_in, p_out);
+  COMMIT;
+END//
+DELIMITER ;
+
+-- Bulk check-in: one multi-row INSERT ... SELECT over a JSON array of
+-- {"MemberId", "Date", "CheckIn", "CheckOut"} objects, in a single transaction.
+-- Callers pre-filter rows that would hit the PK or the check-time triggers so the batch
+-- normally succeeds as a whole; any failure rolls back and is re-raised.
+DELIMITER //
+CREATE PROCEDURE sp_record_attendance_batch(IN p_rows JSON)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
+  SELECT J.MemberId, J.AttDate, J.CheckIn, J.CheckOut
+  FROM JSON_TABLE(p_rows, '$[*]' COLUMNS(
+    MemberId INT  PATH '$.MemberId',
+    AttDate  DATE PATH '$.Date',
+    CheckIn  TIME PATH '$.CheckIn',
+    CheckOut TIME PATH '$.CheckOut'
+  )) J;
+  SELECT ROW_COUNT() AS Inserted;
+  COMMIT;
+END//
+DELIMITER ;
+
+-- Which of a JSON array of member ids exist (and, if p_trainer is given, belong to that trainer)
+DELIMITER //
+CREATE PROCEDURE sp_members_in_scope(IN p_members JSON, IN p_trainer INT)
+BEGIN
+  SELECT M.MemberId
+  FROM JSON_TABLE(p_members, '$[*]' COLUMNS(MemberId INT PATH '$')) J
+  JOIN Member M ON M.MemberId = J.MemberId
+  WHERE p_trainer IS NULL OR M.TrainerId = p_trainer;
+END//
+DELIMITER ;
+
+-- Which (MemberId, Date) pairs from a JSON array already have an attendance row (PK lookups)
+DELIMITER //
+CREATE PROCEDURE sp_existing_attendance(IN p_keys JSON)
+BEGIN
+  SELECT A.MemberId, A.Date
+  FROM JSON_TABLE(p_keys, '$[*]' COLUMNS(
+    MemberId INT  PATH '$.MemberId',
+    AttDate  DATE PATH '$.Date'
+  )) J
+  JOIN Attendance A ON A.MemberId = J.MemberId AND A.Date = J.AttDate;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_make_payment(
+  IN p_member INT, IN p_package INT, IN p_amount DECIMAL(8,2), IN p_mode VARCHAR(50))
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+  
+  START TRANSACTION;
+  INSERT INTO Payment(Amount, Mode, TimeStamp, MemberId, PackageId)
+  VALUES(p_amount, p_mode, NOW(), p_member, p_package);
+  -- Trigger validates amount and creates audit entry atomically
+  COMMIT;
+END//
+DELIMITER ;
+
+
+-- 4.8 Streaming exports (read through an unbuffered cursor; every filter is optional)
+-- Dates are inclusive; NULL means unbounded. Ranges are applied through local variables so the
+-- optimizer can use a range scan instead of evaluating the filters row by row.
+DELIMITER //
+CREATE PROCEDURE sp_export_attendance(IN p_from DATE, IN p_to DATE, IN p_trainer INT)
+BEGIN
+  DECLARE v_from DATE DEFAULT IFNULL(p_from, '1000-01-01');
+  DECLARE v_to DATE DEFAULT IFNULL(p_to, '9999-12-31');
+  SELECT A.MemberId,
+         M.Name AS MemberName,
+         M.TrainerId,
+         A.Date,
+         A.CheckInTime,
+         A.CheckOutTime,
+         TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime) AS DurationMinutes
+  FROM Attendance A
+  JOIN Member M ON A.MemberId = M.MemberId
+  WHERE A.Date BETWEEN v_from AND v_to
+    AND (p_trainer IS NULL OR M.TrainerId = p_trainer)
+  ORDER BY A.Date, A.CheckInTime, A.MemberId;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_export_payments(IN p_from DATE, IN p_to DATE, IN p_trainer INT, IN p_member INT)
+BEGIN
+  DECLARE v_from DATETIME DEFAULT IFNULL(p_from, '1000-01-01');
+  DECLARE v_to DATETIME DEFAULT DATE_ADD(IFNULL(p_to, '9999-12-30'), INTERVAL 1 DAY);
+  SELECT P.PaymentId,
+         P.MemberId,
+         M.Name AS MemberName,
+         M.TrainerId,
+         P.PackageId,
+         PK.PackageName,
+         P.Amount,
+         P.Mode,
+         P.TimeStamp
+  FROM Payment P
+  LEFT JOIN Member M ON P.MemberId = M.MemberId
+  LEFT JOIN Package PK ON P.PackageId = PK.PackageId
+  WHERE P.TimeStamp >= v_from AND P.TimeStamp < v_to
+    AND (p_trainer IS NULL OR M.TrainerId = p_trainer)
+    AND (p_member IS NULL OR P.MemberId = p_member)
+  ORDER BY P.PaymentId;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_export_payment_audit(IN p_from DATE, IN p_to DATE, IN p_trainer INT, IN p_member INT)
+BEGIN
+  DECLARE v_from DATETIME DEFAULT IFNULL(p_from, '1000-01-01');
+  DECLARE v_to DATETIME DEFAULT DATE_ADD(IFNULL(p_to, '9999-12-30'), INTERVAL 1 DAY);
+  SELECT PA.*,
+         M.TrainerId
+  FROM Payment_Audit PA
+  LEFT JOIN Member M ON M.MemberId = COALESCE(PA.NewMemberId, PA.OldMemberId)
+  WHERE PA.ActionTS >= v_from AND PA.ActionTS < v_to
+    AND (p_trainer IS NULL OR M.TrainerId = p_trainer)
+    AND (p_member IS NULL OR PA.NewMemberId = p_member OR PA.OldMemberId = p_member)
+  ORDER BY PA.AuditId;
+END//
+DELIMITER ;
+
+
+-- 4.9 Payment audit partitions and archival
+-- Partitions in order with their upper bound (quoted DATETIME, or MAXVALUE) and InnoDB's row estimate
+DELIMITER //
+CREATE PROCEDURE sp_payment_audit_partitions()
+BEGIN
+  SELECT PARTITION_NAME AS PartitionName,
+         PARTITION_ORDINAL_POSITION AS Position,
+         PARTITION_DESCRIPTION AS LessThan,
+         TABLE_ROWS AS ApproxRows
+  FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Payment_Audit'
+  ORDER BY PARTITION_ORDINAL_POSITION;
+END//
+DELIMITER ;
+
+-- Split monthly partitions off p_future up to and including the month of p_until.
+-- REORGANIZE rewrites every row held in p_future under a metadata lock. Once the job runs
+-- monthly p_future is empty and nothing moves, but the first call (STEP 5b) copies every
+-- audit row since 2025-01, as does any call after the job has lapsed for a while: run
+-- those at a quiet time. Returns how many partitions were added and how many rows moved.
+DELIMITER //
+CREATE PROCEDURE sp_extend_payment_audit_partitions(IN p_until DATE)
+BEGIN
+  DECLARE v_next DATE;
+  DECLARE v_parts TEXT DEFAULT '';
+  DECLARE v_added INT DEFAULT 0;
+  DECLARE v_moved BIGINT DEFAULT 0;
+  SELECT DATE(MAX(STR_TO_DATE(TRIM(BOTH '''' FROM PARTITION_DESCRIPTION), '%Y-%m-%d %H:%i:%s')))
+  INTO v_next
+  FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Payment_Audit'
+    AND PARTITION_DESCRIPTION <> 'MAXVALUE';
+  WHILE v_next <= p_until DO
+    SET v_parts = CONCAT(v_parts,
+      'PARTITION p', DATE_FORMAT(v_next, '%Y%m'),
+      ' VALUES LESS THAN (''', DATE_ADD(v_next, INTERVAL 1 MONTH), '''), ');
+    SET v_next = DATE_ADD(v_next, INTERVAL 1 MONTH);
+    SET v_added = v_added + 1;
+  END WHILE;
+  IF v_added > 0 THEN
+    SELECT COUNT(*) INTO v_moved FROM Payment_Audit PARTITION (p_future);
+    SET @sql = CONCAT('ALTER TABLE Payment_Audit REORGANIZE PARTITION p_future INTO (',
+                      v_parts, 'PARTITION p_future VALUES LESS THAN (MAXVALUE))');
+    PREPARE stmt FROM @sql;
+    EXECUTE stmt;
+    DEALLOCATE PREPARE stmt;
+  END IF;
+  SELECT v_added AS PartitionsAdded, v_moved AS RowsMoved;
+END//
+DELIMITER ;
+
+-- Rows of one archive window [p_from, p_to) in AuditId order; the ActionTS range prunes
+-- the scan to the partition being archived. p_from NULL = unbounded (p_old).
+DELIMITER //
+CREATE PROCEDURE sp_payment_audit_range(IN p_from DATETIME, IN p_to DATETIME)
+BEGIN
+  DECLARE v_from DATETIME DEFAULT IFNULL(p_from, '1000-01-01');
+  SELECT AuditId, PaymentId, ActionType,
+         OldAmount, NewAmount, OldMode, NewMode,
+         OldTimeStamp, NewTimeStamp, OldMemberId, NewMemberId,
+         OldPackageId, NewPackageId, ActionTS
+  FROM Payment_Audit
+  WHERE ActionTS >= v_from AND ActionTS < p_to
+  ORDER BY AuditId;
+END//
+DELIMITER ;
+
+-- Drop the oldest partition once its rows are safely archived. Only the oldest may go, so
+-- the remaining ranges stay contiguous; restored rows then land in the new oldest partition.
+DELIMITER //
+CREATE PROCEDURE sp_drop_payment_audit_partition(IN p_name VARCHAR(64))
+BEGIN
+  DECLARE v_oldest VARCHAR(64);
+  DECLARE v_count INT;
+  SELECT COUNT(*), MIN(CASE WHEN PARTITION_ORDINAL_POSITION = 1 THEN PARTITION_NAME END)
+  INTO v_count, v_oldest
+  FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Payment_Audit';
+  -- Keep at least one dated partition besides p_future so the monthly ranges can be extended
+  IF p_name IS NULL OR p_name <> v_oldest OR p_name = 'p_future' OR v_count < 3 THEN
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT='Only the oldest audit partition can be dropped';
+  END IF;
+  -- v_oldest comes from information_schema, never from the caller
+  SET @sql = CONCAT('ALTER TABLE Payment_Audit DROP PARTITION ', v_oldest);
+  PREPARE stmt FROM @sql;
+  EXECUTE stmt;
+  DEALLOCATE PREPARE stmt;
+END//
+DELIMITER ;
+
+-- Re-insert archived rows from a JSON array of row objects (as written by the archive job).
+-- Rows already present are skipped, so a repeated restore is a no-op; anything else that
+-- fails (bad value, ActionTS outside every partition) raises and rolls the batch back.
+DELIMITER //
+CREATE PROCEDURE sp_restore_payment_audit(IN p_rows JSON)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+  START TRANSACTION;
+  INSERT INTO Payment_Audit(
+    AuditId, PaymentId, ActionType,
+    OldAmount, NewAmount, OldMode, NewMode,
+    OldTimeStamp, NewTimeStamp, OldMemberId, NewMemberId,
+    OldPackageId, NewPackageId, ActionTS
+  )
+  SELECT J.AuditId, J.PaymentId, J.ActionType,
+         J.OldAmount, J.NewAmount, J.OldMode, J.NewMode,
+         J.OldTimeStamp, J.NewTimeStamp, J.OldMemberId, J.NewMemberId,
+         J.OldPackageId, J.NewPackageId, J.ActionTS
+  FROM JSON_TABLE(p_rows, '$[*]' COLUMNS (
+    AuditId      BIGINT       PATH '$.AuditId',
+    PaymentId    INT          PATH '$.PaymentId',
+    ActionType   VARCHAR(10)  PATH '$.ActionType',
+    OldAmount    DECIMAL(8,2) PATH '$.OldAmount',
+    NewAmount    DECIMAL(8,2) PATH '$.NewAmount',
+    OldMode      VARCHAR(50)  PATH '$.OldMode',
+    NewMode      VARCHAR(50)  PATH '$.NewMode',
+    OldTimeStamp DATETIME     PATH '$.OldTimeStamp',
+    NewTimeStamp DATETIME     PATH '$.NewTimeStamp',
+    OldMemberId  INT          PATH '$.OldMemberId',
+    NewMemberId  INT          PATH '$.NewMemberId',
+    OldPackageId INT          PATH '$.OldPackageId',
+    NewPackageId INT          PATH '$.NewPackageId',
+    ActionTS     DATETIME     PATH '$.ActionTS'
+  )) AS J
+  WHERE NOT EXISTS (
+    SELECT 1 FROM Payment_Audit A WHERE A.AuditId = J.AuditId AND A.ActionTS = J.ActionTS
+  );
+  SELECT ROW_COUNT() AS Restored;
+  COMMIT;
+END//
+DELIMITER ;
+
+
+-- 4.10 Workout log
+-- Batched set logging: one multi-row INSERT ... SELECT over a JSON array of
+-- {"MemberId", "Date", "ExerciseId", "SetNo", "Reps", "WeightKg"} objects in a single
+-- transaction. Callers pre-filter rows that would fail, as for sp_record_attendance_batch.
+DELIMITER //
+CREATE PROCEDURE sp_log_workout_sets(IN p_rows JSON)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  INSERT INTO WorkoutSet(MemberId, SessionDate, ExerciseId, SetNo, Reps, WeightKg)
+  SELECT J.MemberId, J.SessionDate, J.ExerciseId, J.SetNo, J.Reps, IFNULL(J.WeightKg, 0)
+  FROM JSON_TABLE(p_rows, '$[*]' COLUMNS(
+    MemberId    INT          PATH '$.MemberId',
+    SessionDate DATE         PATH '$.Date',
+    ExerciseId  INT          PATH '$.ExerciseId',
+    SetNo       SMALLINT     PATH '$.SetNo',
+    Reps        SMALLINT     PATH '$.Reps',
+    WeightKg    DECIMAL(6,2) PATH '$.WeightKg'
+  )) J;
+  SELECT ROW_COUNT() AS Inserted;
+  COMMIT;
+END//
+DELIMITER ;
+
+-- Which (MemberId, Date, ExerciseId, SetNo) keys from a JSON array are already logged (uq_ws_set lookups)
+DELIMITER //
+CREATE PROCEDURE sp_existing_workout_sets(IN p_keys JSON)
+BEGIN
+  SELECT W.MemberId, W.SessionDate AS Date, W.ExerciseId, W.SetNo
+  FROM JSON_TABLE(p_keys, '$[*]' COLUMNS(
+    MemberId    INT      PATH '$.MemberId',
+    SessionDate DATE     PATH '$.Date',
+    ExerciseId  INT      PATH '$.ExerciseId',
+    SetNo       SMALLINT PATH '$.SetNo'
+  )) J
+  JOIN WorkoutSet W
+    ON W.MemberId = J.MemberId AND W.SessionDate = J.SessionDate
+   AND W.ExerciseId = J.ExerciseId AND W.SetNo = J.SetNo;
+END//
+DELIMITER ;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one set from the session, weekly and record
+-- aggregates. Called by the WorkoutSet triggers; no transaction control here so it runs
+-- inside the triggering statement. Removing a set that held a record re-derives that one
+-- (member, exercise) record from the log; every other path is a primary-key update.
+DELIMITER //
+CREATE PROCEDURE sp_apply_workout_set(
+  IN p_member INT, IN p_date DATE, IN p_exercise INT,
+  IN p_reps INT, IN p_weight DECIMAL(6,2), IN p_sign INT)
+BEGIN
+  DECLARE v_week DATE DEFAULT DATE_SUB(p_date, INTERVAL WEEKDAY(p_date) DAY);
+  DECLARE v_volume DECIMAL(12,2) DEFAULT p_reps * p_weight;
+  DECLARE v_e1rm DECIMAL(7,2) DEFAULT fn_estimated_1rm(p_weight, p_reps);
+  DECLARE v_day_sets INT DEFAULT 0;
+  DECLARE v_session_delta INT DEFAULT 0;
+  DECLARE v_target TINYINT DEFAULT 0;
+  DECLARE v_max DECIMAL(6,2) DEFAULT NULL;
+  DECLARE v_max_reps_at INT DEFAULT NULL;
+  DECLARE v_best DECIMAL(7,2) DEFAULT NULL;
+  DECLARE v_max_reps INT DEFAULT NULL;
+  DECLARE v_weight_pr TINYINT(1) DEFAULT 0;
+
+  -- Training day: the first set opens a session, removing the last one closes it
+  INSERT INTO WorkoutSession(MemberId, SessionDate, Sets, Reps, VolumeKg)
+  VALUES(p_member, p_date, p_sign, p_sign * p_reps, p_sign * v_volume)
+  ON DUPLICATE KEY UPDATE
+    Sets = Sets + p_sign, Reps = Reps + p_sign * p_reps, VolumeKg = VolumeKg + p_sign * v_volume;
+  SELECT Sets INTO v_day_sets FROM WorkoutSession WHERE MemberId = p_member AND SessionDate = p_date;
+  IF p_sign > 0 AND v_day_sets = 1 THEN
+    SET v_session_delta = 1;
+  ELSEIF p_sign < 0 AND v_day_sets <= 0 THEN
+    SET v_session_delta = -1;
+    DELETE FROM WorkoutSession WHERE MemberId = p_member AND SessionDate = p_date;
+  END IF;
+
+  -- Week
+  SELECT IFNULL(MAX(WP.SessionsPerWeek), 0) INTO v_target
+  FROM Member_WorkOutPlan MWP JOIN WorkOutPlan WP ON WP.PlanId = MWP.PlanId
+  WHERE MWP.MemberId = p_member;
+  INSERT INTO WorkoutWeeklyVolume(MemberId, WeekStart, Sessions, Sets, Reps, VolumeKg, TargetSessions)
+  VALUES(p_member, v_week, v_session_delta, p_sign, p_sign * p_reps, p_sign * v_volume, v_target)
+  ON DUPLICATE KEY UPDATE
+    Sessions = Sessions + v_session_delta, Sets = Sets + p_sign,
+    Reps = Reps + p_sign * p_reps, VolumeKg = VolumeKg + p_sign * v_volume;
+  IF p_sign < 0 THEN
+    DELETE FROM WorkoutWeeklyVolume WHERE MemberId = p_member AND WeekStart = v_week AND Sets <= 0;
+  END IF;
+
+  -- Personal records
+  SELECT MaxWeightKg, MaxWeightReps, BestE1RM, MaxReps
+  INTO v_max, v_max_reps_at, v_best, v_max_reps
+  FROM WorkoutPersonalRecord
+  WHERE MemberId = p_member AND ExerciseId = p_exercise
+  FOR UPDATE;
+  IF p_sign > 0 THEN
+    IF v_max IS NULL THEN
+      INSERT INTO WorkoutPersonalRecord(
+        MemberId, ExerciseId, MaxWeightKg, MaxWeightReps, MaxWeightDate,
+        BestE1RM, BestE1RMDate, MaxReps, MaxRepsDate)
+      VALUES(p_member, p_exercise, p_weight, p_reps, p_date, v_e1rm, p_date, p_reps, p_date);
+    ELSE
+      SET v_weight_pr = p_weight > v_max OR (p_weight = v_max AND p_reps > v_max_reps_at);
+      IF v_weight_pr OR v_e1rm > v_best OR p_reps > v_max_reps THEN
+        -- Dates are assigned before their values change (UPDATE applies SETs left to right)
+        UPDATE WorkoutPersonalRecord
+        SET MaxWeightKg   = IF(v_weight_pr, p_weight, MaxWeightKg),
+            MaxWeightReps = IF(v_weight_pr, p_reps, MaxWeightReps),
+            MaxWeightDate = IF(v_weight_pr, p_date, MaxWeightDate),
+            BestE1RMDate  = IF(v_e1rm > BestE1RM, p_date, BestE1RMDate),
+            BestE1RM      = GREATEST(BestE1RM, v_e1rm),
+            MaxRepsDate   = IF(p_reps > MaxReps, p_date, MaxRepsDate),
+            MaxReps       = GREATEST(MaxReps, p_reps)
+        WHERE MemberId = p_member AND ExerciseId = p_exercise;
+      END IF;
+    END IF;
+  ELSEIF v_max IS NOT NULL AND (p_weight >= v_max OR v_e1rm >= v_best OR p_reps >= v_max_reps) THEN
+    CALL sp_recompute_personal_record(p_member, p_exercise);
+  END IF;
+END//
+DELIMITER ;
+
+-- Re-derive one (member, exercise) record from the log (uq_ws_set range on the member)
+DELIMITER //
+CREATE PROCEDURE sp_recompute_personal_record(IN p_member INT, IN p_exercise INT)
+BEGIN
+  DECLARE v_max DECIMAL(6,2) DEFAULT NULL;
+  DECLARE v_max_reps_at INT;
+  DECLARE v_max_date DATE;
+  DECLARE v_best DECIMAL(7,2);
+  DECLARE v_best_date DATE;
+  DECLARE v_max_reps INT;
+  DECLARE v_max_reps_date DATE;
+
+  SELECT WeightKg, Reps, SessionDate INTO v_max, v_max_reps_at, v_max_date
+  FROM WorkoutSet WHERE MemberId = p_member AND ExerciseId = p_exercise
+  ORDER BY WeightKg DESC, Reps DESC, SessionDate
+  LIMIT 1;
+
+  IF v_max IS NULL THEN
+    DELETE FROM WorkoutPersonalRecord WHERE MemberId = p_member AND ExerciseId = p_exercise;
+  ELSE
+    SELECT fn_estimated_1rm(WeightKg, Reps), SessionDate INTO v_best, v_best_date
+    FROM WorkoutSet WHERE MemberId = p_member AND ExerciseId = p_exercise
+    ORDER BY fn_estimated_1rm(WeightKg, Reps) DESC, SessionDate
+    LIMIT 1;
+    SELECT Reps, SessionDate INTO v_max_reps, v_max_reps_date
+    FROM WorkoutSet WHERE MemberId = p_member AND ExerciseId = p_exercise
+    ORDER BY Reps DESC, SessionDate
+    LIMIT 1;
+    REPLACE INTO WorkoutPersonalRecord(
+      MemberId, ExerciseId, MaxWeightKg, MaxWeightReps, MaxWeightDate,
+      BestE1RM, BestE1RMDate, MaxReps, MaxRepsDate)
+    VALUES(p_member, p_exercise, v_max, v_max_reps_at, v_max_date,
+           v_best, v_best_date, v_max_reps, v_max_reps_date);
+  END IF;
+END//
+DELIMITER ;
+
+-- Set-based rebuild of every workout aggregate from WorkoutSet (after bulk loads or to repair
+-- drift). Weekly targets are re-derived from the members' current plans.
+DELIMITER //
+CREATE PROCEDURE sp_rebuild_workout_aggregates()
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  DELETE FROM WorkoutPersonalRecord;
+  DELETE FROM WorkoutWeeklyVolume;
+  DELETE FROM WorkoutSession;
+
+  INSERT INTO WorkoutSession(MemberId, SessionDate, Sets, Reps, VolumeKg)
+  SELECT MemberId, SessionDate, COUNT(*), SUM(Reps), SUM(Reps * WeightKg)
+  FROM WorkoutSet
+  GROUP BY MemberId, SessionDate;
+
+  INSERT INTO WorkoutWeeklyVolume(MemberId, WeekStart, Sessions, Sets, Reps, VolumeKg, TargetSessions)
+  SELECT S.MemberId,
+         DATE_SUB(S.SessionDate, INTERVAL WEEKDAY(S.SessionDate) DAY) AS WeekStart,
+         COUNT(*), SUM(S.Sets), SUM(S.Reps), SUM(S.VolumeKg),
+         IFNULL(T.Target, 0)
+  FROM WorkoutSession S
+  LEFT JOIN (
+    SELECT MWP.MemberId, MAX(WP.SessionsPerWeek) AS Target
+    FROM Member_WorkOutPlan MWP JOIN WorkOutPlan WP ON WP.PlanId = MWP.PlanId
+    GROUP BY MWP.MemberId
+  ) T ON T.MemberId = S.MemberId
+  GROUP BY S.MemberId, WeekStart, T.Target;
+
+  INSERT INTO WorkoutPersonalRecord(
+    MemberId, ExerciseId, MaxWeightKg, MaxWeightReps, MaxWeightDate,
+    BestE1RM, BestE1RMDate, MaxReps, MaxRepsDate)
+  WITH ranked AS (
+    SELECT MemberId, ExerciseId, WeightKg, Reps, SessionDate,
+           fn_estimated_1rm(WeightKg, Reps) AS E1RM,
+           ROW_NUMBER() OVER (PARTITION BY MemberId, ExerciseId ORDER BY WeightKg DESC, Reps DESC, SessionDate) AS by_weight,
+           ROW_NUMBER() OVER (PARTITION BY MemberId, ExerciseId ORDER BY fn_estimated_1rm(WeightKg, Reps) DESC, SessionDate) AS by_e1rm,
+           ROW_NUMBER() OVER (PARTITION BY MemberId, ExerciseId ORDER BY Reps DESC, SessionDate) AS by_reps
+    FROM WorkoutSet
+  )
+  SELECT W.MemberId, W.ExerciseId, W.WeightKg, W.Reps, W.SessionDate,
+         E.E1RM, E.SessionDate, R.Reps, R.SessionDate
+  FROM ranked W
+  JOIN ranked E ON E.MemberId = W.MemberId AND E.ExerciseId = W.ExerciseId AND E.by_e1rm = 1
+  JOIN ranked R ON R.MemberId = W.MemberId AND R.ExerciseId = W.ExerciseId AND R.by_reps = 1
+  WHERE W.by_weight = 1;
+  COMMIT;
+
+  SELECT (SELECT COUNT(*) FROM WorkoutSession) AS Sessions,
+         (SELECT COUNT(*) FROM WorkoutWeeklyVolume) AS Weeks,
+         (SELECT COUNT(*) FROM WorkoutPersonalRecord) AS Records;
+END//
+DELIMITER ;
+
+-- Progress readers (aggregate tables only)
+DELIMITER //
+CREATE PROCEDURE sp_get_personal_records(IN p_member INT)
+BEGIN
+  SELECT PR.ExerciseId, E.ExerciseName, E.MuscleGroup,
+         PR.MaxWeightKg, PR.MaxWeightReps, PR.MaxWeightDate,
+         PR.BestE1RM, PR.BestE1RMDate, PR.MaxReps, PR.MaxRepsDate
+  FROM WorkoutPersonalRecord PR
+  JOIN Exercise E ON E.ExerciseId = PR.ExerciseId
+  WHERE PR.MemberId = p_member
+  ORDER BY E.ExerciseName;
+END//
+DELIMITER ;
+
+-- Weeks starting on or after p_from, newest first. Adherence = sessions (capped at the
+-- target) as a percentage of the weekly target; NULL when the member had no plan.
+DELIMITER //
+CREATE PROCEDURE sp_get_weekly_volume(IN p_member INT, IN p_from DATE)
+BEGIN
+  SELECT WeekStart, Sessions, Sets, Reps, VolumeKg, TargetSessions,
+         IF(TargetSessions > 0, ROUND(100 * LEAST(Sessions, TargetSessions) / TargetSessions), NULL) AS Adherence
+  FROM WorkoutWeeklyVolume
+  WHERE MemberId = p_member AND WeekStart >= p_from
+  ORDER BY WeekStart DESC;
+END//
+DELIMITER ;
+
+DELIMITER //
+CREATE PROCEDURE sp_get_workout_sessions(IN p_member INT, IN p_limit INT)
+BEGIN
+  SELECT SessionDate, Sets, Reps, VolumeKg
+  FROM WorkoutSession
+  WHERE MemberId = p_member
+  ORDER BY SessionDate DESC
+  LIMIT p_limit;
+END//
+DELIMITER ;
+
+
+-- 4.11 Projected JSON API (/api/v1)
+-- Each resource procedure takes the requested fields as a JSON array of names and selects only
+-- those columns, joining Package/Trainer/Member only when a requested field needs them.
+-- Scope and cursor arguments are typed (INT/DATE/TIME), so they are inlined into the statement
+-- and the optimizer sees constants; unused filters are left out instead of "p IS NULL OR ...".
+-- Paging follows the page procedures above: p_backward = 1 returns the rows before the cursor.
+
+-- Resolve field names against p_allowed ({"Field": "column expression"}) into a select list.
+-- Unknown or malformed names are rejected, so only the expressions in p_allowed reach SQL.
+DELIMITER //
+CREATE PROCEDURE sp_api_columns(IN p_fields JSON, IN p_allowed JSON, OUT p_columns TEXT)
+BEGIN
+  DECLARE v_unknown VARCHAR(64) DEFAULT NULL;
+  SELECT J.Field INTO v_unknown
+  FROM JSON_TABLE(p_fields, '$[*]' COLUMNS(Field VARCHAR(64) PATH '$')) J
+  WHERE CASE WHEN J.Field IS NULL OR J.Field NOT REGEXP '^[A-Za-z][A-Za-z0-9]*$' THEN 1
+             WHEN JSON_CONTAINS_PATH(p_allowed, 'one', CONCAT('$.', J.Field)) = 0 THEN 1
+             ELSE 0 END = 1
+  LIMIT 1;
+  IF v_unknown IS NOT NULL THEN
+    SET @api_error = CONCAT('Unknown field: ', v_unknown);
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = @api_error;
+  END IF;
+
+  SELECT GROUP_CONCAT(
+           CONCAT(JSON_UNQUOTE(JSON_EXTRACT(p_allowed, CONCAT('$.', J.Field))), ' AS ', J.Field)
+           ORDER BY J.Pos SEPARATOR ', ')
+  INTO p_columns
+  FROM JSON_TABLE(p_fields, '$[*]' COLUMNS(Pos FOR ORDINALITY, Field VARCHAR(64) PATH '$')) J;
+  IF p_columns IS NULL THEN
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'No fields requested';
+  END IF;
+END//
+DELIMITER ;
+
+-- Members by MemberId (p_trainer: that trainer's members; p_member: just that member)
+DELIMITER //
+CREATE PROCEDURE sp_api_members(IN p_fields JSON, IN p_trainer INT, IN p_member INT,
+  IN p_cursor INT, IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  DECLARE v_cols TEXT;
+  CALL sp_api_columns(p_fields, JSON_OBJECT(
+    'MemberId', 'M.MemberId', 'Name', 'M.Name', 'Email', 'M.Email', 'PhoneNo', 'M.PhoneNo',
+    'Address', 'M.Address', 'DoB', 'M.DoB', 'JoinDate', 'M.JoinDate', 'Gender', 'M.Gender',
+    'PackageId', 'M.PackageId', 'PackageName', 'P.PackageName',
+    'TrainerId', 'M.TrainerId', 'TrainerName', 'T.TrainerName'), v_cols);
+  SET @api_sql = CONCAT('SELECT ', v_cols, ' FROM Member M',
+    IF(LOCATE('P.PackageName', v_cols) > 0, ' LEFT JOIN Package P ON P.PackageId = M.PackageId', ''),
+    IF(LOCATE('T.TrainerName', v_cols) > 0, ' LEFT JOIN Trainer T ON T.TrainerId = M.TrainerId', ''),
+    ' WHERE 1 = 1',
+    IF(p_trainer IS NULL, '', CONCAT(' AND M.TrainerId = ', p_trainer)),
+    IF(p_member IS NULL, '', CONCAT(' AND M.MemberId = ', p_member)),
+    IF(p_cursor IS NULL, '', CONCAT(' AND M.MemberId ', IF(p_backward = 1, '<', '>'), ' ', p_cursor)),
+    ' ORDER BY M.MemberId', IF(p_backward = 1, ' DESC', ''),
+    ' LIMIT ', p_limit);
+  PREPARE api_stmt FROM @api_sql;
+  EXECUTE api_stmt;
+  DEALLOCATE PREPARE api_stmt;
+END//
+DELIMITER ;
+
+-- Workout plans by PlanId (p_trainer: plans that trainer wrote; p_member: plans the member follows)
+DELIMITER //
+CREATE PROCEDURE sp_api_plans(IN p_fields JSON, IN p_trainer INT, IN p_member INT,
+  IN p_cursor INT, IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  DECLARE v_cols TEXT;
+  CALL sp_api_columns(p_fields, JSON_OBJECT(
+    'PlanId', 'WP.PlanId', 'Goal', 'WP.Goal', 'DurationWeeks', 'WP.DurationWeeks',
+    'SessionsPerWeek', 'WP.SessionsPerWeek',
+    'TrainerId', 'WP.TrainerId', 'TrainerName', 'T.TrainerName'), v_cols);
+  SET @api_sql = CONCAT('SELECT ', v_cols, ' FROM WorkOutPlan WP',
+    IF(p_member IS NULL, '', CONCAT(' JOIN Member_WorkOutPlan MWP ON MWP.PlanId = WP.PlanId AND MWP.MemberId = ', p_member)),
+    IF(LOCATE('T.TrainerName', v_cols) > 0, ' LEFT JOIN Trainer T ON T.TrainerId = WP.TrainerId', ''),
+    ' WHERE 1 = 1',
+    IF(p_trainer IS NULL, '', CONCAT(' AND WP.TrainerId = ', p_trainer)),
+    IF(p_cursor IS NULL, '', CONCAT(' AND WP.PlanId ', IF(p_backward = 1, '<', '>'), ' ', p_cursor)),
+    ' ORDER BY WP.PlanId', IF(p_backward = 1, ' DESC', ''),
+    ' LIMIT ', p_limit);
+  PREPARE api_stmt FROM @api_sql;
+  EXECUTE api_stmt;
+  DEALLOCATE PREPARE api_stmt;
+END//
+DELIMITER ;
+
+-- Attendance newest first on (Date, CheckInTime, MemberId), as sp_get_attendance_all
+DELIMITER //
+CREATE PROCEDURE sp_api_attendance(IN p_fields JSON, IN p_trainer INT, IN p_member INT,
+  IN p_date DATE, IN p_time TIME, IN p_cursor_member INT, IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  DECLARE v_cols TEXT;
+  DECLARE v_op CHAR(1) DEFAULT IF(p_backward = 1, '>', '<');
+  CALL sp_api_columns(p_fields, JSON_OBJECT(
+    'MemberId', 'A.MemberId', 'MemberName', 'M.Name', 'Date', 'A.Date',
+    'CheckInTime', 'A.CheckInTime', 'CheckOutTime', 'A.CheckOutTime',
+    'DurationMinutes', 'TIMESTAMPDIFF(MINUTE, A.CheckInTime, A.CheckOutTime)'), v_cols);
+  SET @api_sql = CONCAT('SELECT ', v_cols, ' FROM Attendance A',
+    IF(p_trainer IS NOT NULL OR LOCATE('M.Name', v_cols) > 0, ' JOIN Member M ON M.MemberId = A.MemberId', ''),
+    ' WHERE 1 = 1',
+    IF(p_trainer IS NULL, '', CONCAT(' AND M.TrainerId = ', p_trainer)),
+    IF(p_member IS NULL, '', CONCAT(' AND A.MemberId = ', p_member)),
+    IF(p_date IS NULL, '', CONCAT(
+      ' AND (A.Date ', v_op, ' ', QUOTE(p_date),
+      ' OR (A.Date = ', QUOTE(p_date), ' AND (A.CheckInTime ', v_op, ' ', QUOTE(p_time),
+      ' OR (A.CheckInTime = ', QUOTE(p_time), ' AND A.MemberId ', v_op, ' ', p_cursor_member, '))))')),
+    IF(p_backward = 1, ' ORDER BY A.Date, A.CheckInTime, A.MemberId',
+                       ' ORDER BY A.Date DESC, A.CheckInTime DESC, A.MemberId DESC'),
+    ' LIMIT ', p_limit);
+  PREPARE api_stmt FROM @api_sql;
+  EXECUTE api_stmt;
+  DEALLOCATE PREPARE api_stmt;
+END//
+DELIMITER ;
+
+-- Payments newest first by PaymentId (p_member: that member's payments)
+DELIMITER //
+CREATE PROCEDURE sp_api_payments(IN p_fields JSON, IN p_member INT,
+  IN p_cursor INT, IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  DECLARE v_cols TEXT;
+  CALL sp_api_columns(p_fields, JSON_OBJECT(
+    'PaymentId', 'PY.PaymentId', 'MemberId', 'PY.MemberId', 'MemberName', 'M.Name',
+    'PackageId', 'PY.PackageId', 'PackageName', 'PK.PackageName',
+    'Amount', 'PY.Amount', 'Mode', 'PY.Mode', 'TimeStamp', 'PY.TimeStamp'), v_cols);
+  SET @api_sql = CONCAT('SELECT ', v_cols, ' FROM Payment PY',
+    IF(LOCATE('M.Name', v_cols) > 0, ' LEFT JOIN Member M ON M.MemberId = PY.MemberId', ''),
+    IF(LOCATE('PK.PackageName', v_cols) > 0, ' LEFT JOIN Package PK ON PK.PackageId = PY.PackageId', ''),
+    ' WHERE 1 = 1',
+    IF(p_member IS NULL, '', CONCAT(' AND PY.MemberId = ', p_member)),
+    IF(p_cursor IS NULL, '', CONCAT(' AND PY.PaymentId ', IF(p_backward = 1, '>', '<'), ' ', p_cursor)),
+    ' ORDER BY PY.PaymentId', IF(p_backward = 1, '', ' DESC'),
+    ' LIMIT ', p_limit);
+  PREPARE api_stmt FROM @api_sql;
+  EXECUTE api_stmt;
+  DEALLOCATE PREPARE api_stmt;
+END//
+DELIMITER ;
+
+-- Membership status by MemberId from the materialized MembershipStatus table
+DELIMITER //
+CREATE PROCEDURE sp_api_membership(IN p_fields JSON, IN p_trainer INT, IN p_member INT,
+  IN p_cursor INT, IN p_backward TINYINT, IN p_limit INT)
+BEGIN
+  DECLARE v_cols TEXT;
+  CALL sp_api_columns(p_fields, JSON_OBJECT(
+    'MemberId', 'M.MemberId', 'Name', 'M.Name', 'Email', 'M.Email', 'EndDate', 'MS.EndDate',
+    'Status', 'CASE WHEN MS.EndDate IS NULL THEN ''No Membership'' WHEN MS.EndDate >= CURDATE() THEN ''Active'' ELSE ''Expired'' END',
+    'IsActive', '(MS.EndDate IS NOT NULL AND MS.EndDate >= CURDATE())',
+    'DaysLeft', 'DATEDIFF(MS.EndDate, CURDATE())'), v_cols);
+  SET @api_sql = CONCAT('SELECT ', v_cols, ' FROM Member M',
+    IF(LOCATE('MS.', v_cols) > 0, ' LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId', ''),
+    ' WHERE 1 = 1',
+    IF(p_trainer IS NULL, '', CONCAT(' AND M.TrainerId = ', p_trainer)),
+    IF(p_member IS NULL, '', CONCAT(' AND M.MemberId = ', p_member)),
+    IF(p_cursor IS NULL, '', CONCAT(' AND M.MemberId ', IF(p_backward = 1, '<', '>'), ' ', p_cursor)),
+    ' ORDER BY M.MemberId', IF(p_backward = 1, ' DESC', ''),
+    ' LIMIT ', p_limit);
+  PREPARE api_stmt FROM @api_sql;
+  EXECUTE api_stmt;
+  DEALLOCATE PREPARE api_stmt;
+END//
+DELIMITER ;
+
+
+-- 4.12 Bulk CSV import (flask --app app import-csv, /admin/import)
+-- The importer validates a chunk with the lookups below, then writes it with one multi-row
+-- INSERT ... SELECT per chunk in a single transaction; a failing chunk rolls back as a whole
+-- and the app narrows it down to the offending rows.
+-- Which emails and phone numbers from two JSON arrays already belong to a member
+-- (uq_member_email / uq_member_phone lookups; the table collation compares emails case-insensitively)
+DELIMITER //
+CREATE PROCEDURE sp_existing_member_contacts(IN p_emails JSON, IN p_phones JSON)
+BEGIN
+  SELECT M.Email, NULL AS PhoneNo
+  FROM JSON_TABLE(p_emails, '$[*]' COLUMNS(Email VARCHAR(150) PATH '$')) J
+  JOIN Member M ON M.Email = J.Email COLLATE utf8mb4_unicode_ci
+  UNION ALL
+  SELECT NULL, M.PhoneNo
+  FROM JSON_TABLE(p_phones, '$[*]' COLUMNS(PhoneNo VARCHAR(20) PATH '$')) J
+  JOIN Member M ON M.PhoneNo = J.PhoneNo COLLATE utf8mb4_unicode_ci;
+END//
+DELIMITER ;
+
+-- MemberId for each email in a JSON array that belongs to a member (uq_member_email lookups)
+DELIMITER //
+CREATE PROCEDURE sp_members_by_email(IN p_emails JSON)
+BEGIN
+  SELECT M.MemberId, M.Email
+  FROM JSON_TABLE(p_emails, '$[*]' COLUMNS(Email VARCHAR(150) PATH '$')) J
+  JOIN Member M ON M.Email = J.Email COLLATE utf8mb4_unicode_ci;
+END//
+DELIMITER ;
+
+-- Which {"MemberId", "TimeStamp", "PackageId"} payments from a JSON array are already recorded
+-- (ix_payment_member lookups); lets a resumed import skip the chunk it committed last
+DELIMITER //
+CREATE PROCEDURE sp_existing_payments(IN p_keys JSON)
+BEGIN
+  SELECT P.MemberId, P.TimeStamp, P.PackageId
+  FROM JSON_TABLE(p_keys, '$[*]' COLUMNS(
+    MemberId  INT      PATH '$.MemberId',
+    PaidAt    DATETIME PATH '$.TimeStamp',
+    PackageId INT      PATH '$.PackageId'
+  )) J
+  JOIN Payment P ON P.MemberId = J.MemberId AND P.TimeStamp = J.PaidAt AND P.PackageId = J.PackageId;
+END//
+DELIMITER ;
+
+-- Insert a JSON array of member objects with hashed passwords. Rows without one get
+-- p_default_password, the app's hash of the sp_create_member default, so no plaintext is stored.
+DELIMITER //
+CREATE PROCEDURE sp_import_members(IN p_rows JSON, IN p_default_password VARCHAR(255))
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  IF p_default_password IS NULL OR p_default_password = '' THEN
+    SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT='A default password hash is required';
+  END IF;
+  START TRANSACTION;
+  INSERT INTO Member(Name, Email, PhoneNo, Password, Address, DoB, JoinDate, Gender, PackageId, TrainerId)
+  SELECT J.Name, J.Email, J.PhoneNo, IFNULL(J.Password, p_default_password), J.Address,
+         J.DoB, J.JoinDate, J.Gender, J.PackageId, J.TrainerId
+  FROM JSON_TABLE(p_rows, '$[*]' COLUMNS(
+    Name      VARCHAR(150) PATH '$.Name',
+    Email     VARCHAR(150) PATH '$.Email',
+    PhoneNo   VARCHAR(20)  PATH '$.PhoneNo',
+    Password  VARCHAR(255) PATH '$.Password',
+    Address   TEXT         PATH '$.Address',
+    DoB       DATE         PATH '$.DoB',
+    JoinDate  DATE         PATH '$.JoinDate',
+    Gender    VARCHAR(10)  PATH '$.Gender',
+    PackageId INT          PATH '$.PackageId',
+    TrainerId INT          PATH '$.TrainerId'
+  )) J;
+  SELECT ROW_COUNT() AS Inserted;
+  COMMIT;
+END//
+DELIMITER ;
+
+-- Insert a JSON array of historical payments with their own timestamps.
+-- trg_payment_validate checks every row and trg_payment_audit audits it and refreshes MembershipStatus.
+DELIMITER //
+CREATE PROCEDURE sp_import_payments(IN p_rows JSON)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  INSERT INTO Payment(Amount, Mode, TimeStamp, MemberId, PackageId)
+  SELECT J.Amount, J.Mode, J.PaidAt, J.MemberId, J.PackageId
+  FROM JSON_TABLE(p_rows, '$[*]' COLUMNS(
+    Amount    DECIMAL(8,2) PATH '$.Amount',
+    Mode      VARCHAR(50)  PATH '$.Mode',
+    PaidAt    DATETIME     PATH '$.TimeStamp',
+    MemberId  INT          PATH '$.MemberId',
+    PackageId INT          PATH '$.PackageId'
+  )) J;
+  SELECT ROW_COUNT() AS Inserted;
+  COMMIT;
+END//
+DELIMITER ;
+
+-- STEP 5 — STORED FUNCTIONS
+-- 5.1 Get membership end date (returns NULL if member has no payments)
+DELIMITER //
+CREATE FUNCTION fn_membership_end_date(p_member INT)
+RETURNS DATE
+READS SQL DATA
+BEGIN
+  DECLARE v_ts DATETIME; 
+  DECLARE v_weeks INT;
+  DECLARE v_result DATE;
+  
+  SELECT p.TimeStamp, pkg.DurationWeeks
+  INTO v_ts, v_weeks
+  FROM Payment p JOIN Package pkg ON p.PackageId=pkg.PackageId
+  WHERE p.MemberId=p_member ORDER BY p.TimeStamp DESC, p.PaymentId DESC LIMIT 1;
+  
+  IF v_ts IS NULL OR v_weeks IS NULL THEN
+    RETURN NULL;
+  END IF;
+  
+  SET v_result = DATE_ADD(DATE(v_ts), INTERVAL v_weeks WEEK);
+  RETURN v_result;
+END//
+DELIMITER ;
+
+
+-- 5.2 Check if member is active (returns 0 if no membership or expired)
 DELIMITER //
 CREATE FUNCTION fn_is_member_active(p_member INT)
 RETURNS TINYINT(1)
@@ -680,6 +2309,31 @@ BEGIN
 END//
 DELIMITER ;
 
+-- 5.3 Estimated one-rep max (Epley); a single rep is the weight itself
+DELIMITER //
+CREATE FUNCTION fn_estimated_1rm(p_weight DECIMAL(6,2), p_reps INT)
+RETURNS DECIMAL(7,2)
+DETERMINISTIC
+BEGIN
+  IF p_reps <= 1 THEN
+    RETURN p_weight;
+  END IF;
+  RETURN ROUND(p_weight * (1 + p_reps / 30), 2);
+END//
+DELIMITER ;
+
+
+-- STEP 5b — BACKFILL MATERIALIZED STATUS AND ROLLUPS
+-- Seed payments were inserted before the triggers existed
+CALL sp_rebuild_membership_status();
+-- Seed attendance was inserted before the rollup triggers existed
+CALL sp_rebuild_attendance_rollups();
+-- First expiry/renewal report (the batch worker refreshes it nightly)
+CALL sp_compute_membership_expiry(CURDATE(), 14, 30);
+-- Monthly audit partitions from 2025-01 through three months ahead. This first split copies
+-- every audit row since 2025-01 out of p_future, so on a large table run it off-peak
+CALL sp_extend_payment_audit_partitions(DATE_ADD(CURDATE(), INTERVAL 3 MONTH));
+
 
 -- STEP 6 — DEMONSTRATE
 -- (A) Test triggers
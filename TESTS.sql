@@ -113,6 +113,297 @@ BEGIN
     END IF;
     ROLLBACK;
   END;
+
+  -- Test 7: MembershipStatus matches fn_membership_end_date for every member
+  BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN INSERT INTO TestResults VALUES('T7_MembershipStatus_Consistent', 0, 'Check failed to run', NOW()); END;
+    SELECT COUNT(*) INTO v_cnt
+    FROM Member M
+    LEFT JOIN MembershipStatus MS ON MS.MemberId = M.MemberId
+    WHERE NOT (MS.EndDate <=> fn_membership_end_date(M.MemberId));
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T7_MembershipStatus_Consistent', 1, 'All members match', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T7_MembershipStatus_Consistent', 0, CONCAT(v_cnt, ' member(s) drifted; CALL sp_rebuild_membership_status()'), NOW());
+    END IF;
+  END;
+
+  -- Test 8: Payment INSERT and DELETE keep MembershipStatus in sync via triggers
+  _t8: BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T8_MembershipStatus_Trigger_Maintained', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Member(Name, Email, PhoneNo, JoinDate, Gender, PackageId, TrainerId)
+    VALUES('Temp Status Member', CONCAT('temp', UUID()), CONCAT('901', FLOOR(RAND()*10000000)), CURDATE(), 'F', NULL, NULL);
+    SET @tmp_member = LAST_INSERT_ID();
+    INSERT INTO Payment(Amount, Mode, TimeStamp, MemberId, PackageId)
+    VALUES(1499.00, 'Card', NOW(), @tmp_member, 2);
+    SET v_payment_id = LAST_INSERT_ID();
+    SELECT COUNT(*) INTO v_cnt FROM MembershipStatus
+    WHERE MemberId = @tmp_member AND LastPaymentId = v_payment_id
+      AND EndDate = DATE_ADD(CURDATE(), INTERVAL 4 WEEK);
+    IF v_cnt <> 1 THEN
+      ROLLBACK;
+      INSERT INTO TestResults VALUES('T8_MembershipStatus_Trigger_Maintained', 0, 'Status row missing after INSERT', NOW());
+      LEAVE _t8;
+    END IF;
+    DELETE FROM Payment WHERE PaymentId = v_payment_id;
+    SELECT COUNT(*) INTO v_cnt FROM MembershipStatus WHERE MemberId = @tmp_member;
+    -- roll back before recording so the result row is not undone with the fixture
+    ROLLBACK;
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T8_MembershipStatus_Trigger_Maintained', 1, 'Inserted and removed by triggers', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T8_MembershipStatus_Trigger_Maintained', 0, 'Status row left after DELETE', NOW());
+    END IF;
+  END _t8;
+
+  -- Test 9: Attendance INSERT/DELETE maintain the hourly and trainer rollups via triggers
+  _t9: BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T9_Attendance_Rollups_Trigger_Maintained', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Member(Name, Email, PhoneNo, JoinDate, Gender, PackageId, TrainerId)
+    VALUES('Temp Rollup Member', CONCAT('temp', UUID()), CONCAT('902', FLOOR(RAND()*10000000)), CURDATE(), 'M', NULL,
+           (SELECT MIN(TrainerId) FROM Trainer));
+    SET @tmp_member = LAST_INSERT_ID();
+    -- 07:30-09:10 => check-in in hour 7, present in hours 7, 8 and 9, 100 minutes
+    INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
+    VALUES(@tmp_member, '2099-02-02', '07:30:00', '09:10:00');
+    SELECT COUNT(*) INTO v_cnt FROM Attendance_HourlyRollup
+    WHERE BucketDate = '2099-02-02'
+      AND ((BucketHour = 7 AND CheckIns = 1 AND Present = 1 AND TimedVisits = 1 AND TotalMinutes = 100)
+        OR (BucketHour IN (8, 9) AND CheckIns = 0 AND Present = 1 AND TotalMinutes = 0));
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Attendance_TrainerDaily
+    WHERE BucketDate = '2099-02-02' AND Visits = 1 AND TotalMinutes = 100;
+    IF v_cnt <> 4 THEN
+      ROLLBACK;
+      INSERT INTO TestResults VALUES('T9_Attendance_Rollups_Trigger_Maintained', 0, 'Rollups not updated after INSERT', NOW());
+      LEAVE _t9;
+    END IF;
+    DELETE FROM Attendance WHERE MemberId = @tmp_member AND Date = '2099-02-02';
+    SELECT COUNT(*) INTO v_cnt FROM Attendance_HourlyRollup
+    WHERE BucketDate = '2099-02-02' AND (CheckIns <> 0 OR Present <> 0 OR TotalMinutes <> 0);
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Attendance_TrainerDaily
+    WHERE BucketDate = '2099-02-02' AND (Visits <> 0 OR TotalMinutes <> 0);
+    ROLLBACK;
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T9_Attendance_Rollups_Trigger_Maintained', 1, 'Added and removed by triggers', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T9_Attendance_Rollups_Trigger_Maintained', 0, 'Rollups not reverted after DELETE', NOW());
+    END IF;
+  END _t9;
+
+  -- Test 10: rollup totals agree with Attendance
+  BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN INSERT INTO TestResults VALUES('T10_Attendance_Rollups_Consistent', 0, 'Check failed to run', NOW()); END;
+    SELECT (SELECT COUNT(*) FROM Attendance WHERE Date IS NOT NULL AND CheckInTime IS NOT NULL)
+         - (SELECT IFNULL(SUM(CheckIns), 0) FROM Attendance_HourlyRollup)
+    INTO v_cnt;
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T10_Attendance_Rollups_Consistent', 1, 'Check-in totals match', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T10_Attendance_Rollups_Consistent', 0, CONCAT(v_cnt, ' visit(s) drifted; CALL sp_rebuild_attendance_rollups()'), NOW());
+    END IF;
+  END;
+
+  -- Test 11: audit rows land in monthly partitions, not the p_future catch-all
+  BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN INSERT INTO TestResults VALUES('T11_Payment_Audit_Partitions_Ahead', 0, 'Check failed to run', NOW()); END;
+    SELECT COUNT(*) INTO v_cnt FROM Payment_Audit PARTITION (p_future);
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T11_Payment_Audit_Partitions_Ahead', 1, 'p_future is empty', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T11_Payment_Audit_Partitions_Ahead', 0, CONCAT(v_cnt, ' row(s) in p_future; run flask archive-payment-audit'), NOW());
+    END IF;
+  END;
+
+  -- Test 12: the expiry batch picks exactly the memberships in its window, classified by date
+  -- (MembershipExpiry is derived data, so recomputing it here is harmless)
+  BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN INSERT INTO TestResults VALUES('T12_Membership_Expiry_Batch', 0, 'Batch failed to run', NOW()); END;
+    CALL sp_compute_membership_expiry(CURDATE(), 14, 30);
+    SELECT (SELECT COUNT(*) FROM MembershipStatus
+            WHERE EndDate BETWEEN DATE_SUB(CURDATE(), INTERVAL 30 DAY) AND DATE_ADD(CURDATE(), INTERVAL 14 DAY))
+         - (SELECT COUNT(*) FROM MembershipExpiry E JOIN MembershipStatus MS ON MS.MemberId = E.MemberId
+            WHERE E.EndDate = MS.EndDate
+              AND E.DaysLeft = DATEDIFF(MS.EndDate, CURDATE())
+              AND E.Status = IF(MS.EndDate < CURDATE(), 'Expired', 'Expiring'))
+         + (SELECT COUNT(*) FROM MembershipExpiry)
+         - (SELECT COUNT(*) FROM MembershipExpiry E JOIN MembershipStatus MS ON MS.MemberId = E.MemberId
+            WHERE E.EndDate = MS.EndDate)
+    INTO v_cnt;
+    IF v_cnt = 0 THEN
+      INSERT INTO TestResults VALUES('T12_Membership_Expiry_Batch', 1, 'Window and statuses match MembershipStatus', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T12_Membership_Expiry_Batch', 0, CONCAT(v_cnt, ' row(s) missing, extra or misclassified'), NOW());
+    END IF;
+  END;
+
+  -- Test 13: logging and deleting sets maintains sessions, weekly volume and records via triggers
+  _t13: BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T13_Workout_Aggregates_Trigger_Maintained', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Member(Name, Email, PhoneNo, JoinDate, Gender, PackageId, TrainerId)
+    VALUES('Temp Workout Member', CONCAT('temp', UUID()), CONCAT('903', FLOOR(RAND()*10000000)), CURDATE(), 'M', NULL, NULL);
+    SET @tmp_member = LAST_INSERT_ID();
+    SET @tmp_exercise = (SELECT MIN(ExerciseId) FROM Exercise);
+    -- 2099-02-02 is a Monday: 100 kg x 5 then 80 kg x 10 => 2 sets, 1300 kg, one session
+    INSERT INTO WorkoutSet(MemberId, SessionDate, ExerciseId, SetNo, Reps, WeightKg)
+    VALUES(@tmp_member, '2099-02-02', @tmp_exercise, 1, 5, 100),
+          (@tmp_member, '2099-02-02', @tmp_exercise, 2, 10, 80);
+    SELECT COUNT(*) INTO v_cnt FROM WorkoutSession
+    WHERE MemberId = @tmp_member AND SessionDate = '2099-02-02' AND Sets = 2 AND VolumeKg = 1300;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM WorkoutWeeklyVolume
+    WHERE MemberId = @tmp_member AND WeekStart = '2099-02-02' AND Sessions = 1 AND Sets = 2;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM WorkoutPersonalRecord
+    WHERE MemberId = @tmp_member AND ExerciseId = @tmp_exercise
+      AND MaxWeightKg = 100 AND MaxReps = 10 AND BestE1RM = 116.67;
+    IF v_cnt <> 3 THEN
+      ROLLBACK;
+      INSERT INTO TestResults VALUES('T13_Workout_Aggregates_Trigger_Maintained', 0, 'Aggregates not updated after INSERT', NOW());
+      LEAVE _t13;
+    END IF;
+    -- Removing the heaviest set re-derives the record from the remaining set
+    DELETE FROM WorkoutSet WHERE MemberId = @tmp_member AND SetNo = 1;
+    SELECT COUNT(*) INTO v_cnt FROM WorkoutPersonalRecord
+    WHERE MemberId = @tmp_member AND MaxWeightKg = 80 AND BestE1RM = 106.67;
+    DELETE FROM WorkoutSet WHERE MemberId = @tmp_member;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM WorkoutSession WHERE MemberId = @tmp_member;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM WorkoutWeeklyVolume WHERE MemberId = @tmp_member;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM WorkoutPersonalRecord WHERE MemberId = @tmp_member;
+    ROLLBACK;
+    IF v_cnt = 1 THEN
+      INSERT INTO TestResults VALUES('T13_Workout_Aggregates_Trigger_Maintained', 1, 'Added, re-derived and removed by triggers', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T13_Workout_Aggregates_Trigger_Maintained', 0, 'Aggregates not reverted after DELETE', NOW());
+    END IF;
+  END _t13;
+
+  -- Test 14: API projection selects exactly the requested fields and rejects unknown ones
+  BEGIN
+    DECLARE v_cols TEXT;
+    DECLARE v_rejected TINYINT DEFAULT 0;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION INSERT INTO TestResults VALUES('T14_API_Field_Projection', 0, 'Valid field list was rejected', NOW());
+    CALL sp_api_columns(JSON_ARRAY('Name', 'MemberId'),
+                        JSON_OBJECT('MemberId', 'M.MemberId', 'Name', 'M.Name', 'Email', 'M.Email'), v_cols);
+    BEGIN
+      DECLARE CONTINUE HANDLER FOR SQLSTATE '45000' SET v_rejected = 1;
+      CALL sp_api_columns(JSON_ARRAY('Name', 'Password'), JSON_OBJECT('Name', 'M.Name'), @t14_cols);
+    END;
+    IF v_cols = 'M.Name AS Name, M.MemberId AS MemberId' AND v_rejected = 1 THEN
+      INSERT INTO TestResults VALUES('T14_API_Field_Projection', 1, 'Requested columns only; unknown field rejected', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T14_API_Field_Projection', 0, CONCAT('Got "', IFNULL(v_cols, 'NULL'), '", rejected=', v_rejected), NOW());
+    END IF;
+  END;
+
+  -- Test 15: checking out an open visit (the sp_record_checkout UPDATE) re-buckets the rollups once
+  _t15: BEGIN
+    DECLARE v_rejected TINYINT DEFAULT 0;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T15_Checkout_Open_Visit', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Member(Name, Email, PhoneNo, JoinDate, Gender, PackageId, TrainerId)
+    VALUES('Temp Checkout Member', CONCAT('temp', UUID()), CONCAT('904', FLOOR(RAND()*10000000)), CURDATE(), 'F', NULL,
+           (SELECT MIN(TrainerId) FROM Trainer));
+    SET @tmp_member = LAST_INSERT_ID();
+    INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
+    VALUES(@tmp_member, '2099-03-03', '07:30:00', NULL);
+    BEGIN
+      DECLARE CONTINUE HANDLER FOR SQLSTATE '45000' SET v_rejected = 1;
+      UPDATE Attendance SET CheckOutTime = '07:00:00'
+      WHERE MemberId = @tmp_member AND Date = '2099-03-03' AND CheckOutTime IS NULL;
+    END;
+    UPDATE Attendance SET CheckOutTime = '09:10:00'
+    WHERE MemberId = @tmp_member AND Date = '2099-03-03' AND CheckOutTime IS NULL;
+    -- A second check-out finds no open visit
+    UPDATE Attendance SET CheckOutTime = '10:00:00'
+    WHERE MemberId = @tmp_member AND Date = '2099-03-03' AND CheckOutTime IS NULL;
+    SELECT COUNT(*) INTO v_cnt FROM Attendance_TrainerDaily
+    WHERE BucketDate = '2099-03-03' AND Visits = 1 AND TimedVisits = 1 AND TotalMinutes = 100;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Attendance_HourlyRollup
+    WHERE BucketDate = '2099-03-03' AND BucketHour IN (7, 8, 9) AND Present = 1;
+    ROLLBACK;
+    IF v_cnt = 4 AND v_rejected = 1 THEN
+      INSERT INTO TestResults VALUES('T15_Checkout_Open_Visit', 1, 'Early check-out rejected; visit timed once', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T15_Checkout_Open_Visit', 0, CONCAT(v_cnt, ' of 4 rollup rows match, rejected=', v_rejected), NOW());
+    END IF;
+  END _t15;
+
+  -- Test 16: a password rehash only replaces the value it read (compare-and-set)
+  _t16: BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T16_Password_Rehash_Guard', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Member(Name, Email, PhoneNo, Password, JoinDate)
+    VALUES('Temp Login Member', CONCAT('temp', UUID()), CONCAT('905', FLOOR(RAND()*10000000)), 'Secret1', CURDATE());
+    SET @tmp_member = LAST_INSERT_ID();
+    -- Stale read (case differs): must not overwrite
+    CALL sp_set_password_hash('member', @tmp_member, 'secret1', 'pbkdf2:sha256:1$stale$x');
+    SELECT COUNT(*) INTO v_cnt FROM Member WHERE MemberId = @tmp_member AND Password = 'Secret1' COLLATE utf8mb4_bin;
+    CALL sp_set_password_hash('member', @tmp_member, 'Secret1', 'pbkdf2:sha256:1$fresh$x');
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Member WHERE MemberId = @tmp_member AND Password = 'pbkdf2:sha256:1$fresh$x';
+    ROLLBACK;
+    IF v_cnt = 2 THEN
+      INSERT INTO TestResults VALUES('T16_Password_Rehash_Guard', 1, 'Stale value kept; matching value replaced', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T16_Password_Rehash_Guard', 0, CONCAT(v_cnt, ' of 2 checks passed'), NOW());
+    END IF;
+  END _t16;
+
+  -- Test 17: an import batch is all or nothing; a clean batch gets the default hash passed in
+  -- (sp_import_members commits itself, so the test removes its member afterwards)
+  _t17: BEGIN
+    DECLARE v_rejected TINYINT DEFAULT 0;
+    DECLARE v_email VARCHAR(150) DEFAULT CONCAT('temp', UUID());
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN DELETE FROM Member WHERE Email = v_email; INSERT INTO TestResults VALUES('T17_Import_Batch_Atomic', 0, 'Setup failed', NOW()); END;
+    BEGIN
+      DECLARE CONTINUE HANDLER FOR 1062 SET v_rejected = 1;
+      CALL sp_import_members(JSON_ARRAY(
+        JSON_OBJECT('Name', 'Temp Import A', 'Email', v_email),
+        JSON_OBJECT('Name', 'Temp Import B', 'Email', v_email)), 'pbkdf2:sha256:1$test$default');
+    END;
+    SELECT COUNT(*) INTO v_cnt FROM Member WHERE Email = v_email;
+    CALL sp_import_members(JSON_ARRAY(JSON_OBJECT('Name', 'Temp Import A', 'Email', v_email)), 'pbkdf2:sha256:1$test$default');
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Member WHERE Email = v_email AND Password = 'pbkdf2:sha256:1$test$default';
+    DELETE FROM Member WHERE Email = v_email;
+    IF v_cnt = 1 AND v_rejected = 1 THEN
+      INSERT INTO TestResults VALUES('T17_Import_Batch_Atomic', 1, 'Failing batch rolled back; clean batch inserted', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T17_Import_Batch_Atomic', 0, CONCAT(v_cnt, ' member row(s), rejected=', v_rejected), NOW());
+    END IF;
+  END _t17;
+
+  -- Test 18: reassigning a member moves their visits, so deleting an old visit debits the new trainer
+  _t18: BEGIN
+    DECLARE v_old_trainer INT;
+    DECLARE v_new_trainer INT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION BEGIN ROLLBACK; INSERT INTO TestResults VALUES('T18_Trainer_Change_Moves_Rollups', 0, 'Setup failed', NOW()); END;
+    START TRANSACTION;
+    INSERT INTO Trainer(TrainerName) VALUES('Temp Old Trainer');
+    SET v_old_trainer = LAST_INSERT_ID();
+    INSERT INTO Trainer(TrainerName) VALUES('Temp New Trainer');
+    SET v_new_trainer = LAST_INSERT_ID();
+    INSERT INTO Member(Name, Email, PhoneNo, JoinDate, Gender, PackageId, TrainerId)
+    VALUES('Temp Reassigned Member', CONCAT('temp', UUID()), CONCAT('906', FLOOR(RAND()*10000000)), CURDATE(), 'M', NULL, v_old_trainer);
+    SET @tmp_member = LAST_INSERT_ID();
+    INSERT INTO Attendance(MemberId, Date, CheckInTime, CheckOutTime)
+    VALUES(@tmp_member, '2099-04-04', '07:30:00', '09:10:00'),
+          (@tmp_member, '2099-04-05', '18:00:00', NULL);
+    UPDATE Member SET TrainerId = v_new_trainer WHERE MemberId = @tmp_member;
+    DELETE FROM Attendance WHERE MemberId = @tmp_member AND Date = '2099-04-04';
+    -- Old trainer: both days emptied; new trainer: only the remaining untimed visit
+    SELECT COUNT(*) INTO v_cnt FROM Attendance_TrainerDaily
+    WHERE TrainerId = v_old_trainer AND Visits = 0 AND TimedVisits = 0 AND TotalMinutes = 0;
+    SELECT v_cnt + COUNT(*) INTO v_cnt FROM Attendance_TrainerDaily
+    WHERE TrainerId = v_new_trainer
+      AND ((BucketDate = '2099-04-04' AND Visits = 0 AND TimedVisits = 0 AND TotalMinutes = 0)
+        OR (BucketDate = '2099-04-05' AND Visits = 1 AND TimedVisits = 0 AND TotalMinutes = 0));
+    ROLLBACK;
+    IF v_cnt = 4 THEN
+      INSERT INTO TestResults VALUES('T18_Trainer_Change_Moves_Rollups', 1, 'Visits moved to the new trainer; none below zero', NOW());
+    ELSE
+      INSERT INTO TestResults VALUES('T18_Trainer_Change_Moves_Rollups', 0, CONCAT(v_cnt, ' of 4 rollup rows match'), NOW());
+    END IF;
+  END _t18;
 END //
 DELIMITER ;
 
@@ -1,59 +1,489 @@
+import base64
+import csv
+import gzip
+import hmac
+import io
+import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as _date_type, datetime as _datetime_type, time as _time_type, timedelta
+from decimal import Decimal
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+import click
+from flask import Blueprint, Flask, Response, current_app, render_template, request, redirect, url_for, flash, session, g, jsonify
+from flask import before_render_template, has_request_context, send_file, stream_template, template_rendered
+from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.utils import secure_filename
 import pymysql
 from dotenv import load_dotenv
 
+from breaker import CircuitBreaker, CircuitOpenError
+from config import get_config
+from db_pool import ConnectionPool, PoolTimeout
+from importer import ImportJob, ImportJobError
+from metrics import Registry
+from migrate import MigrationError, MigrationRunner
+from occupancy import OccupancyIndex
+from query_cache import QueryCache
+from replicas import ReplicaSet
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Debug: Print DB config (remove password for security)
-if __name__ == '__main__':
-    print(f"DB_HOST: {os.getenv('DB_HOST')}")
-    print(f"DB_USER: {os.getenv('DB_USER')}")
-    print(f"DB_PASSWORD: {'*' * len(os.getenv('DB_PASSWORD', ''))} (length: {len(os.getenv('DB_PASSWORD', ''))})")
-    print(f"DB_NAME: {os.getenv('DB_NAME')}")
+
+def open_db_connection(config):
+    """Open a new MySQL database connection using PyMySQL"""
+    return pymysql.connect(
+        host=config['DB_HOST'],
+        user=config['DB_USER'],
+        password=config['DB_PASSWORD'],
+        database=config['DB_NAME'],
+        cursorclass=pymysql.cursors.DictCursor,
+        autocommit=False,
+        connect_timeout=config['DB_CONNECT_TIMEOUT'],
+        read_timeout=config['DB_READ_TIMEOUT'] or None,
+        write_timeout=config['DB_WRITE_TIMEOUT'] or None,
+    )
 
 
-def get_db_connection():
-    """Get MySQL database connection using PyMySQL"""
+def _database_disabled():
+    raise RuntimeError('Database access is disabled in this configuration (DB_ENABLED = False)')
+
+
+def _build_pool(config):
+    """Shared, bounded pool; connections are opened lazily on first checkout"""
+    return ConnectionPool(
+        (lambda: open_db_connection(config)) if config['DB_ENABLED'] else _database_disabled,
+        max_size=config['DB_POOL_SIZE'],
+        timeout=config['DB_POOL_TIMEOUT'],
+        max_lifetime=config['DB_POOL_MAX_LIFETIME'],
+        ping_interval=config['DB_POOL_PING_INTERVAL'],
+    )
+
+
+# Per-process pools and breaker, built by create_app() from the app's config
+db_pool = None
+replicas = None
+db_breaker = None
+
+
+# ---------- Read replicas (optional) ----------
+# DB_REPLICA_HOSTS=host[:port],... enables read routing; user/password/schema default to the
+# primary's, so a second schema on the same server works as a local stand-in replica.
+
+
+def open_replica_connection(config, host, port):
+    """Open a read-only MySQL connection to one replica"""
     return pymysql.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        user=os.getenv('DB_USER', 'root'),
-        password=os.getenv('DB_PASSWORD', ''),
-        database=os.getenv('DB_NAME', 'GymMemberShip_WorkOutTracker'),
+        host=host,
+        port=port,
+        user=config['DB_REPLICA_USER'],
+        password=config['DB_REPLICA_PASSWORD'],
+        database=config['DB_REPLICA_NAME'],
         cursorclass=pymysql.cursors.DictCursor,
         autocommit=False,
+        init_command='SET SESSION TRANSACTION READ ONLY',
+        connect_timeout=config['DB_REPLICA_CONNECT_TIMEOUT'],
+        read_timeout=config['DB_READ_TIMEOUT'] or None,
+        write_timeout=config['DB_WRITE_TIMEOUT'] or None,
     )
 
 
-app = Flask(__name__)
-app.secret_key = os.getenv('FLASK_SECRET', 'dev-secret')
+def replica_lag_seconds(conn):
+    """Seconds behind the source; 0 for a server that is not replicating, None if replication stopped"""
+    with conn.cursor() as cur:
+        try:
+            cur.execute('SHOW REPLICA STATUS')
+        except pymysql.err.ProgrammingError:
+            cur.execute('SHOW SLAVE STATUS')  # MySQL < 8.0.22
+        row = cur.fetchone()
+    if not row:
+        return 0.0
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+
+def _build_replicas(config):
+    hosts = config['DB_REPLICA_HOSTS']
+    if not hosts or not config['DB_ENABLED']:
+        return None
+    pools, names = [], []
+    for entry in hosts:
+        host, _, port = entry.partition(':')
+        port = int(port or 3306)
+        pools.append(ConnectionPool(
+            lambda host=host, port=port: open_replica_connection(config, host, port),
+            max_size=config['DB_REPLICA_POOL_SIZE'],
+            timeout=config['DB_POOL_TIMEOUT'],
+            max_lifetime=config['DB_POOL_MAX_LIFETIME'],
+            ping_interval=config['DB_POOL_PING_INTERVAL'],
+        ))
+        names.append(f'{host}:{port}')
+    return ReplicaSet(
+        pools,
+        replica_lag_seconds,
+        max_lag=config['REPLICA_MAX_LAG_SECONDS'],
+        check_interval=config['REPLICA_CHECK_INTERVAL'],
+        acquire_timeout=config['REPLICA_ACQUIRE_TIMEOUT'],
+        names=names,
+    )
+
+
+def configure_database(config):
+    """(Re)build this process's primary pool, replica set and circuit breaker from ``config``"""
+    global db_pool, replicas, db_breaker
+    for old in (db_pool, replicas):
+        if old is not None:
+            old.close_all()
+    db_pool = _build_pool(config)
+    replicas = _build_replicas(config)
+    db_breaker = CircuitBreaker(
+        'database',
+        failure_threshold=config['DB_BREAKER_FAILURES'],
+        reset_timeout=config['DB_BREAKER_RESET_SECONDS'],
+        half_open_max=config['DB_BREAKER_HALF_OPEN_TRIALS'],
+    )
+
+
+# ---------- Instrumentation ----------
+metrics = Registry()
+DB_QUERY_SECONDS = metrics.histogram('gym_db_query_seconds', 'Stored procedure / statement latency', ('procedure',))
+DB_QUERY_ROWS = metrics.counter('gym_db_query_rows_total', 'Rows returned per procedure', ('procedure',))
+DB_QUERY_ERRORS = metrics.counter('gym_db_query_errors_total', 'Failed calls per procedure (including silenced ones)', ('procedure',))
+DB_ACQUIRE_SECONDS = metrics.histogram('gym_db_acquire_seconds', 'Time to check out a pooled connection')
+DB_ACQUIRE_ERRORS = metrics.counter('gym_db_acquire_errors_total', 'Failed connection checkouts (pool timeout or connect error)')
+TEMPLATE_SECONDS = metrics.histogram('gym_template_render_seconds', 'Template render time', ('template',))
+HTTP_REQUEST_SECONDS = metrics.histogram('gym_http_request_seconds', 'Request handling time per route', ('endpoint', 'method', 'status'))
+DB_READS = metrics.counter('gym_db_reads_total', 'Read queries by where they were routed', ('target',))
+metrics.gauge(
+    'gym_db_pool_connections', 'Pooled connections by state', ('state',),
+    fn=lambda: {(k,): v for k, v in (db_pool.stats() if db_pool else {}).items()},
+)
+metrics.gauge(
+    'gym_db_replica_healthy', 'Whether each replica currently takes reads', ('replica',),
+    fn=lambda: {(name, ): int(st['healthy']) for name, st in (replicas.stats() if replicas else {}).items()},
+)
+metrics.gauge(
+    'gym_db_replica_lag_seconds', 'Last measured replication lag per replica', ('replica',),
+    fn=lambda: {
+        (name,): st['lag'] for name, st in (replicas.stats() if replicas else {}).items() if st['lag'] is not None
+    },
+)
+
+
+def record_query(procedure, seconds, rows=0, error=False):
+    DB_QUERY_SECONDS.observe(seconds, procedure=procedure)
+    if error:
+        DB_QUERY_ERRORS.inc(procedure=procedure)
+    else:
+        DB_QUERY_ROWS.inc(rows, procedure=procedure)
+    if seconds * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        current_app.logger.warning('Slow query: %s took %.1f ms (%s)', procedure, seconds * 1000, 'error' if error else f'{rows} rows')
+
+
+# ---------- Fail-fast database access ----------
+# MySQL client/server error codes meaning the server is unreachable, gone or timed out,
+# as opposed to a statement that failed (SIGNALs, constraint violations, syntax)
+_OUTAGE_ERRORS = {1040, 1053, 2002, 2003, 2006, 2013, 2055}
+
+metrics.gauge(
+    'gym_db_breaker', 'Primary database circuit breaker (state: 0 closed, 1 half-open, 2 open)', ('stat',),
+    fn=lambda: {
+        (k,): CircuitBreaker.STATE_CODES[v] if k == 'state' else v
+        for k, v in (db_breaker.stats() if db_breaker else {}).items() if k != 'last_error'
+    },
+)
+
+
+def is_outage(exc):
+    """Whether ``exc`` means the database is down or too slow rather than that the statement failed.
+
+    A PoolTimeout is not one: every connection being busy is load on a healthy server, and
+    counting it would let a latency spike open the breaker and fail every request.
+    """
+    if isinstance(exc, pymysql.err.InterfaceError):
+        return True
+    return isinstance(exc, pymysql.err.OperationalError) and bool(exc.args) and exc.args[0] in _OUTAGE_ERRORS
+
+
+def guard_database():
+    """Admit a database call from this context or raise CircuitOpenError at once; returns the trial flag.
+
+    After one outage error a request stops calling MySQL altogether, so a page with
+    several queries waits for one timeout, not one per query.
+    """
+    if g.get('db_unavailable'):
+        raise CircuitOpenError('Database unavailable (an earlier query in this request failed)', db_breaker.retry_after())
+    try:
+        return db_breaker.before_call()
+    except CircuitOpenError:
+        g.db_unavailable = True
+        raise
+
+
+def report_database(trial, error=None):
+    """Tell the breaker how an admitted call went (``error`` None = success)"""
+    if error is None or (isinstance(error, pymysql.MySQLError) and not is_outage(error)):
+        # The server answered, even if only to reject the statement
+        db_breaker.record_success(trial)
+    elif is_outage(error):
+        g.db_unavailable = True
+        db_breaker.record_failure(trial, error)
+    else:
+        db_breaker.release(trial)
+
+
+def db_error_status(e):
+    """(status, headers) for a failed database call: 503 + Retry-After when the database is unavailable, else 500"""
+    if isinstance(e, (CircuitOpenError, PoolTimeout)) or is_outage(e):
+        retry_after = e.retry_after if isinstance(e, CircuitOpenError) else db_breaker.retry_after()
+        return 503, {'Retry-After': str(max(1, round(retry_after)))}
+    return 500, {}
+
+
+def get_db_connection():
+    """Get this request's pooled connection (checked out once, returned on teardown)"""
+    if 'db_conn' not in g:
+        started = time.perf_counter()
+        try:
+            g.db_conn = db_pool.acquire()
+        except Exception:
+            DB_ACQUIRE_ERRORS.inc()
+            raise
+        finally:
+            DB_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+    return g.db_conn
+
+
+def drop_read_replica(error):
+    """Take this context's replica out of rotation after an outage error; later reads use the primary"""
+    pool, conn = g.pop('db_read_pool'), g.pop('db_read_conn')
+    replicas.mark_down(pool, error)
+    pool.release(conn, discard=True)
+    g.use_replica = False
+
+
+def reads_use_replica():
+    """Whether reads in this context may go to a replica.
+
+    Only for GET/HEAD requests: writes, reads inside write requests and reads within
+    READ_YOUR_WRITES_SECONDS of this session's last write stay on the primary.
+    """
+    if replicas is None:
+        return False
+    if 'use_replica' not in g:
+        g.use_replica = (
+            has_request_context()
+            and request.method in ('GET', 'HEAD')
+            and session.get('primary_until', 0) <= time.time()
+        )
+    return g.use_replica
+
+
+def get_read_connection():
+    """This request's connection for read-only calls: a replica when allowed and healthy, else the primary"""
+    if not reads_use_replica():
+        return get_db_connection()
+    if 'db_read_conn' not in g:
+        checkout = replicas.acquire()
+        if checkout is None:
+            g.use_replica = False
+            return get_db_connection()
+        g.db_read_pool, g.db_read_conn = checkout
+    return g.db_read_conn
+
+
+def acquire_read_connection():
+    """Dedicated ``(pool, conn)`` checkout for long reads (exports); release with ``pool.release``"""
+    checkout = replicas.acquire() if reads_use_replica() else None
+    if checkout is not None:
+        return checkout
+    trial = guard_database()
+    try:
+        conn = db_pool.acquire()
+    except Exception as e:
+        report_database(trial, e)
+        raise
+    report_database(trial)
+    return db_pool, conn
+
+
+def pin_reads_to_primary():
+    """After a write, keep this context (and the session, briefly) reading from the primary"""
+    g.use_replica = False
+    if replicas is not None and has_request_context():
+        session['primary_until'] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+# Every route, hook and CLI command lives on this blueprint; create_app() registers it
+bp = Blueprint('gym', __name__, cli_group=None)
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@bp.after_app_request
+def record_request_timing(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
+
 
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_timers', []).append(time.perf_counter())
 
-@app.route('/')
+
+def _template_finished(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if timers:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - timers.pop(), template=template.name or 'inline')
+
+
+def release_db_connection(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn, discard=exc is not None)
+    read_conn = g.pop('db_read_conn', None)
+    if read_conn is not None:
+        g.pop('db_read_pool').release(read_conn, discard=exc is not None)
+
+
+@bp.app_context_processor
+def inject_db_status():
+    """Degraded-mode flags for the banner in base.html"""
+    unavailable, stale = g.get('db_unavailable', False), g.get('db_stale', False)
+    retry_after = round(db_breaker.retry_after()) if (unavailable or stale) and db_breaker else 0
+    return {'db_status': {'unavailable': unavailable, 'stale': stale, 'retry_after': retry_after}}
+
+
+@bp.app_errorhandler(CircuitOpenError)
+def database_unavailable(e):
+    """Fast 503 for handlers that let a fail-fast error escape"""
+    status, headers = db_error_status(e)
+    if request.path.startswith('/api/'):
+        return jsonify({'error': str(e)}), status, headers
+    return render_template('errors/unavailable.html', message=str(e)), status, headers
+
+
+@bp.route('/')
 def index():
     role = session.get('role')
     if not role:
-        return redirect(url_for('login'))
-    return redirect(url_for('dashboard'))
+        return redirect(url_for('.login'))
+    return redirect(url_for('.dashboard'))
 
 
 # ---------------- Auth (very simple demo) ----------------
+def role_allowed(allowed_roles):
+    """Whether the session's role may use an endpoint limited to ``allowed_roles`` (empty = any role)"""
+    role = session.get('role')
+    return role is not None and (not allowed_roles or role in allowed_roles)
+
+
 def role_required(*allowed_roles):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            role = session.get('role')
-            if role is None or (allowed_roles and role not in allowed_roles):
+            if not role_allowed(allowed_roles):
                 flash('Not authorized', 'danger')
-                return redirect(url_for('login'))
+                return redirect(url_for('.login'))
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
 
-@app.route('/login', methods=['GET', 'POST'])
+def api_role_required(*allowed_roles):
+    """role_required for JSON clients: a 401/403 JSON error instead of a redirect to the login page"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if session.get('role') is None:
+                return api_error('Not logged in', 401)
+            if not role_allowed(allowed_roles):
+                return api_error('Not authorized', 403)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------- Identity lookup and password hashing ----------
+# PASSWORD_HASH_METHOD is a werkzeug method string; the cost is part of it
+# (pbkdf2:sha256:<iterations> or scrypt:<n>:<r>:<p>). Time it with `flask --app app password-hash-cost`.
+
+# Login tries the accounts sharing an email in this order
+IDENTITY_ROLES = ('admin', 'member', 'trainer')
+IDENTITY_TABLES = ('Admin', 'Member', 'Trainer')
+
+# email -> identity rows, including empty results for unknown emails (kept IDENTITY_NEGATIVE_TTL);
+# built by configure_process() from the app's config
+identity_cache = None
+metrics.gauge(
+    'gym_identity_cache', 'Login identity cache counters', ('stat',),
+    fn=lambda: {(k,): v for k, v in (identity_cache.stats() if identity_cache else {}).items()},
+)
+# method -> a hash of a random password made with it
+_reference_hashes = {}
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(password, method=method or current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def reference_hash():
+    """A hash made with the configured method: checked for unknown emails so they cost the same as wrong passwords"""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if method not in _reference_hashes:
+        _reference_hashes[method] = hash_password(os.urandom(16).hex(), method)
+    return _reference_hashes[method]
+
+
+def is_password_hash(stored):
+    return bool(stored) and stored.startswith(('pbkdf2:', 'scrypt:')) and stored.count('$') == 2
+
+
+def check_password(stored, password):
+    """``(matches, needs_rehash)`` for a stored hash or a legacy plaintext password"""
+    if is_password_hash(stored):
+        matches = check_password_hash(stored, password)
+        # The stored method carries the cost it was made with; rehash when the setting changed
+        return matches, matches and stored.split('$', 1)[0] != reference_hash().split('$', 1)[0]
+    matches = stored is not None and hmac.compare_digest(stored.encode(), password.encode())
+    return matches, matches
+
+
+def lookup_identity(email):
+    """Every account using ``email`` as ``{Role, UserId, Name, Password}`` rows in login order (one round trip, cached)"""
+    key = email.lower()
+    hit, rows = identity_cache.get(key)
+    if hit:
+        return rows
+    rows = execute_query('CALL sp_get_identity_by_email(%s)', (email,))
+    rows = sorted(rows, key=lambda row: IDENTITY_ROLES.index(row['Role']))
+    identity_cache.set(key, rows, IDENTITY_TABLES, ttl=None if rows else current_app.config['IDENTITY_NEGATIVE_TTL'])
+    return rows
+
+
+def upgrade_password(identity, password):
+    """Replace a plaintext or outdated-cost hash after a successful login; best effort"""
+    execute_query(
+        'CALL sp_set_password_hash(%s,%s,%s,%s)',
+        (identity['Role'], identity['UserId'], identity['Password'], hash_password(password)),
+        commit=True, silent=True,
+    )
+
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Unified login page with email and password"""
     if request.method == 'POST':
@@ -65,32 +495,20 @@ def login():
             return render_template('auth/login.html')
         
         try:
-            # Try Admin first
-            admin = execute_query('CALL sp_get_admin_by_email(%s)', (email,), silent=True)
-            if admin and admin[0]['Password'] == password:
-                session['role'] = 'admin'
-                session['user_id'] = admin[0]['AdminId']
-                session['user_name'] = admin[0]['Name']
-                flash('Logged in as admin', 'success')
-                return redirect(url_for('dashboard'))
-            
-            # Try Member
-            member = execute_query('CALL sp_get_member_by_email(%s)', (email,), silent=True)
-            if member and member[0]['Password'] == password:
-                session['role'] = 'member'
-                session['user_id'] = member[0]['MemberId']
-                session['user_name'] = member[0]['Name']
-                flash('Logged in as member', 'success')
-                return redirect(url_for('dashboard'))
-            
-            # Try Trainer
-            trainer = execute_query('CALL sp_get_trainer_by_email(%s)', (email,), silent=True)
-            if trainer and trainer[0]['Password'] == password:
-                session['role'] = 'trainer'
-                session['user_id'] = trainer[0]['TrainerId']
-                session['user_name'] = trainer[0]['TrainerName']
-                flash('Logged in as trainer', 'success')
-                return redirect(url_for('dashboard'))
+            identities = lookup_identity(email)
+            if not identities:
+                check_password(reference_hash(), password)
+            for identity in identities:
+                matches, needs_rehash = check_password(identity['Password'], password)
+                if not matches:
+                    continue
+                if needs_rehash:
+                    upgrade_password(identity, password)
+                session['role'] = identity['Role']
+                session['user_id'] = identity['UserId']
+                session['user_name'] = identity['Name']
+                flash(f"Logged in as {identity['Role']}", 'success')
+                return redirect(url_for('.dashboard'))
             
             flash('Invalid email or password', 'danger')
         except Exception as e:
@@ -99,65 +517,387 @@ def login():
     return render_template('auth/login.html')
 
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('Logged out', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 
 # ---------- Role-based Dashboard ----------
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     role = session.get('role')
     if not role:
-        return redirect(url_for('login'))
+        return redirect(url_for('.login'))
     return render_template('dashboard.html', role=role, user_name=session.get('user_name'))
 
 
+# ---------- Reference-data cache ----------
+# Read-only procedures whose results are cached, with the tables each one reads
+CACHED_PROCEDURES = {
+    'sp_list_packages': ('Package',),
+    'sp_get_package_price': ('Package',),
+    'sp_list_trainers': ('Trainer',),
+    'sp_list_workout_plans': ('WorkOutPlan',),
+    'sp_list_equipment': ('Equipment',),
+    'sp_list_exercises': ('Exercise', 'Equipment'),
+}
+
+# Tables written by each write procedure; commits through any other statement clear the whole cache
+PROCEDURE_WRITES = {
+    'sp_create_member': ('Member',),
+    'sp_update_member': ('Member', 'Attendance_TrainerDaily'),
+    'sp_delete_member': (
+        'Member', 'Attendance', 'Attendance_HourlyRollup', 'Attendance_TrainerDaily',
+        'Member_WorkOutPlan', 'Payment', 'Payment_Audit', 'MembershipStatus', 'MembershipExpiry',
+        'WorkoutSet', 'WorkoutSession', 'WorkoutWeeklyVolume', 'WorkoutPersonalRecord',
+    ),
+    'sp_enroll_member_to_plan': ('Member_WorkOutPlan',),
+    'sp_make_payment': ('Payment', 'Payment_Audit', 'MembershipStatus'),
+    'sp_rebuild_membership_status': ('MembershipStatus',),
+    'sp_compute_membership_expiry': ('MembershipExpiry', 'MembershipExpiryRun'),
+    'sp_rebuild_attendance_rollups': ('Attendance_HourlyRollup', 'Attendance_TrainerDaily'),
+    'sp_record_attendance': ('Attendance', 'Attendance_HourlyRollup', 'Attendance_TrainerDaily'),
+    'sp_record_attendance_batch': ('Attendance', 'Attendance_HourlyRollup', 'Attendance_TrainerDaily'),
+    'sp_record_checkout': ('Attendance', 'Attendance_HourlyRollup', 'Attendance_TrainerDaily'),
+    'sp_log_workout_sets': ('WorkoutSet', 'WorkoutSession', 'WorkoutWeeklyVolume', 'WorkoutPersonalRecord'),
+    'sp_rebuild_workout_aggregates': ('WorkoutSession', 'WorkoutWeeklyVolume', 'WorkoutPersonalRecord'),
+    'sp_extend_payment_audit_partitions': ('Payment_Audit',),
+    'sp_drop_payment_audit_partition': ('Payment_Audit',),
+    'sp_restore_payment_audit': ('Payment_Audit',),
+    'sp_set_password_hash': ('Admin', 'Member', 'Trainer'),
+    'sp_import_members': ('Member',),
+    'sp_import_payments': ('Payment', 'Payment_Audit', 'MembershipStatus'),
+}
+
+# Built by configure_process() from the app's config
+query_cache = None
+
+_CALL_RE = re.compile(r'^\s*CALL\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def procedure_name(sql):
+    """Name of the stored procedure invoked by ``sql``, or None for plain statements"""
+    match = _CALL_RE.match(sql)
+    return match.group(1) if match else None
+
+
+def invalidate_cache_for(procedure):
+    """Drop cached results that depend on tables written by ``procedure``"""
+    tables = PROCEDURE_WRITES.get(procedure)
+    if tables is None:
+        query_cache.clear()
+        identity_cache.clear()
+    else:
+        query_cache.invalidate_tables(tables)
+        identity_cache.invalidate_tables(tables)
+
+
+def _run_query(conn, sql, params, commit, procedure, cache_key):
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params or ())
+            if commit:
+                conn.commit()
+                invalidate_cache_for(procedure)
+            if cur.description:
+                rows = cur.fetchall()
+                if cache_key is not None:
+                    query_cache.set(cache_key, rows, CACHED_PROCEDURES[procedure])
+                    return [dict(row) for row in rows]
+                return rows
+            return None
+    except Exception:
+        conn.rollback()
+        raise
+
+
 def execute_query(sql, params=None, commit=False, silent=False):
-    """Execute MySQL query with error handling. Returns empty list/None on error if silent=True."""
+    """Execute MySQL query with error handling. Returns empty list/None on error if silent=True.
+
+    While the database is unavailable this fails fast with CircuitOpenError, and cached
+    reference data is served stale instead (flagged on ``g.db_stale`` for the banner).
+    """
+    procedure = procedure_name(sql)
+    label = procedure or 'sql'
+    cache_key = None
+    if not commit and procedure in CACHED_PROCEDURES:
+        cache_key = (procedure, tuple(params or ()))
+        hit, rows = query_cache.get(cache_key)
+        if hit:
+            return [dict(row) for row in rows]
+    started = None
+    conn = None
+    trial = False
     try:
-        conn = get_db_connection()
+        trial = guard_database()
+        if commit:
+            conn = get_db_connection()
+        else:
+            conn = get_read_connection()
+            DB_READS.inc(target='replica' if conn is g.get('db_read_conn') else 'primary')
+        started = time.perf_counter()
         try:
-            with conn.cursor() as cur:
-                cur.execute(sql, params or ())
-                if commit:
-                    conn.commit()
-                if cur.description:
-                    return cur.fetchall()
-                return None
+            result = _run_query(conn, sql, params, commit, procedure, cache_key)
         except Exception as e:
-            if commit:
-                conn.rollback()
-            if silent:
-                if commit:
-                    return None
-                return []
-            raise e
-        finally:
-            conn.close()
+            if conn is not g.get('db_read_conn') or not is_outage(e):
+                raise
+            # The replica passed its health check but died mid-query: ask the primary once
+            db_breaker.release(trial)
+            drop_read_replica(e)
+            started = None
+            trial = guard_database()
+            conn = get_db_connection()
+            DB_READS.inc(target='primary')
+            started = time.perf_counter()
+            result = _run_query(conn, sql, params, commit, procedure, cache_key)
+        if commit:
+            pin_reads_to_primary()
     except Exception as e:
+        if not isinstance(e, CircuitOpenError):
+            if conn is not None and conn is g.get('db_read_conn'):
+                # Replica trouble is the replica set's business; the primary was never asked
+                db_breaker.release(trial)
+            else:
+                report_database(trial, e)
+        if started is None:
+            # Never reached MySQL (pool timeout / connect error): count it, but keep latency clean
+            DB_QUERY_ERRORS.inc(procedure=label)
+        else:
+            record_query(label, time.perf_counter() - started, error=True)
+        if cache_key is not None and (isinstance(e, (CircuitOpenError, PoolTimeout)) or is_outage(e)):
+            hit, rows = query_cache.get_stale(cache_key)
+            if hit:
+                g.db_stale = True
+                return [dict(row) for row in rows]
         if silent:
+            current_app.logger.warning('Query %s failed (silenced): %s', label, e)
             if commit:
                 return None
             return []
         raise e
+    if conn is g.get('db_read_conn'):
+        db_breaker.release(trial)
+    else:
+        report_database(trial)
+    record_query(label, time.perf_counter() - started, rows=len(result) if result else 0)
+    return result
+
+
+# ---------- Concurrent query fan-out ----------
+# QUERY_GATHER_WORKERS threads, started by configure_process() (and again per worker after fork)
+_gather_executor = None
+
+
+def _try_acquire(use_replica=False):
+    """``(pool, conn)`` if a connection is free right now (replica first when allowed), else None"""
+    if use_replica:
+        checkout = replicas.acquire(timeout=0)
+        if checkout is not None:
+            return checkout
+    if g.get('db_unavailable') or not db_breaker.available():
+        # Inline calls fail fast (or take the half-open trial) through execute_query
+        return None
+    started = time.perf_counter()
+    try:
+        return db_pool, db_pool.acquire(timeout=0)
+    except PoolTimeout:
+        return None
+    except Exception as e:
+        DB_ACQUIRE_ERRORS.inc()
+        if is_outage(e):
+            db_breaker.record_failure(error=e)
+        return None
+    finally:
+        DB_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+
+
+def _gather_worker(app, pool, conn, sql, params):
+    # Own app context => own ``g``; teardown returns ``conn`` to its pool. The degraded-mode
+    # flags go back with the result so the request's banner reflects this query too. A replica
+    # that fails mid-query is marked down by execute_query, which retries on a primary connection
+    with app.app_context():
+        if pool is db_pool:
+            g.use_replica = False
+            g.db_conn = conn
+        else:
+            g.use_replica = True
+            g.db_read_pool, g.db_read_conn = pool, conn
+        result = execute_query(sql, params, silent=True)
+        return result, g.get('db_unavailable', False), g.get('db_stale', False)
+
+
+def gather_queries(calls):
+    """Run independent read queries concurrently and return ``{name: result}``.
+
+    ``calls`` maps a name to ``(sql, params)`` or to a zero-argument callable.
+    SQL calls run on the gather pool, each on its own pooled connection, while
+    callables (which may use ``request``) and reference-data calls already in the
+    cache run in the calling thread on the request's connection. A call that finds no free
+    connection also runs inline, so an exhausted pool degrades to sequential
+    execution instead of deadlocking. SQL calls are silent, like the handlers'.
+    """
+    inline, remote = [], []
+    for name, call in calls.items():
+        if callable(call) or (procedure_name(call[0]), tuple(call[1] or ())) in query_cache:
+            inline.append(name)
+        else:
+            remote.append(name)
+    if not any(callable(calls[name]) for name in inline) and remote:
+        # Keep one query for this thread rather than idling while the pool works
+        inline.append(remote.pop())
+
+    futures = {}
+    app = current_app._get_current_object()
+    use_replica = reads_use_replica()
+    for name in remote:
+        checkout = _try_acquire(use_replica)
+        if checkout is None:
+            inline.append(name)
+            continue
+        pool, conn = checkout
+        sql, params = calls[name]
+        try:
+            futures[name] = _gather_executor.submit(_gather_worker, app, pool, conn, sql, params)
+        except Exception:
+            pool.release(conn)
+            inline.append(name)
+
+    results = {}
+    for name in inline:
+        call = calls[name]
+        results[name] = call() if callable(call) else execute_query(call[0], call[1], silent=True)
+    for name, future in futures.items():
+        results[name], unavailable, stale = future.result()
+        if unavailable:
+            g.db_unavailable = True
+        if stale:
+            g.db_stale = True
+    return results
+
+
+# ---------- Keyset pagination ----------
+def encode_cursor(values):
+    """Opaque URL-safe token for a row's sort key"""
+    raw = json.dumps([str(v) if v is not None else None for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Sort key list from a cursor token, or None if missing/invalid"""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except Exception:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_page(fetch, sort_key):
+    """Load one keyset page driven by the ``after``/``before``/``limit`` query args.
+
+    ``fetch(cursor, backward, limit)`` runs the page procedure; ``cursor`` is the
+    decoded sort key (None for the first page) and backward pages come back nearest
+    first. ``sort_key(row)`` returns the values a cursor is built from.
+    Returns ``(rows, page)`` where ``page`` holds next/prev tokens for the template.
+    """
+    page_size = current_app.config['PAGE_SIZE']
+    try:
+        limit = int(request.args.get('limit', page_size))
+    except ValueError:
+        limit = page_size
+    limit = max(1, min(limit, current_app.config['PAGE_SIZE_MAX']))
+
+    before = decode_cursor(request.args.get('before'))
+    after = decode_cursor(request.args.get('after'))
+    backward = before is not None and after is None
+    cursor = before if backward else after
+
+    # One extra row tells us whether another page exists in this direction
+    rows = list(fetch(cursor, backward, limit + 1) or [])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    has_next = more if not backward else True
+    has_prev = more if backward else cursor is not None
+    page = {
+        'limit': limit,
+        'next': encode_cursor(sort_key(rows[-1])) if rows and has_next else None,
+        'prev': encode_cursor(sort_key(rows[0])) if rows and has_prev else None,
+    }
+    return rows, page
+
+
+# ---------- Batched loaders ----------
+# Plan columns returned by the *_with_plans / *_and_plans procedures, mapped to the
+# keys the templates expect on each plan dict
+MEMBER_PLAN_FIELDS = {'PlanId': 'PlanId', 'Goal': 'Goal', 'DurationWeeks': 'DurationWeeks'}
+TRAINER_PLAN_FIELDS = {
+    'PlanId': 'PlanId',
+    'Goal': 'Goal',
+    'DurationWeeks': 'DurationWeeks',
+    'PlanTrainerId': 'TrainerId',
+    'PlanTrainerName': 'TrainerName',
+}
+
+
+def group_child_rows(rows, parent_key, child_fields, into='plans'):
+    """Fold a flattened parent/child LEFT JOIN back into parent dicts with a child list.
+
+    Parent order follows the first appearance in ``rows``; rows whose child columns
+    are all NULL (parents without children) add no child entry.
+    """
+    parents = {}
+    for row in rows or []:
+        parent = parents.get(row[parent_key])
+        if parent is None:
+            parent = {k: v for k, v in row.items() if k not in child_fields}
+            parent[into] = []
+            parents[row[parent_key]] = parent
+        if any(row.get(col) is not None for col in child_fields):
+            parent[into].append({dst: row.get(src) for src, dst in child_fields.items()})
+    return list(parents.values())
+
+
+def load_trainer_members_with_plans(trainer_id):
+    """A trainer's members, each with ``member['plans']``, in a single query"""
+    rows = execute_query('CALL sp_get_trainer_members_with_plans(%s)', (trainer_id,), silent=True)
+    return group_child_rows(rows, 'MemberId', MEMBER_PLAN_FIELDS)
+
+
+def load_member_trainer_and_plans(member_id):
+    """(trainer or None, plans) for a member, in a single query"""
+    rows = execute_query('CALL sp_get_member_trainer_and_plans(%s)', (member_id,), silent=True)
+    grouped = group_child_rows(rows, 'MemberId', TRAINER_PLAN_FIELDS)
+    if not grouped:
+        return None, []
+    member = grouped[0]
+    plans = member.pop('plans')
+    trainer = member if member.get('TrainerId') is not None else None
+    return trainer, plans
 
 
 # ---------- CRUD: Member ----------
-@app.route('/members')
+@bp.route('/members')
 @role_required('admin')
 def members_list():
+    def fetch(cursor, backward, limit):
+        after_id = int(cursor[0]) if cursor else None
+        return execute_query('CALL sp_get_members(%s,%s,%s)', (after_id, int(backward), limit), silent=True)
+
     try:
-        rows = execute_query('CALL sp_get_members()', silent=True)
+        rows, page = keyset_page(fetch, lambda m: (m['MemberId'],))
     except Exception as e:
         flash(f'Database error: {str(e)}. Ensure DB is set up.', 'danger')
-        rows = []
-    return render_template('members/list.html', rows=rows)
+        rows, page = [], None
+    return render_template('members/list.html', rows=rows, page=page)
 
 
-@app.route('/members/create', methods=['GET', 'POST'])
+@bp.route('/members/create', methods=['GET', 'POST'])
 @role_required('admin')
 def members_create():
     try:
@@ -173,6 +913,7 @@ def members_create():
         email = request.form.get('Email') or None
         phone = request.form.get('PhoneNo') or None
         password = request.form.get('Password') or None
+        password = hash_password(password) if password else None
         address = request.form.get('Address') or None
         dob = request.form.get('DoB') or None
         join_date = request.form.get('JoinDate') or None
@@ -200,33 +941,38 @@ def members_create():
                 commit=True,
             )
             flash('Member created successfully in MySQL database', 'success')
-            return redirect(url_for('members_list'))
+            return redirect(url_for('.members_list'))
         except Exception as e:
             flash(f'Error creating member: {str(e)}', 'danger')
 
     return render_template('members/create.html', packages=packages or [], trainers=trainers or [])
 
 
-@app.route('/members/<int:member_id>/edit', methods=['GET', 'POST'])
+@bp.route('/members/<int:member_id>/edit', methods=['GET', 'POST'])
 @role_required('admin')
 def members_edit(member_id: int):
     try:
-        member_rows = execute_query('CALL sp_get_member_detail(%s)', (member_id,), silent=True)
-        if not member_rows:
+        loaded = gather_queries({
+            'member': ('CALL sp_get_member_detail(%s)', (member_id,)),
+            'packages': ('CALL sp_list_packages()', None),
+            'trainers': ('CALL sp_list_trainers()', None),
+        })
+        if not loaded['member']:
             flash('Member not found', 'warning')
-            return redirect(url_for('members_list'))
-        member_record = member_rows[0]
-        packages = execute_query('CALL sp_list_packages()', silent=True)
-        trainers = execute_query('CALL sp_list_trainers()', silent=True)
+            return redirect(url_for('.members_list'))
+        member_record = loaded['member'][0]
+        packages = loaded['packages']
+        trainers = loaded['trainers']
     except Exception as e:
         flash(f'Database error: {str(e)}', 'danger')
-        return redirect(url_for('members_list'))
+        return redirect(url_for('.members_list'))
 
     if request.method == 'POST':
         name = request.form['Name'].strip()
         email = request.form.get('Email') or None
         phone = request.form.get('PhoneNo') or None
         password = request.form.get('Password') or None
+        password = hash_password(password) if password else None
         address = request.form.get('Address') or None
         dob = request.form.get('DoB') or None
         join_date = request.form.get('JoinDate') or None
@@ -254,7 +1000,7 @@ def members_edit(member_id: int):
                 commit=True,
             )
             flash('Member updated', 'success')
-            return redirect(url_for('members_list'))
+            return redirect(url_for('.members_list'))
         except Exception as e:
             flash(str(e), 'danger')
             # refresh latest data on error
@@ -265,7 +1011,7 @@ def members_edit(member_id: int):
     return render_template('members/edit.html', m=member_record, packages=packages or [], trainers=trainers or [])
 
 
-@app.route('/members/<int:member_id>/delete', methods=['POST'])
+@bp.route('/members/<int:member_id>/delete', methods=['POST'])
 @role_required('admin')
 def members_delete(member_id: int):
     try:
@@ -273,22 +1019,17 @@ def members_delete(member_id: int):
         flash('Member deleted', 'success')
     except Exception as e:
         flash(str(e), 'danger')
-    return redirect(url_for('members_list'))
+    return redirect(url_for('.members_list'))
 
 
 # ---------- Trainer: View Assigned Members ----------
-@app.route('/trainer/members')
+@bp.route('/trainer/members')
 @role_required('trainer')
 def trainer_members():
     """Trainer can see their assigned members, contact details, and assigned plans"""
     trainer_id = session.get('user_id')
     try:
-        members = execute_query('CALL sp_get_trainer_members(%s)', (trainer_id,), silent=True)
-        members_with_plans = []
-        for member in members or []:
-            plans = execute_query('CALL sp_get_member_plans(%s)', (member['MemberId'],), silent=True)
-            member['plans'] = plans or []
-            members_with_plans.append(member)
+        members_with_plans = load_trainer_members_with_plans(trainer_id)
     except Exception as e:
         flash(f'Error loading data: {str(e)}', 'danger')
         members_with_plans = []
@@ -297,24 +1038,47 @@ def trainer_members():
 
 
 # ---------- Member: View Assigned Trainer & Plans ----------
-@app.route('/member/my-trainer')
+@bp.route('/member/my-trainer')
 @role_required('member')
 def member_my_trainer():
     """Member can see their assigned trainer and assigned plans"""
     member_id = session.get('user_id')
     try:
-        trainer = execute_query('CALL sp_get_member_trainer_info(%s)', (member_id,), silent=True)
-        plans = execute_query('CALL sp_get_member_plans_with_trainer(%s)', (member_id,), silent=True)
+        trainer, plans = load_member_trainer_and_plans(member_id)
     except Exception as e:
         flash(f'Error loading data: {str(e)}', 'danger')
         trainer = None
         plans = []
     
-    return render_template('member/my_trainer.html', trainer=trainer[0] if trainer else None, plans=plans or [])
+    return render_template('member/my_trainer.html', trainer=trainer, plans=plans or [])
+
+
+# ---------- Member search (typeahead) ----------
+MEMBER_SEARCH_LIMIT_MAX = 50
+
+
+@bp.route('/api/members/search')
+@api_role_required('admin', 'trainer')
+def api_member_search():
+    """Top-K members whose name, email or phone starts with ?q= (trainers: own members only)"""
+    term = request.args.get('q', '').strip()[:150]
+    default_limit = current_app.config['MEMBER_SEARCH_LIMIT']
+    try:
+        limit = max(1, min(int(request.args.get('limit', default_limit)), MEMBER_SEARCH_LIMIT_MAX))
+    except ValueError:
+        limit = default_limit
+    if not term:
+        return jsonify({'query': term, 'results': []})
+    trainer_id = session.get('user_id') if session.get('role') == 'trainer' else None
+    try:
+        rows = execute_query('CALL sp_search_members(%s,%s,%s)', (term, trainer_id, limit))
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), *db_error_status(e)
+    return jsonify({'query': term, 'results': [{k: json_value(v) for k, v in row.items()} for row in rows or []]})
 
 
 # ---------- Procedures / Functions GUI ----------
-@app.route('/actions/enroll', methods=['GET', 'POST'])
+@bp.route('/actions/enroll', methods=['GET', 'POST'])
 @role_required('admin', 'trainer')
 def action_enroll():
     if request.method == 'POST':
@@ -323,7 +1087,7 @@ def action_enroll():
         try:
             if not member_id or not plan_id:
                 flash('Member and plan are required', 'danger')
-                return redirect(url_for('action_enroll'))
+                return redirect(url_for('.action_enroll'))
             member_id_int = int(member_id)
             plan_id_int = int(plan_id)
 
@@ -333,29 +1097,24 @@ def action_enroll():
                 member_check = execute_query('CALL sp_verify_member_trainer(%s,%s)', (member_id_int, trainer_id), silent=True)
                 if not member_check:
                     flash('You can only enroll members assigned to you', 'danger')
-                    return redirect(url_for('action_enroll'))
+                    return redirect(url_for('.action_enroll'))
             
             execute_query('CALL sp_enroll_member_to_plan(%s,%s)', (member_id_int, plan_id_int), commit=True)
             flash('Enrolled successfully', 'success')
         except Exception as e:
             flash(str(e), 'danger')
-        return redirect(url_for('action_enroll'))
+        return redirect(url_for('.action_enroll'))
 
     try:
-        if session.get('role') == 'trainer':
-            trainer_id = session.get('user_id')
-            members = execute_query('CALL sp_list_members_for_trainer(%s)', (trainer_id,), silent=True)
-        else:
-            members = execute_query('CALL sp_list_members_basic()', silent=True)
+        # Members are picked through the typeahead (/api/members/search), not a full roster
         plans = execute_query('CALL sp_list_workout_plans()', silent=True)
     except Exception as e:
         flash(f'Error loading data: {str(e)}', 'warning')
-        members = []
         plans = []
-    return render_template('actions/enroll.html', members=members, plans=plans)
+    return render_template('actions/enroll.html', plans=plans)
 
 
-@app.route('/actions/make_payment', methods=['GET', 'POST'])
+@bp.route('/actions/make_payment', methods=['GET', 'POST'])
 @role_required('admin', 'member')
 def action_make_payment():
     if request.method == 'POST':
@@ -365,19 +1124,19 @@ def action_make_payment():
             mode = request.form.get('mode')
             if not package_id or not member_id:
                 flash('Member and package are required', 'danger')
-                return redirect(url_for('action_make_payment'))
+                return redirect(url_for('.action_make_payment'))
             package_id_int = int(package_id)
             member_id_int = int(member_id)
 
             package = execute_query('CALL sp_get_package_price(%s)', (package_id_int,), silent=True)
             if not package:
                 flash('Package not found', 'danger')
-                return redirect(url_for('action_make_payment'))
+                return redirect(url_for('.action_make_payment'))
             amount = package[0]['Price']
 
             if session.get('role') == 'member' and member_id_int != session.get('user_id'):
                 flash('You can only make payments for yourself', 'danger')
-                return redirect(url_for('action_make_payment'))
+                return redirect(url_for('.action_make_payment'))
 
             execute_query(
                 'CALL sp_make_payment(%s,%s,%s,%s)',
@@ -392,28 +1151,46 @@ def action_make_payment():
             flash('Payment recorded (and audited)', 'success')
         except Exception as e:
             flash(str(e), 'danger')
-        return redirect(url_for('action_make_payment'))
+        return redirect(url_for('.action_make_payment'))
 
+    page = None
     try:
         if session.get('role') == 'member':
             member_id = session.get('user_id')
-            members = execute_query('CALL sp_get_member_basic(%s)', (member_id,), silent=True)
-            audits = execute_query('CALL sp_get_payment_audit_for_member(%s)', (member_id,), silent=True)
+            loaded = gather_queries({
+                'members': ('CALL sp_get_member_basic(%s)', (member_id,)),
+                'audits': ('CALL sp_get_payment_audit_for_member(%s)', (member_id,)),
+                'packages': ('CALL sp_list_packages()', None),
+            })
+            audits = loaded['audits']
         else:
-            members = execute_query('CALL sp_list_members_basic()', silent=True)
-            audits = execute_query('CALL sp_get_payment_audit_all()', silent=True)
-        packages = execute_query('CALL sp_list_packages()', silent=True)
+            loaded = gather_queries({
+                # keyset_page reads request args, so it runs in this thread
+                'audits': lambda: keyset_page(
+                    lambda cursor, backward, limit: execute_query(
+                        'CALL sp_get_payment_audit_all(%s,%s,%s)',
+                        (int(cursor[0]) if cursor else None, int(backward), limit),
+                        silent=True,
+                    ),
+                    lambda a: (a['AuditId'],),
+                ),
+                'packages': ('CALL sp_list_packages()', None),
+            })
+            audits, page = loaded['audits']
+        members = loaded.get('members', [])
+        packages = loaded['packages']
     except Exception as e:
         flash(f'Error loading data: {str(e)}', 'warning')
         members = []
         packages = []
         audits = []
+        page = None
     payment_modes = ['Card', 'Cash', 'UPI', 'Net Banking', 'Wallet']
-    return render_template('actions/make_payment.html', members=members, packages=packages, audits=audits, payment_modes=payment_modes)
+    return render_template('actions/make_payment.html', members=members, packages=packages, audits=audits, payment_modes=payment_modes, page=page)
 
 
 # ---------- Attendance Management ----------
-@app.route('/actions/mark_attendance', methods=['GET', 'POST'])
+@bp.route('/actions/mark_attendance', methods=['GET', 'POST'])
 @role_required('admin', 'trainer')
 def action_mark_attendance():
     if request.method == 'POST':
@@ -421,11 +1198,11 @@ def action_mark_attendance():
             member_id = request.form.get('member_id')
             date = request.form.get('date')
             check_in = request.form.get('check_in')
-            check_out = request.form.get('check_out')
+            check_out = request.form.get('check_out') or None  # empty = still in the gym
 
             if not member_id:
                 flash('Member is required', 'danger')
-                return redirect(url_for('action_mark_attendance'))
+                return redirect(url_for('.action_mark_attendance'))
             member_id_int = int(member_id)
 
             # For trainers, verify they can only mark attendance for assigned members
@@ -434,7 +1211,7 @@ def action_mark_attendance():
                 member_check = execute_query('CALL sp_verify_member_trainer(%s,%s)', (member_id_int, trainer_id), silent=True)
                 if not member_check:
                     flash('You can only mark attendance for members assigned to you', 'danger')
-                    return redirect(url_for('action_mark_attendance'))
+                    return redirect(url_for('.action_mark_attendance'))
 
             # Use stored procedure to record attendance (triggers handle validation)
             execute_query(
@@ -442,39 +1219,37 @@ def action_mark_attendance():
                 (member_id_int, date, check_in, check_out),
                 commit=True
             )
+            refresh_occupancy([(member_id_int, date)])
             flash('Attendance recorded successfully', 'success')
         except Exception as e:
             flash(f'Error: {str(e)}', 'danger')
-        return redirect(url_for('action_mark_attendance'))
+        return redirect(url_for('.action_mark_attendance'))
 
-    try:
-        if session.get('role') == 'trainer':
-            trainer_id = session.get('user_id')
-            members = execute_query('CALL sp_list_members_for_trainer(%s)', (trainer_id,), silent=True)
-        else:
-            members = execute_query('CALL sp_list_members_basic()', silent=True)
-    except Exception as e:
-        flash(f'Error loading members: {str(e)}', 'warning')
-        members = []
-    
     from datetime import date as _date
     today = _date.today().isoformat()
     
-    return render_template('actions/mark_attendance.html', members=members, today=today)
+    return render_template('actions/mark_attendance.html', today=today)
 
 
-@app.route('/attendance/view')
+@bp.route('/attendance/view')
 @role_required('admin', 'trainer')
 def attendance_view():
-    try:
+    def fetch(cursor, backward, limit):
+        key = tuple(cursor) if cursor and len(cursor) == 3 else (None, None, None)
         if session.get('role') == 'trainer':
             trainer_id = session.get('user_id')
-            attendance = execute_query('CALL sp_get_attendance_for_trainer(%s)', (trainer_id,), silent=True)
-        else:
-            attendance = execute_query('CALL sp_get_attendance_all()', silent=True)
+            return execute_query(
+                'CALL sp_get_attendance_for_trainer(%s,%s,%s,%s,%s,%s)',
+                (trainer_id, *key, int(backward), limit),
+                silent=True,
+            )
+        return execute_query('CALL sp_get_attendance_all(%s,%s,%s,%s,%s)', (*key, int(backward), limit), silent=True)
+
+    try:
+        attendance, page = keyset_page(fetch, lambda a: (a['Date'], a['CheckInTime'], a['MemberId']))
     except Exception as e:
         flash(f'Error loading attendance: {str(e)}', 'warning')
-        attendance = []
+        attendance, page = [], None
     
     # Format duration for display
     if attendance:
@@ -487,41 +1262,669 @@ def attendance_view():
             else:
                 record['Duration'] = '-'
     
-    return render_template('attendance/view.html', attendance=attendance or [])
+    return render_template('attendance/view.html', attendance=attendance or [], page=page)
+
+
+# ---------- Bulk attendance API ----------
+# Accepted column/key spellings (case-insensitive) -> canonical batch key
+_ATTENDANCE_KEYS = {
+    'memberid': 'MemberId', 'member_id': 'MemberId',
+    'date': 'Date',
+    'checkin': 'CheckIn', 'check_in': 'CheckIn', 'checkintime': 'CheckIn',
+    'checkout': 'CheckOut', 'check_out': 'CheckOut', 'checkouttime': 'CheckOut',
+}
+_CHECK_TIMES_ERROR = 'Check-out time cannot be before check-in time'  # same text as trg_attendance_check_times
+
+
+def _read_batch_rows():
+    """Raw rows from a JSON array / {"rows": [...]} body, a text/csv body or a CSV "file" upload"""
+    upload = request.files.get('file')
+    if upload:
+        return list(csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig'))))
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('rows')
+        if not isinstance(payload, list):
+            raise ValueError('Expected a JSON array of rows or {"rows": [...]}')
+        return payload
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    raise ValueError('Send JSON, a text/csv body or a CSV file upload named "file"')
+
+
+def _normalize_attendance_row(raw):
+    """(row, error): MemberId as int and Date/CheckIn/CheckOut as ISO strings"""
+    if not isinstance(raw, dict):
+        return None, 'Row must be an object'
+    row = {}
+    for key, value in raw.items():
+        canonical = _ATTENDANCE_KEYS.get(str(key).strip().lower())
+        if canonical:
+            row[canonical] = value.strip() if isinstance(value, str) else value
+    try:
+        member_id = int(row.get('MemberId'))
+    except (TypeError, ValueError):
+        return None, 'MemberId must be an integer'
+    try:
+        day = _date_type.fromisoformat(str(row.get('Date')))
+    except ValueError:
+        return None, 'Date must be YYYY-MM-DD'
+    try:
+        check_in = _time_type.fromisoformat(str(row.get('CheckIn')))
+        check_out = _time_type.fromisoformat(str(row['CheckOut'])) if row.get('CheckOut') else None
+    except ValueError:
+        return None, 'CheckIn/CheckOut must be HH:MM or HH:MM:SS'
+    normalized = {'MemberId': member_id, 'Date': day.isoformat(), 'CheckIn': check_in.isoformat()}
+    if check_out is not None:
+        normalized['CheckOut'] = check_out.isoformat()
+    return normalized, None
+
+
+def _insert_attendance_rows(pending):
+    """Insert pre-checked rows in one transaction; on failure fall back to row-by-row for per-row errors"""
+    try:
+        execute_query('CALL sp_record_attendance_batch(%s)', (json.dumps([row for _, row in pending]),), commit=True)
+        for result, _ in pending:
+            result['status'] = 'inserted'
+        return
+    except Exception:
+        # Something changed since the pre-checks (e.g. a concurrent check-in); attribute errors per row
+        pass
+    for result, row in pending:
+        try:
+            execute_query(
+                'CALL sp_record_attendance(%s,%s,%s,%s)',
+                (row['MemberId'], row['Date'], row['CheckIn'], row.get('CheckOut')),
+                commit=True,
+            )
+            result['status'] = 'inserted'
+        except pymysql.err.IntegrityError as e:
+            if e.args and e.args[0] == 1062:
+                result.update(status='duplicate', error='Attendance already recorded for this member and date')
+            else:
+                result.update(status='rejected', error=str(e.args[-1]) if e.args else str(e))
+        except pymysql.MySQLError as e:
+            result.update(status='rejected', error=str(e.args[-1]) if e.args else str(e))
+
+
+@bp.route('/api/attendance/batch', methods=['POST'])
+@api_role_required('admin', 'trainer')
+def api_attendance_batch():
+    """Record a batch of check-ins and report a result for every row"""
+    try:
+        raw_rows = _read_batch_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': str(e)}), 400
+    batch_max = current_app.config['ATTENDANCE_BATCH_MAX']
+    if len(raw_rows) > batch_max:
+        return jsonify({'error': f'Batch too large (max {batch_max} rows)'}), 413
+
+    results = []
+    pending = []
+    seen = set()
+    for index, raw in enumerate(raw_rows, start=1):
+        row, error = _normalize_attendance_row(raw)
+        result = {'row': index, 'MemberId': row['MemberId'] if row else None, 'Date': row['Date'] if row else None}
+        results.append(result)
+        if error:
+            result.update(status='invalid', error=error)
+        elif (row['MemberId'], row['Date']) in seen:
+            result.update(status='duplicate', error='Repeated in this batch')
+        elif row.get('CheckOut') and row['CheckOut'] < row['CheckIn']:
+            seen.add((row['MemberId'], row['Date']))
+            result.update(status='rejected', error=_CHECK_TIMES_ERROR)
+        else:
+            seen.add((row['MemberId'], row['Date']))
+            pending.append((result, row))
+
+    try:
+        if pending:
+            # One query for ownership (trainers) / existence (admin) of every member in the batch
+            trainer_id = session.get('user_id') if session.get('role') == 'trainer' else None
+            member_ids = sorted({row['MemberId'] for _, row in pending})
+            allowed = {
+                r['MemberId']
+                for r in execute_query('CALL sp_members_in_scope(%s,%s)', (json.dumps(member_ids), trainer_id)) or []
+            }
+            checked = []
+            for result, row in pending:
+                if row['MemberId'] in allowed:
+                    checked.append((result, row))
+                elif trainer_id is not None:
+                    result.update(status='forbidden', error='Member is not assigned to you')
+                else:
+                    result.update(status='invalid', error='Member does not exist')
+            pending = checked
+
+        if pending:
+            # One query for rows that already exist on the (MemberId, Date) primary key
+            keys = [{'MemberId': row['MemberId'], 'Date': row['Date']} for _, row in pending]
+            existing = {
+                (r['MemberId'], json_value(r['Date']))
+                for r in execute_query('CALL sp_existing_attendance(%s)', (json.dumps(keys),)) or []
+            }
+            fresh = []
+            for result, row in pending:
+                if (row['MemberId'], row['Date']) in existing:
+                    result.update(status='duplicate', error='Attendance already recorded for this member and date')
+                else:
+                    fresh.append((result, row))
+            if fresh:
+                _insert_attendance_rows(fresh)
+                refresh_occupancy([(row['MemberId'], row['Date']) for result, row in fresh if result['status'] == 'inserted'])
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), *db_error_status(e)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'total': len(results), 'summary': summary, 'results': results})
+
+
+# ---------- Live occupancy ----------
+# Who is on the floor now, served from an in-process index (occupancy.py) instead of scanning
+# Attendance per refresh. Writes in this process update it at once; every worker also
+# re-syncs a day at most every OCCUPANCY_SYNC_SECONDS so other workers' writes show up.
+
+
+def _load_occupancy_day(day):
+    # Straight from the primary: a lagging replica would undo check-ins applied by this process
+    g.use_replica = False
+    return execute_query('CALL sp_occupancy_day(%s)', (day.isoformat(),)) or []
+
+
+# The index and the OCCUPANCY_MAX_STREAMS slots are built by configure_process(). Each open
+# stream holds a server thread, so they are capped per process; the page falls back to polling
+occupancy = None
+_occupancy_streams = None
+metrics.gauge(
+    'gym_occupancy_index', 'In-process occupancy index counters', ('stat',),
+    fn=lambda: {(k,): v for k, v in (occupancy.stats() if occupancy else {}).items()},
+)
+
+
+def refresh_occupancy(keys):
+    """Re-read just-written (MemberId, Date) rows into the occupancy index; other workers catch up on sync"""
+    keys = [{'MemberId': member_id, 'Date': str(day)} for member_id, day in keys if occupancy.tracks(day)]
+    if not keys:
+        return
+    try:
+        occupancy.apply(execute_query('CALL sp_occupancy_entries(%s)', (json.dumps(keys),)) or [])
+    except Exception as e:
+        current_app.logger.warning('Occupancy index not updated (next sync repairs it): %s', e)
+
+
+def occupancy_snapshot(day, trainer_id=None):
+    """Index snapshot for ``day``: present right now for today, not checked out for other days"""
+    now = _datetime_type.now()
+    at = now.hour * 3600 + now.minute * 60 if day == now.date() else None
+    return occupancy.snapshot(day, at, trainer_id)
+
+
+def _occupancy_request():
+    """(day, trainer scope) from ?date= and the session; ValueError for a bad date"""
+    raw = request.args.get('date')
+    day = _date_type.fromisoformat(raw) if raw else _date_type.today()
+    return day, session.get('user_id') if session.get('role') == 'trainer' else None
+
+
+def _occupancy_etag(snapshot):
+    return f"occ-{snapshot['date']}-{snapshot['version']}-{snapshot['asOf'] or 'day'}"
+
+
+@bp.route('/occupancy')
+@role_required('admin', 'trainer')
+def occupancy_page():
+    try:
+        day, trainer_id = _occupancy_request()
+        snapshot = occupancy_snapshot(day, trainer_id)
+    except ValueError:
+        flash('Date must be YYYY-MM-DD', 'warning')
+        return redirect(url_for('.occupancy_page'))
+    except Exception as e:
+        flash(f'Error loading occupancy: {str(e)}', 'warning')
+        snapshot = None
+    return render_template('attendance/occupancy.html', snapshot=snapshot,
+                           poll_seconds=current_app.config['OCCUPANCY_POLL_SECONDS'])
+
+
+@bp.route('/api/occupancy')
+@api_role_required('admin', 'trainer')
+def api_occupancy():
+    """Occupancy snapshot for polling; answers 304 while nothing (including the minute) has changed"""
+    try:
+        day, trainer_id = _occupancy_request()
+    except ValueError:
+        return api_error('date must be YYYY-MM-DD', 400)
+    try:
+        snapshot = occupancy_snapshot(day, trainer_id)
+    except Exception as e:
+        return api_error(f'Occupancy unavailable: {str(e)}', 503)
+    etag = _occupancy_etag(snapshot)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = api_response(snapshot)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@bp.route('/occupancy/stream')
+@role_required('admin', 'trainer')
+def occupancy_stream():
+    """Server-sent events: a snapshot on every index change, a comment line as heartbeat"""
+    try:
+        day, trainer_id = _occupancy_request()
+    except ValueError:
+        return Response('date must be YYYY-MM-DD\n', status=400, mimetype='text/plain')
+    app = current_app._get_current_object()
+    poll_seconds = app.config['OCCUPANCY_POLL_SECONDS']
+    heartbeat = app.config['OCCUPANCY_STREAM_HEARTBEAT']
+    streams = _occupancy_streams
+    if not streams.acquire(blocking=False):
+        return Response('Too many live streams; poll /api/occupancy instead\n', status=503, mimetype='text/plain',
+                        headers={'Retry-After': str(poll_seconds)})
+
+    def events():
+        # Streams end after OCCUPANCY_STREAM_SECONDS so threads recycle; EventSource reconnects by itself
+        yield f'retry: {poll_seconds * 1000}\n\n'
+        deadline = time.monotonic() + app.config['OCCUPANCY_STREAM_SECONDS']
+        sent = None
+        while time.monotonic() < deadline:
+            # A fresh app context per pass: a re-sync borrows a pooled connection only for that pass
+            try:
+                with app.app_context():
+                    snapshot = occupancy_snapshot(day, trainer_id)
+            except Exception as e:
+                yield f'event: unavailable\ndata: {json.dumps({"error": str(e)})}\n\n'
+                return
+            etag = _occupancy_etag(snapshot)
+            if etag != sent:
+                yield f'id: {etag}\nevent: occupancy\ndata: {json.dumps(snapshot, separators=(",", ":"))}\n\n'
+                sent = etag
+            else:
+                yield ': keep-alive\n\n'
+            # Wake on a change, at the heartbeat, or when the minute turns (people's check-out times pass)
+            occupancy.wait(snapshot['version'], min(heartbeat, 60 - time.localtime().tm_sec))
+
+    response = Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(streams.release)
+    return response
+
+
+@bp.route('/occupancy/checkout', methods=['POST'])
+@role_required('admin', 'trainer')
+def occupancy_checkout():
+    """Check a member out of today's open visit (now, or at the posted time)"""
+    try:
+        member_id = int(request.form.get('member_id', ''))
+        check_out = request.form.get('check_out') or _datetime_type.now().strftime('%H:%M:%S')
+        today = _date_type.today().isoformat()
+        if session.get('role') == 'trainer':
+            if not execute_query('CALL sp_verify_member_trainer(%s,%s)', (member_id, session.get('user_id')), silent=True):
+                flash('You can only check out members assigned to you', 'danger')
+                return redirect(url_for('.occupancy_page'))
+        result = execute_query('CALL sp_record_checkout(%s,%s,%s)', (member_id, today, check_out), commit=True)
+        if result and result[0]['Updated']:
+            refresh_occupancy([(member_id, today)])
+            flash('Checked out', 'success')
+        else:
+            flash('No open visit today for that member', 'warning')
+    except ValueError:
+        flash('Member is required', 'danger')
+    except Exception as e:
+        flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('.occupancy_page'))
+
+
+# ---------- Attendance analytics (reads the rollup tables only) ----------
+ANALYTICS_DEFAULT_DAYS = 28
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def _analytics_range():
+    """(from, to) dates from ?from=&to= (YYYY-MM-DD), defaulting to the last 28 days"""
+    date_to = _date_type.fromisoformat(request.args['to']) if request.args.get('to') else _date_type.today()
+    if request.args.get('from'):
+        date_from = _date_type.fromisoformat(request.args['from'])
+    else:
+        date_from = date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise ValueError('"from" must not be after "to"')
+    return date_from, date_to
+
+
+def _weekday_counts(date_from, date_to):
+    """How many of each weekday (0 = Monday) fall in [date_from, date_to]"""
+    days = (date_to - date_from).days + 1
+    counts = [days // 7] * 7
+    for i in range(days % 7):
+        counts[(date_from.weekday() + i) % 7] += 1
+    return counts
+
+
+def load_attendance_analytics(date_from, date_to, trainer_id=None):
+    """Daily totals, a weekday x hour occupancy grid and per-trainer stats from the rollups"""
+    loaded = gather_queries({
+        'daily': ('CALL sp_attendance_daily(%s,%s)', (date_from, date_to)),
+        'heatmap': ('CALL sp_attendance_heatmap(%s,%s)', (date_from, date_to)),
+        'trainers': ('CALL sp_attendance_trainer_summary(%s,%s,%s)', (date_from, date_to, trainer_id)),
+    })
+
+    # Average headcount per weekday/hour = total presence / number of such weekdays in range
+    per_weekday = _weekday_counts(date_from, date_to)
+    present = {}
+    for cell in loaded['heatmap']:
+        weekday = (int(cell['Weekday']) + 5) % 7  # MySQL DAYOFWEEK: 1 = Sunday
+        present[(weekday, int(cell['Hour']))] = int(cell['Present'] or 0)
+    busy = [hour for _, hour in present]
+    hours = list(range(min(busy), max(busy) + 1)) if busy else []
+    grid = [
+        {
+            'day': WEEKDAYS[weekday],
+            'cells': [
+                round(present.get((weekday, hour), 0) / per_weekday[weekday], 1) if per_weekday[weekday] else 0
+                for hour in hours
+            ],
+        }
+        for weekday in range(7)
+    ]
+    peak = max((c for row in grid for c in row['cells']), default=0)
+    return {
+        'from': date_from,
+        'to': date_to,
+        'daily': loaded['daily'],
+        'heatmap': {'hours': hours, 'rows': grid, 'max': peak},
+        'trainers': loaded['trainers'],
+    }
+
+
+def _analytics_trainer_scope():
+    return session.get('user_id') if session.get('role') == 'trainer' else None
+
+
+@bp.route('/analytics/attendance')
+@role_required('admin', 'trainer')
+def attendance_analytics():
+    try:
+        date_from, date_to = _analytics_range()
+    except ValueError as e:
+        flash(f'Invalid date range: {str(e)}', 'warning')
+        date_to = _date_type.today()
+        date_from = date_to - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    try:
+        data = load_attendance_analytics(date_from, date_to, _analytics_trainer_scope())
+    except Exception as e:
+        flash(f'Error loading analytics: {str(e)}', 'warning')
+        data = {'from': date_from, 'to': date_to, 'daily': [], 'heatmap': {'hours': [], 'rows': [], 'max': 0}, 'trainers': []}
+    return render_template('attendance/analytics.html', data=data)
+
+
+@bp.route('/api/analytics/attendance')
+@api_role_required('admin', 'trainer')
+def api_attendance_analytics():
+    try:
+        date_from, date_to = _analytics_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        data = load_attendance_analytics(date_from, date_to, _analytics_trainer_scope())
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), *db_error_status(e)
+    return jsonify({
+        'from': json_value(data['from']),
+        'to': json_value(data['to']),
+        'daily': [{k: json_value(v) for k, v in row.items()} for row in data['daily']],
+        'heatmap': data['heatmap'],
+        'trainers': [{k: json_value(v) for k, v in row.items()} for row in data['trainers']],
+    })
+
+
+# ---------- Workout log ----------
+WORKOUT_RECENT_SESSIONS = 10
+
+_WORKOUT_KEYS = {
+    'memberid': 'MemberId', 'member_id': 'MemberId',
+    'date': 'Date', 'sessiondate': 'Date', 'session_date': 'Date',
+    'exerciseid': 'ExerciseId', 'exercise_id': 'ExerciseId',
+    'setno': 'SetNo', 'set_no': 'SetNo', 'set': 'SetNo',
+    'reps': 'Reps',
+    'weightkg': 'WeightKg', 'weight_kg': 'WeightKg', 'weight': 'WeightKg',
+}
+
+
+def _normalize_workout_row(raw, member_id=None):
+    """(row, error): ids/SetNo/Reps as ints, Date ISO, WeightKg as a 2-place string; ``member_id`` fills a missing MemberId"""
+    if not isinstance(raw, dict):
+        return None, 'Row must be an object'
+    row = {}
+    for key, value in raw.items():
+        canonical = _WORKOUT_KEYS.get(str(key).strip().lower())
+        if canonical:
+            row[canonical] = value.strip() if isinstance(value, str) else value
+    if row.get('MemberId') in (None, '') and member_id is not None:
+        row['MemberId'] = member_id
+    normalized = {}
+    for key, low, high in (('MemberId', 1, None), ('ExerciseId', 1, None), ('SetNo', 1, 100), ('Reps', 1, 1000)):
+        try:
+            value = int(row.get(key))
+        except (TypeError, ValueError):
+            return None, f'{key} must be an integer'
+        if value < low or (high is not None and value > high):
+            return None, f'{key} must be between {low} and {high}' if high else f'{key} must be positive'
+        normalized[key] = value
+    try:
+        normalized['Date'] = _date_type.fromisoformat(str(row.get('Date'))).isoformat()
+    except ValueError:
+        return None, 'Date must be YYYY-MM-DD'
+    try:
+        weight = Decimal(str(row['WeightKg'])) if row.get('WeightKg') not in (None, '') else Decimal(0)
+    except ArithmeticError:
+        return None, 'WeightKg must be a number'
+    if not weight.is_finite() or weight < 0 or weight >= 10000:
+        return None, 'WeightKg must be between 0 and 9999.99'
+    normalized['WeightKg'] = str(weight.quantize(Decimal('0.01')))
+    return normalized, None
+
+
+def _workout_key(row):
+    return row['MemberId'], row['Date'], row['ExerciseId'], row['SetNo']
+
+
+def _insert_workout_rows(pending):
+    """Insert pre-checked sets in one transaction; on failure fall back to one set per call for per-row errors"""
+    try:
+        execute_query('CALL sp_log_workout_sets(%s)', (json.dumps([row for _, row in pending]),), commit=True)
+        for result, _ in pending:
+            result['status'] = 'inserted'
+        return
+    except Exception:
+        pass
+    for result, row in pending:
+        try:
+            execute_query('CALL sp_log_workout_sets(%s)', (json.dumps([row]),), commit=True)
+            result['status'] = 'inserted'
+        except pymysql.err.IntegrityError as e:
+            if e.args and e.args[0] == 1062:
+                result.update(status='duplicate', error='Set already logged')
+            else:
+                result.update(status='rejected', error=str(e.args[-1]) if e.args else str(e))
+        except pymysql.MySQLError as e:
+            result.update(status='rejected', error=str(e.args[-1]) if e.args else str(e))
+
+
+@bp.route('/api/workouts/batch', methods=['POST'])
+@api_role_required('admin', 'trainer', 'member')
+def api_workouts_batch():
+    """Log a batch of sets (JSON or CSV) and report a result for every row; members log only their own"""
+    try:
+        raw_rows = _read_batch_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': str(e)}), 400
+    batch_max = current_app.config['WORKOUT_BATCH_MAX']
+    if len(raw_rows) > batch_max:
+        return jsonify({'error': f'Batch too large (max {batch_max} rows)'}), 413
+
+    role = session.get('role')
+    own_id = session.get('user_id') if role == 'member' else None
+    results = []
+    pending = []
+    seen = set()
+    for index, raw in enumerate(raw_rows, start=1):
+        row, error = _normalize_workout_row(raw, own_id)
+        result = {'row': index}
+        if row:
+            result.update(MemberId=row['MemberId'], Date=row['Date'], ExerciseId=row['ExerciseId'], SetNo=row['SetNo'])
+        results.append(result)
+        if error:
+            result.update(status='invalid', error=error)
+        elif own_id is not None and row['MemberId'] != own_id:
+            result.update(status='forbidden', error='Members can only log their own workouts')
+        elif _workout_key(row) in seen:
+            result.update(status='duplicate', error='Repeated in this batch')
+        else:
+            seen.add(_workout_key(row))
+            pending.append((result, row))
+
+    try:
+        if pending:
+            # Exercise ids come from the cached library; members are checked in one query
+            exercises = {e['ExerciseId'] for e in execute_query('CALL sp_list_exercises()') or []}
+            allowed = None
+            if own_id is None:
+                trainer_id = session.get('user_id') if role == 'trainer' else None
+                member_ids = sorted({row['MemberId'] for _, row in pending})
+                allowed = {
+                    r['MemberId']
+                    for r in execute_query('CALL sp_members_in_scope(%s,%s)', (json.dumps(member_ids), trainer_id)) or []
+                }
+            checked = []
+            for result, row in pending:
+                if row['ExerciseId'] not in exercises:
+                    result.update(status='invalid', error='Exercise does not exist')
+                elif allowed is not None and row['MemberId'] not in allowed:
+                    if role == 'trainer':
+                        result.update(status='forbidden', error='Member is not assigned to you')
+                    else:
+                        result.update(status='invalid', error='Member does not exist')
+                else:
+                    checked.append((result, row))
+            pending = checked
+
+        if pending:
+            keys = [{k: row[k] for k in ('MemberId', 'Date', 'ExerciseId', 'SetNo')} for _, row in pending]
+            existing = {
+                (r['MemberId'], json_value(r['Date']), r['ExerciseId'], r['SetNo'])
+                for r in execute_query('CALL sp_existing_workout_sets(%s)', (json.dumps(keys),)) or []
+            }
+            fresh = []
+            for result, row in pending:
+                if _workout_key(row) in existing:
+                    result.update(status='duplicate', error='Set already logged')
+                else:
+                    fresh.append((result, row))
+            if fresh:
+                _insert_workout_rows(fresh)
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), *db_error_status(e)
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'total': len(results), 'summary': summary, 'results': results})
+
+
+@bp.route('/workouts/log')
+@role_required('admin', 'trainer', 'member')
+def workouts_log():
+    """Session entry form; the sets are submitted together to /api/workouts/batch"""
+    exercises = execute_query('CALL sp_list_exercises()', silent=True)
+    return render_template('workouts/log.html', exercises=exercises or [], today=_date_type.today().isoformat())
+
+
+def _progress_member():
+    """(member_id, error) for /workouts/progress: members see themselves, trainers their own members"""
+    if session.get('role') == 'member':
+        return session.get('user_id'), None
+    if not request.args.get('member_id'):
+        return None, None
+    try:
+        member_id = int(request.args['member_id'])
+    except ValueError:
+        return None, 'Invalid member'
+    trainer_id = session.get('user_id') if session.get('role') == 'trainer' else None
+    try:
+        in_scope = execute_query('CALL sp_members_in_scope(%s,%s)', (json.dumps([member_id]), trainer_id))
+    except Exception as e:
+        return None, f'Could not verify member: {str(e)}'
+    if not in_scope:
+        return None, 'Member is not assigned to you' if trainer_id else 'Member does not exist'
+    return member_id, None
+
+
+def load_workout_progress(member_id, weeks=None, today=None):
+    """Records, the last ``weeks`` weeks (default WORKOUT_PROGRESS_WEEKS; missing weeks filled with zero sessions) and recent sessions"""
+    weeks = weeks or current_app.config['WORKOUT_PROGRESS_WEEKS']
+    today = today or _date_type.today()
+    this_week = today - timedelta(days=today.weekday())
+    first_week = this_week - timedelta(weeks=weeks - 1)
+    loaded = gather_queries({
+        'member': ('CALL sp_get_member_basic(%s)', (member_id,)),
+        'records': ('CALL sp_get_personal_records(%s)', (member_id,)),
+        'weeks': ('CALL sp_get_weekly_volume(%s,%s)', (member_id, first_week)),
+        'sessions': ('CALL sp_get_workout_sessions(%s,%s)', (member_id, WORKOUT_RECENT_SESSIONS)),
+    })
+    by_week = {row['WeekStart']: row for row in loaded['weeks'] or []}
+    # A week with no sets has no row; it still counts against the plan at the latest known target
+    target = loaded['weeks'][0]['TargetSessions'] if loaded['weeks'] else 0
+    weekly = []
+    for n in range(weeks):
+        start = this_week - timedelta(weeks=n)
+        row = by_week.get(start) or {
+            'WeekStart': start, 'Sessions': 0, 'Sets': 0, 'Reps': 0, 'VolumeKg': Decimal(0),
+            'TargetSessions': target, 'Adherence': 0 if target else None,
+        }
+        target = row['TargetSessions']
+        weekly.append(row)
+    planned = [w for w in weekly if w['TargetSessions']]
+    adherence = (
+        round(100 * sum(min(w['Sessions'], w['TargetSessions']) for w in planned) / sum(w['TargetSessions'] for w in planned))
+        if planned else None
+    )
+    return {
+        'member': loaded['member'][0] if loaded['member'] else None,
+        'records': loaded['records'] or [],
+        'weeks': weekly,
+        'sessions': loaded['sessions'] or [],
+        'adherence': adherence,
+    }
+
+
+@bp.route('/workouts/progress')
+@role_required('admin', 'trainer', 'member')
+def workouts_progress():
+    """Personal records, weekly volume and plan adherence (aggregate tables only)"""
+    member_id, error = _progress_member()
+    if error:
+        flash(error, 'danger')
+        return redirect(url_for('.workouts_progress'))
+    progress = load_workout_progress(member_id) if member_id else None
+    return render_template('workouts/progress.html', progress=progress, weeks=current_app.config['WORKOUT_PROGRESS_WEEKS'])
 
 
 # ---------- Stored Functions GUI ----------
-@app.route('/membership/end_date')
+@bp.route('/membership/end_date')
 @role_required('admin', 'member')
 def membership_end_date():
+    # Status (Active / Expired / No Membership) comes from the procedure
     try:
-        from datetime import date
-        today = date.today()
-
         if session.get('role') == 'member':
             member_id = session.get('user_id')
             result = execute_query('CALL sp_get_membership_end_date_for_member(%s)', (member_id,), silent=True)
         else:
             result = execute_query('CALL sp_get_membership_end_dates()', silent=True)
-
-        if result:
-            for record in result:
-                end_date = record.get('EndDate')
-                if end_date:
-                    if isinstance(end_date, date):
-                        record['EndDateStr'] = end_date.isoformat()
-                        record['Status'] = 'Active' if end_date >= today else 'Expired'
-                    else:
-                        try:
-                            parsed = date.fromisoformat(str(end_date))
-                            record['EndDateStr'] = parsed.isoformat()
-                            record['Status'] = 'Active' if parsed >= today else 'Expired'
-                        except Exception:
-                            record['EndDateStr'] = str(end_date)
-                            record['Status'] = 'Unknown'
-                else:
-                    record['EndDateStr'] = None
-                    record['Status'] = 'No Membership'
     except Exception as e:
         flash(f'Error loading membership data: {str(e)}', 'warning')
         result = []
@@ -529,7 +1932,7 @@ def membership_end_date():
     return render_template('membership/end_date.html', memberships=result or [])
 
 
-@app.route('/membership/active_status')
+@bp.route('/membership/active_status')
 @role_required('admin', 'trainer')
 def membership_active_status():
     try:
@@ -545,8 +1948,46 @@ def membership_active_status():
     return render_template('membership/active_status.html', members=result or [])
 
 
+# ---------- Membership expiry (nightly batch) ----------
+def compute_membership_expiry(as_of=None, horizon=None, lapsed=None):
+    """Rebuild MembershipExpiry in one set-based pass (default window from the config); returns the run summary row"""
+    horizon = current_app.config['EXPIRY_HORIZON_DAYS'] if horizon is None else horizon
+    lapsed = current_app.config['EXPIRY_LAPSED_DAYS'] if lapsed is None else lapsed
+    rows = execute_query('CALL sp_compute_membership_expiry(%s,%s,%s)', (as_of, horizon, lapsed), commit=True)
+    return rows[0] if rows else {}
+
+
+def seconds_until(run_at, now=None):
+    """Seconds from ``now`` until the next local ``HH:MM``"""
+    now = now or _datetime_type.now()
+    hour, minute = (int(part) for part in run_at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+@bp.route('/membership/expiring')
+@role_required('admin', 'trainer')
+def membership_expiring():
+    """Renewal reminders from the latest batch run (no per-member work on the request path)"""
+    trainer_id = session.get('user_id') if session.get('role') == 'trainer' else None
+    loaded = gather_queries({
+        'members': ('CALL sp_get_membership_expiry(%s)', (trainer_id,)),
+        'run': ('CALL sp_get_membership_expiry_run()', None),
+    })
+    members = loaded['members'] or []
+    run = loaded['run'][0] if loaded['run'] else None
+    return render_template(
+        'membership/expiring.html',
+        expiring=[m for m in members if m['Status'] == 'Expiring'],
+        expired=[m for m in members if m['Status'] == 'Expired'],
+        run=run,
+    )
+
+
 # ---------- Equipment View (Admin only) ----------
-@app.route('/equipment')
+@bp.route('/equipment')
 @role_required('admin')
 def equipment_list():
     try:
@@ -558,7 +1999,7 @@ def equipment_list():
 
 
 # ---------- Exercise Library (Admin & Trainer) ----------
-@app.route('/exercises')
+@bp.route('/exercises')
 @role_required('admin', 'trainer')
 def exercises_list():
     try:
@@ -569,40 +2010,1353 @@ def exercises_list():
     return render_template('exercise/list.html', exercises=exercises or [])
 
 
+# ---------- Streaming exports ----------
+# dataset -> (procedure, roles allowed, whether the procedure takes a member filter)
+EXPORTS = {
+    'attendance': ('sp_export_attendance', ('admin', 'trainer'), False),
+    'payments': ('sp_export_payments', ('admin', 'member'), True),
+    'audit': ('sp_export_payment_audit', ('admin', 'member'), True),
+}
+
+
+def json_value(value):
+    """Plain JSON-safe form of a MySQL value (Decimal kept exact as a string)"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (_datetime_type, _date_type)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        # PyMySQL returns TIME columns as timedelta
+        total = int(value.total_seconds())
+        sign = '-' if total < 0 else ''
+        total = abs(total)
+        return f'{sign}{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}'
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def _encode_export_chunk(rows, columns, fmt):
+    if fmt == 'ndjson':
+        return ''.join(
+            json.dumps({col: json_value(row[col]) for col in columns}, separators=(',', ':')) + '\n'
+            for row in rows
+        )
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(['' if row[col] is None else json_value(row[col]) for col in columns])
+    return buf.getvalue()
+
+
+def _stream_export(cur, fmt, release, chunk_rows):
+    """Yield the export in ``chunk_rows`` chunks straight off an unbuffered cursor"""
+    finished = False
+    try:
+        columns = [d[0] for d in cur.description]
+        if fmt == 'csv':
+            buf = io.StringIO()
+            csv.writer(buf).writerow(columns)
+            yield buf.getvalue()
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield _encode_export_chunk(rows, columns, fmt)
+        cur.close()
+        finished = True
+    finally:
+        # A half-read unbuffered result leaves the connection unusable, so drop it
+        release(discard=not finished)
+
+
+@bp.route('/export/<dataset>')
+@role_required('admin', 'trainer', 'member')
+def export_data(dataset):
+    """Stream attendance, payments or the payment audit log as CSV or NDJSON"""
+    if dataset not in EXPORTS:
+        flash('Unknown export', 'danger')
+        return redirect(url_for('.dashboard'))
+    procedure, roles, member_filter = EXPORTS[dataset]
+    role = session.get('role')
+    if role not in roles:
+        flash('Not authorized', 'danger')
+        return redirect(url_for('.dashboard'))
+
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'ndjson'):
+        flash('Export format must be csv or ndjson', 'danger')
+        return redirect(url_for('.dashboard'))
+    try:
+        date_from = _date_type.fromisoformat(request.args['from']) if request.args.get('from') else None
+        date_to = _date_type.fromisoformat(request.args['to']) if request.args.get('to') else None
+        trainer_id = int(request.args['trainer_id']) if request.args.get('trainer_id') else None
+    except ValueError:
+        flash('Invalid export filter (dates must be YYYY-MM-DD)', 'danger')
+        return redirect(url_for('.dashboard'))
+
+    # Same scoping as the pages: trainers see their members, members see themselves
+    member_id = None
+    if role == 'trainer':
+        trainer_id = session.get('user_id')
+    elif role == 'member':
+        member_id = session.get('user_id')
+        trainer_id = None
+    params = (date_from, date_to, trainer_id) + ((member_id,) if member_filter else ())
+
+    try:
+        pool, conn = acquire_read_connection()
+    except Exception as e:
+        flash(f'Database error: {str(e)}', 'danger')
+        return redirect(url_for('.dashboard'))
+    try:
+        cur = conn.cursor(pymysql.cursors.SSDictCursor)
+        cur.execute(f'CALL {procedure}({",".join(["%s"] * len(params))})', params)
+    except Exception as e:
+        pool.release(conn, discard=True)
+        flash(f'Export failed: {str(e)}', 'danger')
+        return redirect(url_for('.dashboard'))
+
+    released = []
+
+    def release(discard):
+        # Runs from the generator and again from call_on_close; only the first call counts
+        if not released:
+            released.append(True)
+            pool.release(conn, discard=discard)
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'text/csv'
+    filename = f'{dataset}-{_date_type.today().isoformat()}.{fmt}'
+    response = Response(_stream_export(cur, fmt, release, current_app.config['EXPORT_CHUNK_ROWS']), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    # Covers clients that disconnect before the generator starts
+    response.call_on_close(lambda: release(discard=True))
+    return response
+
+
+# ---------- JSON API (v1) ----------
+# Versioned, read-only JSON over the same procedures' data for the mobile app. ?fields=a,b picks
+# the columns (the procedures select only those), pages use the keyset after/before/limit args.
+API_PREFIX = '/api/v1'
+
+# resource -> (procedure, roles allowed, selectable fields, default fields, sort key fields).
+# Member-scoped procedures take (trainer, member) scope arguments; payments only a member.
+API_RESOURCES = {
+    'members': (
+        'sp_api_members', ('admin', 'trainer', 'member'),
+        ('MemberId', 'Name', 'Email', 'PhoneNo', 'Address', 'DoB', 'JoinDate', 'Gender',
+         'PackageId', 'PackageName', 'TrainerId', 'TrainerName'),
+        ('MemberId', 'Name'), ('MemberId',),
+    ),
+    'plans': (
+        'sp_api_plans', ('admin', 'trainer', 'member'),
+        ('PlanId', 'Goal', 'DurationWeeks', 'SessionsPerWeek', 'TrainerId', 'TrainerName'),
+        ('PlanId', 'Goal'), ('PlanId',),
+    ),
+    'attendance': (
+        'sp_api_attendance', ('admin', 'trainer', 'member'),
+        ('MemberId', 'MemberName', 'Date', 'CheckInTime', 'CheckOutTime', 'DurationMinutes'),
+        ('MemberId', 'Date', 'CheckInTime', 'CheckOutTime'), ('Date', 'CheckInTime', 'MemberId'),
+    ),
+    'payments': (
+        'sp_api_payments', ('admin', 'member'),
+        ('PaymentId', 'MemberId', 'MemberName', 'PackageId', 'PackageName', 'Amount', 'Mode', 'TimeStamp'),
+        ('PaymentId', 'Amount', 'TimeStamp'), ('PaymentId',),
+    ),
+    'membership': (
+        'sp_api_membership', ('admin', 'trainer', 'member'),
+        ('MemberId', 'Name', 'Email', 'EndDate', 'Status', 'IsActive', 'DaysLeft'),
+        ('MemberId', 'EndDate', 'Status'), ('MemberId',),
+    ),
+}
+
+
+def _json_default(value):
+    converted = json_value(value)
+    if converted is value:
+        raise TypeError(f'{type(value).__name__} is not JSON serializable')
+    return converted
+
+
+def api_response(payload, status=200):
+    """Compact JSON response, gzipped when the client accepts it and the body is big enough"""
+    # json.dumps only calls the hook for Decimal/date/time values, not for every field
+    body = json.dumps(payload, default=_json_default, separators=(',', ':')).encode()
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= current_app.config['API_GZIP_MIN_BYTES'] and request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=current_app.config['API_GZIP_LEVEL']))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def api_error(message, status, headers=None):
+    response = api_response({'error': message}, status)
+    response.headers.update(headers or {})
+    return response
+
+
+def api_fields(available, defaults):
+    """Requested ?fields= in order without duplicates (the defaults when absent)"""
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return list(defaults)
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in available]
+    if unknown or not fields:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown) or raw}. Available: {", ".join(available)}')
+    return fields
+
+
+def _api_scope():
+    """(trainer_id, member_id) filters for the caller's role, as on the HTML pages"""
+    role, user_id = session.get('role'), session.get('user_id')
+    if role == 'member':
+        return None, user_id
+    if role == 'trainer':
+        # Their assigned members, or for plans the plans they wrote
+        return user_id, None
+    return None, None
+
+
+def _api_call(resource, fields, trainer_id, member_id, cursor, backward, limit):
+    procedure = API_RESOURCES[resource][0]
+    fields_json = json.dumps(fields)
+    if resource == 'attendance':
+        key = tuple(cursor) if cursor and len(cursor) == 3 else (None, None, None)
+        params = (fields_json, trainer_id, member_id, *key, int(backward), limit)
+    elif resource == 'payments':
+        key = cursor[0] if cursor else None
+        params = (fields_json, member_id, key, int(backward), limit)
+    else:
+        key = cursor[0] if cursor else None
+        params = (fields_json, trainer_id, member_id, key, int(backward), limit)
+    return execute_query(f'CALL {procedure}({",".join(["%s"] * len(params))})', params)
+
+
+def _api_project(rows, fields, fetched):
+    """Drop sort key columns that were only fetched for the cursor"""
+    if len(fetched) == len(fields):
+        return rows
+    return [{f: row[f] for f in fields} for row in rows]
+
+
+@bp.route(f'{API_PREFIX}/<resource>')
+@api_role_required('admin', 'trainer', 'member')
+def api_v1_list(resource):
+    """One keyset page of members, plans, attendance, payments or membership status"""
+    if resource not in API_RESOURCES:
+        return api_error(f'Unknown resource: {resource}', 404)
+    _, roles, available, defaults, keys = API_RESOURCES[resource]
+    if not role_allowed(roles):
+        return api_error('Not authorized', 403)
+    try:
+        fields = api_fields(available, defaults)
+    except ValueError as e:
+        return api_error(str(e), 400)
+    fetched = fields + [k for k in keys if k not in fields]
+    trainer_id, member_id = _api_scope()
+
+    def fetch(cursor, backward, limit):
+        return _api_call(resource, fetched, trainer_id, member_id, cursor, backward, limit)
+
+    try:
+        rows, page = keyset_page(fetch, lambda row: tuple(row[k] for k in keys))
+    except Exception as e:
+        return api_error(f'Database error: {str(e)}', *db_error_status(e))
+    return api_response({'fields': fields, 'data': _api_project(rows, fields, fetched), 'page': page})
+
+
+@bp.route(f'{API_PREFIX}/members/<int:member_id>')
+@api_role_required('admin', 'trainer', 'member')
+def api_v1_member(member_id: int):
+    """One member (trainers: own members only; members: themselves only)"""
+    _, _, available, defaults, _ = API_RESOURCES['members']
+    try:
+        fields = api_fields(available, defaults)
+    except ValueError as e:
+        return api_error(str(e), 400)
+    trainer_id, own_id = _api_scope()
+    if own_id is not None and own_id != member_id:
+        return api_error('Member not found', 404)
+    try:
+        rows = _api_call('members', fields, trainer_id, member_id, None, False, 1)
+    except Exception as e:
+        return api_error(f'Database error: {str(e)}', *db_error_status(e))
+    if not rows:
+        return api_error('Member not found', 404)
+    return api_response({'fields': fields, 'data': rows[0]})
+
+
 # ---------- MySQL Console (Admin only) ----------
-@app.route('/mysql-console', methods=['GET', 'POST'])
+CONSOLE_MODES = {'run': '', 'explain': 'EXPLAIN ', 'analyze': 'EXPLAIN ANALYZE '}
+
+# Console statements running in this process: MySQL connection id -> {'sql', 'started'}
+_console_running = {}
+_console_lock = threading.Lock()
+
+
+def _console_rows(cur, limit, state, finish):
+    """Yield up to ``limit`` rows off an unbuffered cursor, noting in ``state`` whether more exist"""
+    try:
+        while True:
+            # Never read more than one row past the limit
+            rows = cur.fetchmany(min(current_app.config['EXPORT_CHUNK_ROWS'], limit + 1 - state['count']))
+            if not rows:
+                break
+            for row in rows:
+                if state['count'] >= limit:
+                    state['more'] = True
+                    return
+                state['count'] += 1
+                yield row
+    except Exception as e:
+        # e.g. MAX_EXECUTION_TIME exceeded or KILL QUERY while rows were streaming
+        state['error'] = str(e)
+    finally:
+        finish()
+
+
+@bp.route('/mysql-console', methods=['GET', 'POST'])
 @role_required('admin')
 def mysql_console():
     results = None
     error = None
     query_executed = None
-    
+    mode = request.form.get('mode', 'run')
+    if mode not in CONSOLE_MODES:
+        mode = 'run'
+    max_rows = current_app.config['CONSOLE_ROW_LIMIT']
+    try:
+        limit = max(1, min(int(request.form.get('row_limit', max_rows)), max_rows))
+    except ValueError:
+        limit = max_rows
+    context = {'mode': mode, 'row_limit': limit, 'max_row_limit': max_rows,
+               'max_execution_ms': current_app.config['CONSOLE_MAX_EXECUTION_MS']}
+
+    query = request.form.get('sql_query', '').strip() if request.method == 'POST' else ''
+    if not query:
+        with _console_lock:
+            running = sorted(_console_running.items())
+        return render_template('admin/mysql_console.html', results=None, error=None, query_executed=None,
+                               running=running, **context)
+    query_executed = query
+    statement = CONSOLE_MODES[mode] + query.rstrip().rstrip(';')
+
+    try:
+        # Console statements may change session state, so never hand this connection back
+        conn = db_pool.acquire()
+    except Exception as e:
+        return render_template('admin/mysql_console.html', results=None, error=str(e), query_executed=query_executed,
+                               running=[], **context)
+    connection_id = conn.thread_id()
+    released = []
+
+    def finish():
+        # Runs when streaming ends and again from call_on_close; only the first call counts.
+        # The connection is closed without draining, so an abandoned result costs nothing.
+        if not released:
+            released.append(True)
+            with _console_lock:
+                _console_running.pop(connection_id, None)
+            db_pool.release(conn, discard=True)
+
+    try:
+        with conn.cursor() as cur:
+            # Server-side cap for SELECTs (and the SELECT part of EXPLAIN ANALYZE)
+            cur.execute('SET SESSION max_execution_time = %s', (current_app.config['CONSOLE_MAX_EXECUTION_MS'],))
+        with _console_lock:
+            _console_running[connection_id] = {'sql': statement, 'started': _datetime_type.now()}
+        cur = conn.cursor(pymysql.cursors.SSDictCursor)
+        cur.execute(statement)
+        if not cur.description:
+            if mode == 'run':
+                # INSERT/UPDATE/DELETE - show affected rows
+                conn.commit()
+                query_cache.clear()
+                identity_cache.clear()
+            else:
+                # EXPLAIN ANALYZE really executes multi-table UPDATE/DELETE; never keep that
+                conn.rollback()
+            results = [{'affected_rows': cur.rowcount, 'message': 'Query executed successfully'}]
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        error = str(e)
+    if results is not None or error is not None:
+        finish()
+        return render_template('admin/mysql_console.html', results=results, error=error,
+                               query_executed=query_executed, running=[], **context)
+
+    # Result set: render the page while rows stream off the unbuffered cursor
+    state = {'count': 0, 'more': False, 'error': None}
+    columns = [d[0] for d in cur.description]
+    response = Response(stream_template(
+        'admin/mysql_console.html',
+        results=None,
+        error=None,
+        query_executed=query_executed,
+        running=[],
+        stream={'columns': columns, 'rows': _console_rows(cur, limit, state, finish), 'state': state,
+                'connection_id': connection_id, 'plan': columns == ['EXPLAIN']},
+        **context,
+    ))
+    response.call_on_close(finish)
+    return response
+
+
+@bp.route('/mysql-console/kill', methods=['POST'])
+@role_required('admin')
+def mysql_console_kill():
+    """Cancel a running console statement with KILL QUERY (the connection itself survives)"""
+    try:
+        connection_id = int(request.form.get('connection_id', ''))
+    except ValueError:
+        return jsonify({'error': 'connection_id must be an integer'}), 400
+    with _console_lock:
+        known = connection_id in _console_running
+    if not known:
+        return jsonify({'error': f'No console query is running on connection {connection_id} in this worker'}), 404
+    try:
+        conn = db_pool.acquire()
+        try:
+            with conn.cursor() as cur:
+                cur.execute('KILL QUERY %s', (connection_id,))
+        finally:
+            db_pool.release(conn)
+    except Exception as e:
+        return jsonify({'error': f'Database error: {str(e)}'}), *db_error_status(e)
+    return jsonify({'killed': connection_id})
+
+
+metrics.gauge(
+    'gym_query_cache', 'Reference-data cache counters', ('stat',),
+    fn=lambda: {(k,): v for k, v in (query_cache.stats() if query_cache else {}).items()},
+)
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition (admin session, or Bearer METRICS_TOKEN for scrapers)"""
+    token = current_app.config['METRICS_TOKEN']
+    authorized = session.get('role') == 'admin' or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not authorized:
+        return Response('Not authorized\n', status=403, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/admin/cache-stats')
+@role_required('admin')
+def cache_stats():
+    """Hit/miss counters for the reference-data and login identity caches"""
+    return jsonify({**query_cache.stats(), 'identity': identity_cache.stats()})
+
+
+@bp.route('/admin/replica-stats')
+@role_required('admin')
+def replica_stats():
+    """Health, lag and pool counters per read replica (empty when none are configured)"""
+    return jsonify(replicas.stats() if replicas else {})
+
+
+@bp.route('/admin/breaker-stats')
+@role_required('admin')
+def breaker_stats():
+    """Primary database circuit breaker state for this worker process"""
+    return jsonify(db_breaker.stats())
+
+
+# ---------- Bulk CSV import ----------
+# Member rosters and historical payments/attendance from CSV (flask --app app import-csv,
+# /admin/import). importer.ImportJob streams the file in IMPORT_CHUNK_SIZE-row chunks: each
+# chunk is checked with a few set-based lookups, written with one multi-row INSERT in one
+# transaction and checkpointed, so an interrupted import resumes after its last chunk. Rows that
+# are not imported go to the job's reject file. Import members before the payments and
+# attendance that refer to them by email. IMPORT_HASH_WORKERS threads hash member passwords
+# (the hash releases the GIL, so they use separate cores).
+
+# Accepted column spellings (case, spaces and underscores ignored) -> canonical field, per kind
+IMPORT_COLUMNS = {
+    'members': {
+        'name': 'Name', 'email': 'Email', 'phone': 'PhoneNo', 'phoneno': 'PhoneNo', 'password': 'Password',
+        'address': 'Address', 'dob': 'DoB', 'dateofbirth': 'DoB', 'joindate': 'JoinDate', 'gender': 'Gender',
+        'package': 'Package', 'packagename': 'Package', 'trainer': 'Trainer', 'trainername': 'Trainer',
+    },
+    'payments': {
+        'memberemail': 'MemberEmail', 'email': 'MemberEmail', 'memberid': 'MemberId',
+        'package': 'Package', 'packagename': 'Package', 'amount': 'Amount', 'mode': 'Mode',
+        'timestamp': 'TimeStamp', 'paidat': 'TimeStamp', 'date': 'TimeStamp',
+    },
+    'attendance': {
+        'memberemail': 'MemberEmail', 'email': 'MemberEmail', 'memberid': 'MemberId', 'date': 'Date',
+        'checkin': 'CheckIn', 'checkintime': 'CheckIn', 'checkout': 'CheckOut', 'checkouttime': 'CheckOut',
+    },
+}
+# Columns the header must have, per kind (each entry: any one of these)
+IMPORT_REQUIRED = {
+    'members': (('Name',),),
+    'payments': (('MemberEmail', 'MemberId'), ('Package',), ('TimeStamp',)),
+    'attendance': (('MemberEmail', 'MemberId'), ('Date',), ('CheckIn',)),
+}
+IMPORT_KINDS = tuple(IMPORT_COLUMNS)
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_IMPORT_GENDERS = {'m': 'M', 'male': 'M', 'f': 'F', 'female': 'F', 'other': 'Other'}
+_PAYMENT_PRICE_ERROR = 'Payment amount must match package price'  # same text as trg_payment_validate
+DEFAULT_MEMBER_PASSWORD = 'member123'  # same default as sp_create_member
+
+
+def _column_key(name):
+    return re.sub(r'[\s_]', '', str(name)).lower()
+
+
+def _import_fields(kind, raw):
+    """Canonical field -> stripped value (None when blank) for one CSV row; unknown columns are ignored"""
+    row = {}
+    for key, value in raw.items():
+        canonical = IMPORT_COLUMNS[kind].get(_column_key(key)) if key is not None else None
+        if canonical:
+            value = value.strip() if isinstance(value, str) else value
+            row[canonical] = value or None
+    return row
+
+
+def _check_import_header(path, kind):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    columns = {IMPORT_COLUMNS[kind].get(_column_key(name)) for name in header}
+    missing = [' or '.join(choices) for choices in IMPORT_REQUIRED[kind] if not columns.intersection(choices)]
+    if missing:
+        raise ImportJobError(f'{os.path.basename(path)} is missing column(s) needed to import {kind}: {", ".join(missing)}')
+
+
+def _name_index(sql, column):
+    """Reference rows by lower-cased name (one cached call); a name shared by several rows lists them all"""
+    index = {}
+    for row in execute_query(sql) or []:
+        index.setdefault(row[column].strip().lower(), []).append(row)
+    return index
+
+
+def _lookup_name(index, name, label):
+    """The reference row called ``name`` (None for a blank name); raises ValueError if unknown or ambiguous"""
+    if not name:
+        return None
+    matches = index.get(name.lower(), [])
+    if not matches:
+        raise ValueError(f'Unknown {label} "{name}"')
+    if len(matches) > 1:
+        raise ValueError(f'{len(matches)} {label}s are called "{name}"; rename one before importing')
+    return matches[0]
+
+
+def _import_date(value, label):
+    if not value:
+        return None
+    try:
+        return _date_type.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f'{label} must be YYYY-MM-DD') from None
+
+
+def _import_member_ids(rows):
+    """``(MemberId, error)`` per payment/attendance row: emails via sp_members_by_email, ids via sp_members_in_scope"""
+    emails = sorted({row['MemberEmail'].lower() for row in rows if row.get('MemberEmail')})
+    ids = set()
+    for row in rows:
+        if not row.get('MemberEmail') and str(row.get('MemberId') or '').isdigit():
+            ids.add(int(row['MemberId']))
+    by_email = {}
+    if emails:
+        by_email = {
+            r['Email'].lower(): r['MemberId']
+            for r in execute_query('CALL sp_members_by_email(%s)', (json.dumps(emails),)) or []
+        }
+    known = set()
+    if ids:
+        known = {r['MemberId'] for r in execute_query('CALL sp_members_in_scope(%s,%s)', (json.dumps(sorted(ids)), None)) or []}
+    resolved = []
+    for row in rows:
+        email = row.get('MemberEmail')
+        if email:
+            member_id = by_email.get(email.lower())
+            resolved.append((member_id, None) if member_id else (None, f'No member with email "{email}"'))
+        elif not str(row.get('MemberId') or '').isdigit():
+            resolved.append((None, 'MemberEmail or an integer MemberId is required'))
+        elif int(row['MemberId']) in known:
+            resolved.append((int(row['MemberId']), None))
+        else:
+            resolved.append((None, f"Member {row['MemberId']} does not exist"))
+    return resolved
+
+
+def _import_batch(procedure, rows, *args):
+    """Write ``(row_number, record)`` pairs with one CALL; ``(row_number, status, error)`` for rows MySQL refused.
+
+    ``args`` are passed to the procedure after the JSON rows.
+
+    A refused batch rolls back as a whole, so it is split in halves until the failing rows are
+    isolated (a few extra round trips per bad row, none for a clean chunk). Outages are raised:
+    the job stops and resumes from its checkpoint.
+    """
+    try:
+        placeholders = ','.join(['%s'] * (1 + len(args)))
+        execute_query(f'CALL {procedure}({placeholders})', (json.dumps([record for _, record in rows]),) + args, commit=True)
+        return []
+    except pymysql.MySQLError as e:
+        if is_outage(e):
+            raise
+        if len(rows) == 1:
+            status = 'duplicate' if e.args and e.args[0] == 1062 else 'rejected'
+            return [(rows[0][0], status, str(e.args[-1]) if e.args else str(e))]
+    half = len(rows) // 2
+    return _import_batch(procedure, rows[:half], *args) + _import_batch(procedure, rows[half:], *args)
+
+
+def _member_record(row, packages, trainers):
+    """Member insert payload for one CSV row; raises ValueError with the reason it cannot be imported"""
+    name = row.get('Name')
+    if not name:
+        raise ValueError('Name is required')
+    if len(name) > 150:
+        raise ValueError('Name is longer than 150 characters')
+    email = row.get('Email')
+    if email and (len(email) > 150 or not _EMAIL_RE.match(email)):
+        raise ValueError(f'Invalid email "{email}"')
+    phone = row.get('PhoneNo')
+    if phone and len(phone) > 20:
+        raise ValueError('PhoneNo is longer than 20 characters')
+    gender = row.get('Gender')
+    if gender:
+        gender = _IMPORT_GENDERS.get(gender.lower())
+        if gender is None:
+            raise ValueError('Gender must be M, F or Other')
+    package = _lookup_name(packages, row.get('Package'), 'package')
+    trainer = _lookup_name(trainers, row.get('Trainer'), 'trainer')
+    return {
+        'Name': name,
+        'Email': email,
+        'PhoneNo': phone,
+        'Password': row.get('Password'),
+        'Address': row.get('Address'),
+        'DoB': _import_date(row.get('DoB'), 'DoB'),
+        'JoinDate': _import_date(row.get('JoinDate'), 'JoinDate'),
+        'Gender': gender,
+        'PackageId': package['PackageId'] if package else None,
+        'TrainerId': trainer['TrainerId'] if trainer else None,
+    }
+
+
+def _member_importer():
+    """validate/write for member rosters: email and phone must be new and not repeated in the file"""
+    seen_emails, seen_phones = {}, {}
+
+    def validate(chunk):
+        packages = _name_index('CALL sp_list_packages()', 'PackageName')
+        trainers = _name_index('CALL sp_list_trainers()', 'TrainerName')
+        accepted, rejected = [], []
+        for number, raw in chunk:
+            try:
+                record = _member_record(_import_fields('members', raw), packages, trainers)
+            except ValueError as e:
+                rejected.append((number, 'invalid', str(e)))
+                continue
+            email = record['Email'].lower() if record['Email'] else None
+            if email in seen_emails:
+                rejected.append((number, 'duplicate', f'Email repeated in this file (row {seen_emails[email]})'))
+            elif record['PhoneNo'] in seen_phones:
+                rejected.append((number, 'duplicate', f"PhoneNo repeated in this file (row {seen_phones[record['PhoneNo']]})"))
+            else:
+                if email:
+                    seen_emails[email] = number
+                if record['PhoneNo']:
+                    seen_phones[record['PhoneNo']] = number
+                accepted.append((number, record))
+        if not accepted:
+            return accepted, rejected
+        # One query for every email and phone number of the chunk already in use (the unique keys)
+        emails = [r['Email'] for _, r in accepted if r['Email']]
+        phones = [r['PhoneNo'] for _, r in accepted if r['PhoneNo']]
+        taken = execute_query('CALL sp_existing_member_contacts(%s,%s)', (json.dumps(emails), json.dumps(phones))) or []
+        taken_emails = {r['Email'].lower() for r in taken if r['Email']}
+        taken_phones = {r['PhoneNo'] for r in taken if r['PhoneNo']}
+        fresh = []
+        for number, record in accepted:
+            if record['Email'] and record['Email'].lower() in taken_emails:
+                rejected.append((number, 'duplicate', 'Email already belongs to a member'))
+            elif record['PhoneNo'] in taken_phones:
+                rejected.append((number, 'duplicate', 'PhoneNo already belongs to a member'))
+            else:
+                fresh.append((number, record))
+        return fresh, rejected
+
+    def write(accepted):
+        # The hash threads have no app context, so they get the method from this one
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        with ThreadPoolExecutor(max_workers=current_app.config['IMPORT_HASH_WORKERS'], thread_name_prefix='import-hash') as pool:
+            hashes = list(pool.map(lambda item: hash_password(item[1]['Password'], method) if item[1]['Password'] else None, accepted))
+        rows = [(number, dict(record, Password=hashed)) for (number, record), hashed in zip(accepted, hashes)]
+        # Rows without a password get this chunk's hash of the UI default, never the plaintext
+        return _import_batch('sp_import_members', rows, hash_password(DEFAULT_MEMBER_PASSWORD, method))
+
+    return validate, write
+
+
+def _payment_record(row, packages):
+    """Payment insert payload (without MemberId); raises ValueError with the reason it cannot be imported"""
+    package = _lookup_name(packages, row.get('Package'), 'package')
+    if package is None:
+        raise ValueError('Package is required')
+    amount = package['Price']
+    if row.get('Amount'):
+        try:
+            amount = Decimal(row['Amount'])
+        except ArithmeticError:
+            raise ValueError('Amount must be a number') from None
+        if amount != package['Price']:
+            raise ValueError(_PAYMENT_PRICE_ERROR)
+    mode = row.get('Mode')
+    if mode and len(mode) > 50:
+        raise ValueError('Mode is longer than 50 characters')
+    try:
+        paid_at = _datetime_type.fromisoformat(row.get('TimeStamp') or '')
+    except ValueError:
+        raise ValueError('TimeStamp must be YYYY-MM-DD or YYYY-MM-DD HH:MM[:SS]') from None
+    return {
+        'Amount': str(amount),
+        'Mode': mode,
+        'TimeStamp': paid_at.isoformat(sep=' ', timespec='seconds'),
+        'PackageId': package['PackageId'],
+    }
+
+
+def _payment_importer():
+    """validate/write for payment history: one payment per member, package and timestamp"""
+    seen = {}
+
+    def validate(chunk):
+        packages = _name_index('CALL sp_list_packages()', 'PackageName')
+        rows = [(number, _import_fields('payments', raw)) for number, raw in chunk]
+        accepted, rejected = [], []
+        for (number, row), (member_id, error) in zip(rows, _import_member_ids([row for _, row in rows])):
+            try:
+                if error:
+                    raise ValueError(error)
+                record = dict(_payment_record(row, packages), MemberId=member_id)
+            except ValueError as e:
+                rejected.append((number, 'invalid', str(e)))
+                continue
+            key = (record['MemberId'], record['TimeStamp'], record['PackageId'])
+            if key in seen:
+                rejected.append((number, 'duplicate', f'Repeated in this file (row {seen[key]})'))
+                continue
+            seen[key] = number
+            accepted.append((number, record))
+        if not accepted:
+            return accepted, rejected
+        keys = [{'MemberId': r['MemberId'], 'TimeStamp': r['TimeStamp'], 'PackageId': r['PackageId']} for _, r in accepted]
+        existing = {
+            (r['MemberId'], str(r['TimeStamp']), r['PackageId'])
+            for r in execute_query('CALL sp_existing_payments(%s)', (json.dumps(keys),)) or []
+        }
+        fresh = []
+        for number, record in accepted:
+            if (record['MemberId'], record['TimeStamp'], record['PackageId']) in existing:
+                rejected.append((number, 'duplicate', 'Payment already recorded'))
+            else:
+                fresh.append((number, record))
+        return fresh, rejected
+
+    def write(accepted):
+        return _import_batch('sp_import_payments', accepted)
+
+    return validate, write
+
+
+def _attendance_importer():
+    """validate/write for attendance history, with the same rules as the bulk attendance API"""
+    seen = {}
+
+    def validate(chunk):
+        rows = [(number, _import_fields('attendance', raw)) for number, raw in chunk]
+        accepted, rejected = [], []
+        for (number, row), (member_id, error) in zip(rows, _import_member_ids([row for _, row in rows])):
+            record = None
+            if not error:
+                record, error = _normalize_attendance_row(
+                    {'MemberId': member_id, 'Date': row.get('Date'), 'CheckIn': row.get('CheckIn'), 'CheckOut': row.get('CheckOut')}
+                )
+            if error:
+                rejected.append((number, 'invalid', error))
+                continue
+            if record.get('CheckOut') and record['CheckOut'] < record['CheckIn']:
+                rejected.append((number, 'invalid', _CHECK_TIMES_ERROR))
+                continue
+            key = (record['MemberId'], record['Date'])
+            if key in seen:
+                rejected.append((number, 'duplicate', f'Repeated in this file (row {seen[key]})'))
+                continue
+            seen[key] = number
+            accepted.append((number, record))
+        if not accepted:
+            return accepted, rejected
+        keys = [{'MemberId': r['MemberId'], 'Date': r['Date']} for _, r in accepted]
+        existing = {
+            (r['MemberId'], json_value(r['Date']))
+            for r in execute_query('CALL sp_existing_attendance(%s)', (json.dumps(keys),)) or []
+        }
+        fresh = []
+        for number, record in accepted:
+            if (record['MemberId'], record['Date']) in existing:
+                rejected.append((number, 'duplicate', 'Attendance already recorded for this member and date'))
+            else:
+                fresh.append((number, record))
+        return fresh, rejected
+
+    def write(accepted):
+        failed = _import_batch('sp_record_attendance_batch', accepted)
+        refused = {number for number, _, _ in failed}
+        refresh_occupancy([(r['MemberId'], r['Date']) for number, r in accepted if number not in refused])
+        return failed
+
+    return validate, write
+
+
+IMPORTERS = {
+    'members': _member_importer,
+    'payments': _payment_importer,
+    'attendance': _attendance_importer,
+}
+
+
+def run_import(path, kind, chunk_size=None, restart=False, on_progress=None):
+    """Import ``path`` as ``kind``, resuming a previous run of the same file; returns the final job state"""
+    _check_import_header(path, kind)
+    validate, write = IMPORTERS[kind]()
+    job = ImportJob(path, kind, validate, write, chunk_size=chunk_size or current_app.config['IMPORT_CHUNK_SIZE'],
+                    on_progress=on_progress)
+    if restart:
+        job.reset()
+    # The duplicate checks must see what this import committed a moment ago
+    g.use_replica = False
+    return job.run()
+
+
+def start_import(path, kind):
+    """Run an import on a background thread of this worker (it holds one pool connection while it runs)"""
+    app = current_app._get_current_object()
+
+    def work():
+        with app.app_context():
+            try:
+                run_import(path, kind)
+            except Exception as e:
+                # Recorded in the job state too; the admin page offers to resume
+                app.logger.warning('Import of %s stopped: %s', path, e)
+
+    # The thread dies with its worker (gunicorn max_requests, a timeout or a deploy recycles it)
+    # and the job then shows as stalled until someone resumes it. Large files are better run
+    # with the import-csv CLI, which is not tied to a web worker
+    threading.Thread(target=work, name=f'import-{os.path.basename(path)}', daemon=True).start()
+
+
+def _import_path(job):
+    """Path of an uploaded import by file name, or None when there is no such upload"""
+    if not job or job != secure_filename(job) or not job.endswith('.csv'):
+        return None
+    path = os.path.join(current_app.config['IMPORT_DIR'], job)
+    return path if os.path.isfile(path) else None
+
+
+def import_jobs():
+    """Saved state of every import in IMPORT_DIR (plus ``job`` and ``has_rejects``), newest first"""
+    jobs = []
+    directory = current_app.config['IMPORT_DIR']
+    if not os.path.isdir(directory):
+        return jobs
+    for name in os.listdir(directory):
+        path = _import_path(name)
+        if path is None:
+            continue
+        state = ImportJob(path, None, None, None).load_state()
+        if state is None:
+            continue
+        state.update(job=name, has_rejects=os.path.exists(path + '.rejects.csv'))
+        state['stalled'] = state['status'] == 'running' and time.time() - state['updated_ts'] >= ImportJob.STALE_SECONDS
+        jobs.append(state)
+    return sorted(jobs, key=lambda s: s['started_at'], reverse=True)
+
+
+@bp.route('/admin/import', methods=['GET', 'POST'])
+@role_required('admin')
+def admin_import():
+    """Upload a CSV to import in the background, and follow the progress of earlier imports"""
     if request.method == 'POST':
-        query = request.form.get('sql_query', '').strip()
-        if query:
-            query_executed = query
+        kind = request.form.get('kind')
+        upload = request.files.get('file')
+        if kind not in IMPORT_KINDS:
+            flash('Choose what the file contains', 'danger')
+            return redirect(url_for('.admin_import'))
+        if not upload or not upload.filename.lower().endswith('.csv'):
+            flash('Choose a .csv file to import', 'danger')
+            return redirect(url_for('.admin_import'))
+        directory = current_app.config['IMPORT_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f"{_datetime_type.now():%Y%m%d-%H%M%S}-{kind}-{secure_filename(upload.filename) or 'upload.csv'}"
+        path = os.path.join(directory, name)
+        upload.save(path)
+        try:
+            _check_import_header(path, kind)
+        except (ImportJobError, UnicodeDecodeError, csv.Error) as e:
+            os.remove(path)
+            flash(f'Import not started: {str(e)}', 'danger')
+            return redirect(url_for('.admin_import'))
+        start_import(path, kind)
+        flash(f'Import of {upload.filename} started', 'success')
+        return redirect(url_for('.admin_import'))
+    return render_template('admin/import.html', jobs=import_jobs(), kinds=IMPORT_KINDS,
+                           columns=IMPORT_COLUMNS, chunk_size=current_app.config['IMPORT_CHUNK_SIZE'])
+
+
+@bp.route('/admin/import/status')
+@role_required('admin')
+def admin_import_status():
+    """Progress of every import as JSON (polled by the import page)"""
+    return jsonify(import_jobs())
+
+
+@bp.route('/admin/import/<job>/resume', methods=['POST'])
+@role_required('admin')
+def admin_import_resume(job):
+    """Continue a stopped import after its last saved chunk"""
+    path = _import_path(job)
+    state = ImportJob(path, None, None, None).load_state() if path else None
+    if state is None:
+        flash('No such import', 'danger')
+    elif state['status'] == 'done':
+        flash('That import has finished', 'warning')
+    elif state['status'] == 'running' and time.time() - state['updated_ts'] < ImportJob.STALE_SECONDS:
+        flash('That import is still running', 'warning')
+    else:
+        start_import(path, state['kind'])
+        flash(f'Resuming {job} after row {state["rows_done"]}', 'success')
+    return redirect(url_for('.admin_import'))
+
+
+@bp.route('/admin/import/<job>/rejects')
+@role_required('admin')
+def admin_import_rejects(job):
+    """The rows an import did not load, with the reason for each"""
+    path = _import_path(job)
+    if path is None or not os.path.exists(path + '.rejects.csv'):
+        flash('No rejected rows for that import', 'warning')
+        return redirect(url_for('.admin_import'))
+    return send_file(os.path.abspath(path + '.rejects.csv'), mimetype='text/csv', as_attachment=True,
+                     download_name=job[:-4] + '-rejects.csv')
+
+
+# ---------- Payment audit archival ----------
+def _add_months(day, months):
+    """First day of the month ``months`` after ``day``'s month"""
+    index = day.year * 12 + day.month - 1 + months
+    return _date_type(index // 12, index % 12 + 1, 1)
+
+
+def _partition_bound(less_than):
+    """Upper bound of a Payment_Audit partition (None for MAXVALUE)"""
+    if less_than == 'MAXVALUE':
+        return None
+    return _datetime_type.fromisoformat(less_than.strip("'"))
+
+
+def audit_partitions_to_archive(partitions, keep_months, today=None):
+    """``(name, lower, upper)`` for the oldest partitions that end before the hot window, in order"""
+    cutoff = _datetime_type.combine(_add_months(today or _date_type.today(), -keep_months), _time_type())
+    windows, lower = [], None
+    for part in partitions:
+        upper = _partition_bound(part['LessThan'])
+        if upper is None or upper > cutoff:
+            break
+        windows.append((part['PartitionName'], lower, upper))
+        lower = upper
+    return windows
+
+
+def archive_audit_window(name, lower, upper, directory):
+    """Write one partition's rows to ``<directory>/payment_audit_<name>.ndjson.gz``; return (path, rows)
+
+    The file is written under a temporary name, fsynced, re-read to check the row count
+    and only then renamed into place, so a file that exists is complete.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'payment_audit_{name}.ndjson.gz')
+    partial = path + '.part'
+    conn = db_pool.acquire()
+    finished = False
+    count = 0
+    try:
+        cur = conn.cursor(pymysql.cursors.SSDictCursor)
+        cur.execute('CALL sp_payment_audit_range(%s,%s)', (lower, upper))
+        columns = [d[0] for d in cur.description]
+        with open(partial, 'wb') as raw:
+            with gzip.GzipFile(filename=os.path.basename(path)[:-3], mode='wb', fileobj=raw) as gz:
+                while True:
+                    rows = cur.fetchmany(current_app.config['EXPORT_CHUNK_ROWS'])
+                    if not rows:
+                        break
+                    gz.write(_encode_export_chunk(rows, columns, 'ndjson').encode('utf-8'))
+                    count += len(rows)
+            raw.flush()
+            os.fsync(raw.fileno())
+        cur.close()
+        finished = True
+    finally:
+        db_pool.release(conn, discard=not finished)
+    with gzip.open(partial, 'rt', encoding='utf-8') as fh:
+        written = sum(1 for _ in fh)
+    if written != count:
+        raise RuntimeError(f'{partial}: wrote {written} of {count} rows')
+    os.replace(partial, path)
+    return path, count
+
+
+def restore_audit_file(path, batch_size=None):
+    """Re-insert an archive file in batches (default AUDIT_RESTORE_BATCH); return (rows read, rows restored)"""
+    batch_size = batch_size or current_app.config['AUDIT_RESTORE_BATCH']
+    read = restored = 0
+    batch = []
+
+    def flush():
+        rows = execute_query('CALL sp_restore_payment_audit(%s)', (json.dumps(batch),), commit=True)
+        batch.clear()
+        return rows[0]['Restored'] if rows else 0
+
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            read += 1
+            if len(batch) >= batch_size:
+                restored += flush()
+    if batch:
+        restored += flush()
+    return read, restored
+
+
+# ---------- CLI ----------
+@bp.cli.command('rebuild-membership-status')
+def rebuild_membership_status_command():
+    """Backfill MembershipStatus from Payment (flask --app app rebuild-membership-status)"""
+    rows = execute_query('CALL sp_rebuild_membership_status()', commit=True)
+    count = rows[0]['MembersWithStatus'] if rows else 0
+    click.echo(f'MembershipStatus rebuilt: {count} member(s) with a membership')
+
+
+@bp.cli.command('rebuild-attendance-rollups')
+def rebuild_attendance_rollups_command():
+    """Recompute the attendance rollups from Attendance (flask --app app rebuild-attendance-rollups)"""
+    rows = execute_query('CALL sp_rebuild_attendance_rollups()', commit=True)
+    row = rows[0] if rows else {}
+    click.echo(f"Attendance rollups rebuilt: {row.get('HourlyBuckets', 0)} hourly bucket(s), {row.get('TrainerDays', 0)} trainer-day(s)")
+
+
+@bp.cli.command('rebuild-workout-aggregates')
+def rebuild_workout_aggregates_command():
+    """Recompute sessions, weekly volume and personal records from WorkoutSet (flask --app app rebuild-workout-aggregates)"""
+    rows = execute_query('CALL sp_rebuild_workout_aggregates()', commit=True)
+    row = rows[0] if rows else {}
+    click.echo(f"Workout aggregates rebuilt: {row.get('Sessions', 0)} session(s), {row.get('Weeks', 0)} week(s), "
+               f"{row.get('Records', 0)} personal record(s)")
+
+
+@bp.cli.command('membership-expiry')
+@click.option('--once', is_flag=True, help='Run one pass now and exit (for cron)')
+@click.option('--at', 'run_at', help='Local time (HH:MM) of the daily run (default: EXPIRY_RUN_AT)')
+@click.option('--horizon', type=int, help='Days ahead counted as expiring (default: EXPIRY_HORIZON_DAYS)')
+@click.option('--lapsed', type=int, help='Days back counted as recently expired (default: EXPIRY_LAPSED_DAYS)')
+def membership_expiry_command(once, run_at, horizon, lapsed):
+    """Compute expiring/expired memberships nightly (flask --app app membership-expiry [--once])"""
+    app = current_app._get_current_object()
+    run_at = run_at or app.config['EXPIRY_RUN_AT']
+    horizon = app.config['EXPIRY_HORIZON_DAYS'] if horizon is None else horizon
+    lapsed = app.config['EXPIRY_LAPSED_DAYS'] if lapsed is None else lapsed
+
+    def run():
+        # Fresh app context per pass so no pooled connection is held between runs
+        with app.app_context():
+            row = compute_membership_expiry(horizon=horizon, lapsed=lapsed)
+        click.echo(f"{row.get('AsOf')}: {row.get('Expiring', 0)} expiring within {horizon} day(s), "
+                   f"{row.get('Expired', 0)} expired in the last {lapsed} day(s)")
+
+    try:
+        seconds_until(run_at)
+    except ValueError:
+        raise click.BadParameter('expected HH:MM', param_hint='--at')
+    if once:
+        run()
+        return
+    with app.app_context():
+        last = execute_query('CALL sp_get_membership_expiry_run()', silent=True)
+    if not last or last[0]['AsOf'] < _date_type.today():
+        # Catch up after downtime instead of waiting for the next scheduled time; a failure
+        # (e.g. MySQL still down at start-up) must not end the worker
+        try:
+            run()
+        except Exception as e:
+            app.logger.error('Membership expiry catch-up run failed: %s', e)
+    while True:
+        delay = seconds_until(run_at)
+        click.echo(f'Next run at {run_at} (in {delay / 3600:.1f}h)')
+        time.sleep(delay)
+        try:
+            run()
+        except Exception as e:
+            app.logger.error('Membership expiry run failed: %s', e)
+
+
+@bp.cli.command('archive-payment-audit')
+@click.option('--keep-months', type=int, help='Months of audit history kept in MySQL (default: AUDIT_HOT_MONTHS)')
+@click.option('--dir', 'directory', help='Where archive files are written (default: AUDIT_ARCHIVE_DIR)')
+@click.option('--dry-run', is_flag=True, help='List what would be archived without changing anything')
+def archive_payment_audit_command(keep_months, directory, dry_run):
+    """Archive old Payment_Audit partitions to gzip files and drop them (flask --app app archive-payment-audit)"""
+    keep_months = current_app.config['AUDIT_HOT_MONTHS'] if keep_months is None else keep_months
+    directory = directory or current_app.config['AUDIT_ARCHIVE_DIR']
+    if not dry_run:
+        until = _add_months(_date_type.today(), current_app.config['AUDIT_PARTITIONS_AHEAD'])
+        rows = execute_query('CALL sp_extend_payment_audit_partitions(%s)', (until,), commit=True)
+        added, moved = (rows[0]['PartitionsAdded'], rows[0]['RowsMoved']) if rows else (0, 0)
+        click.echo(f'Monthly partitions added: {added} ({moved} row(s) moved out of p_future)')
+    partitions = execute_query('CALL sp_payment_audit_partitions()')
+    windows = audit_partitions_to_archive(partitions, keep_months)
+    if not windows:
+        click.echo(f'Nothing older than {keep_months} month(s) to archive')
+        return
+    for name, lower, upper in windows:
+        if dry_run:
+            click.echo(f'Would archive {name} ({lower or "start"} to {upper})')
+            continue
+        path, count = archive_audit_window(name, lower, upper, directory)
+        execute_query('CALL sp_drop_payment_audit_partition(%s)', (name,), commit=True)
+        click.echo(f'Archived {name}: {count} row(s) -> {path}')
+
+
+@bp.cli.command('restore-payment-audit')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def restore_payment_audit_command(paths):
+    """Load archived audit files back into Payment_Audit (flask --app app restore-payment-audit FILE...)"""
+    for path in paths:
+        read, restored = restore_audit_file(path)
+        click.echo(f'{path}: restored {restored} of {read} row(s) ({read - restored} already present)')
+
+
+@bp.cli.command('password-hash-cost')
+@click.option('--method', help='werkzeug hash method to time (default: PASSWORD_HASH_METHOD)')
+@click.option('--rounds', default=5, show_default=True, help='Login checks to time')
+def password_hash_cost_command(method, rounds):
+    """Time one login's password check at a hash cost (flask --app app password-hash-cost)"""
+    try:
+        stored = hash_password('benchmark', method)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--method')
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        check_password_hash(stored, 'benchmark')
+        timings.append(time.perf_counter() - started)
+    median = sorted(timings)[len(timings) // 2]
+    click.echo(f"{stored.split('$', 1)[0]}: {median * 1000:.0f} ms per login check (median of {rounds}), "
+               f"about {1 / median:.1f} logins/s per CPU core")
+
+
+def migration_runner():
+    """Runner on its own connection; no socket timeouts, since an online index build can take minutes"""
+    config = dict(current_app.config, DB_READ_TIMEOUT=0, DB_WRITE_TIMEOUT=0)
+    return MigrationRunner(lambda: open_db_connection(config), lock_wait_timeout=config['MIGRATE_LOCK_WAIT_SECONDS'],
+                           echo=click.echo)
+
+
+@bp.cli.command('migrate')
+@click.option('--to', 'target', type=int, help='Stop after this version (default: latest)')
+@click.option('--dry-run', is_flag=True, help='List the pending migrations without running them')
+def migrate_command(target, dry_run):
+    """Apply pending schema migrations from migrations/ in order (flask --app app migrate)"""
+    try:
+        applied = migration_runner().up(target=target, dry_run=dry_run)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    if not applied:
+        click.echo('Schema is up to date')
+
+
+@bp.cli.command('migrate-down')
+@click.option('--steps', default=1, show_default=True, help='How many applied migrations to roll back')
+@click.option('--to', 'target', type=int, help='Roll back every migration above this version instead')
+@click.option('--dry-run', is_flag=True, help='List what would be rolled back without running it')
+def migrate_down_command(steps, target, dry_run):
+    """Roll back applied schema migrations, newest first (flask --app app migrate-down)"""
+    try:
+        rolled_back = migration_runner().down(target=target, steps=steps, dry_run=dry_run)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    if not rolled_back:
+        click.echo('Nothing to roll back')
+
+
+@bp.cli.command('migrate-status')
+def migrate_status_command():
+    """Show which schema migrations are applied (flask --app app migrate-status)"""
+    try:
+        rows = migration_runner().status()
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    for row in rows:
+        click.echo(f"{row['version']:04d}  {row['state']:<8}  {row['applied_at'] or '-'!s:<19}  {row['name']}")
+
+
+@bp.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', type=click.IntRange(min=1), help='Rows checked and written per transaction (default: IMPORT_CHUNK_SIZE)')
+@click.option('--restart', is_flag=True, help='Discard saved progress and rejects and start again from the first row')
+def import_csv_command(kind, path, chunk_size, restart):
+    """Import members, payments or attendance from a CSV file; run it again to resume (flask --app app import-csv KIND FILE)"""
+    chunks = []
+
+    def progress(state):
+        chunks.append(state['rows_done'])
+        click.echo(f"{state['rows_done']}/{state['rows_total']} rows: {state['imported']} imported, "
+                   f"{state['duplicate']} duplicate, {state['rejected']} rejected")
+
+    try:
+        state = run_import(path, kind, chunk_size=chunk_size, restart=restart, on_progress=progress)
+    except (ImportJobError, UnicodeDecodeError, csv.Error) as e:
+        raise click.ClickException(str(e))
+    except (pymysql.MySQLError, CircuitOpenError, PoolTimeout) as e:
+        state = ImportJob(path, kind, None, None).load_state() or {'rows_done': 0}
+        raise click.ClickException(f"Import stopped after row {state['rows_done']} ({e}); run the same command again to resume")
+    if not chunks and state['rows_total']:
+        click.echo(f"Already imported on {state['finished_at']}; use --restart to import it again")
+    click.echo(f"Done: {state['imported']} imported, {state['duplicate']} duplicate, {state['rejected']} rejected")
+    if state['duplicate'] or state['rejected']:
+        click.echo(f'Rows not imported and why: {path}.rejects.csv')
+
+
+# ---------- Application factory ----------
+# Parameterless reference-data procedures primed into the cache by warm_worker
+WARM_CACHE_PROCEDURES = ('sp_list_packages', 'sp_list_trainers', 'sp_list_workout_plans', 'sp_list_equipment', 'sp_list_exercises')
+
+# phase -> seconds for this process's last create_app / warm_worker run
+startup_timings = {}
+metrics.gauge(
+    'gym_startup_seconds', 'Time spent in each start-up phase of this process', ('phase',),
+    fn=lambda: {(phase,): seconds for phase, seconds in startup_timings.items()},
+)
+
+
+def configure_process(config):
+    """(Re)build this process's caches, query fan-out threads and occupancy index from ``config``"""
+    global identity_cache, query_cache, _gather_executor, occupancy, _occupancy_streams
+    if _gather_executor is not None:
+        _gather_executor.shutdown(wait=False)
+    identity_cache = QueryCache(max_entries=config['IDENTITY_CACHE_SIZE'], ttl=config['IDENTITY_CACHE_TTL'])
+    query_cache = QueryCache(
+        max_entries=config['QUERY_CACHE_SIZE'],
+        ttl=config['QUERY_CACHE_TTL'],
+        max_stale=config['QUERY_CACHE_MAX_STALE'],
+    )
+    _gather_executor = ThreadPoolExecutor(max_workers=config['QUERY_GATHER_WORKERS'], thread_name_prefix='query-gather')
+    occupancy = OccupancyIndex(_load_occupancy_day, sync_interval=config['OCCUPANCY_SYNC_SECONDS'])
+    _occupancy_streams = threading.BoundedSemaphore(config['OCCUPANCY_MAX_STREAMS'])
+
+
+def create_app(config=None):
+    """Build the app for ``config`` (a config class or name; default $APP_CONFIG, else development).
+
+    Never connects to MySQL: pools open connections on first use, so the testing
+    config (DB_ENABLED = False) gives a working app without a database. Every setting
+    is read from ``app.config``; the pools, breaker, caches and worker threads are
+    per process and rebuilt here, so the last app created in a process owns them.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(get_config(config))
+    configure_database(app.config)
+    configure_process(app.config)
+    app.register_blueprint(bp)
+    app.teardown_appcontext(release_db_connection)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    if app.config['WARM_TEMPLATES']:
+        # Compiled once here; with a preloading server every worker inherits them
+        template_started = time.perf_counter()
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        startup_timings['templates'] = time.perf_counter() - template_started
+    startup_timings['create_app'] = time.perf_counter() - started
+    return app
+
+
+def warm_worker(app):
+    """Per-worker start-up after fork: fresh pools and threads, open connections, prime the caches.
+
+    Called by the WSGI server's post-worker-init hook (gunicorn.conf.py) before the
+    worker accepts requests; returns the start-up timings. Failures are logged, not
+    raised, so a worker still starts (cold) when MySQL is briefly unreachable.
+    """
+    global _gather_executor
+    started = time.perf_counter()
+    # Sockets and threads do not survive fork(); nothing from the parent may be reused
+    db_pool.reset_after_fork()
+    db_breaker.reset_after_fork()
+    if replicas is not None:
+        replicas.reset_after_fork()
+    _gather_executor = ThreadPoolExecutor(max_workers=app.config['QUERY_GATHER_WORKERS'], thread_name_prefix='query-gather')
+    occupancy.reset_after_fork()
+
+    if app.config['DB_ENABLED'] and app.config['WARM_POOL_CONNECTIONS']:
+        pool_started = time.perf_counter()
+        conns = []
+        try:
+            for _ in range(min(app.config['WARM_POOL_CONNECTIONS'], db_pool.max_size)):
+                conns.append(db_pool.acquire())
+        except Exception as e:
+            app.logger.warning('Worker warm-up: could not open connections: %s', e)
+        finally:
+            for conn in conns:
+                db_pool.release(conn)
+        startup_timings['warm_pool'] = time.perf_counter() - pool_started
+
+    if app.config['DB_ENABLED'] and app.config['WARM_CACHE']:
+        cache_started = time.perf_counter()
+        with app.app_context():
+            for procedure in WARM_CACHE_PROCEDURES:
+                execute_query(f'CALL {procedure}()', silent=True)
+        startup_timings['warm_cache'] = time.perf_counter() - cache_started
+
+    if app.config['DB_ENABLED'] and app.config['WARM_OCCUPANCY']:
+        occupancy_started = time.perf_counter()
+        with app.app_context():
             try:
-                conn = get_db_connection()
-                try:
-                    with conn.cursor() as cur:
-                        cur.execute(query)
-                        if cur.description:
-                            # SELECT query - fetch results
-                            results = cur.fetchall()
-                        else:
-                            # INSERT/UPDATE/DELETE - show affected rows
-                            conn.commit()
-                            results = [{'affected_rows': cur.rowcount, 'message': 'Query executed successfully'}]
-                except Exception as e:
-                    conn.rollback()
-                    error = str(e)
-                finally:
-                    conn.close()
+                occupancy.rebuild(_date_type.today())
             except Exception as e:
-                error = str(e)
-    
-    return render_template('admin/mysql_console.html', results=results, error=error, query_executed=query_executed)
+                app.logger.warning('Worker warm-up: could not load occupancy: %s', e)
+        startup_timings['warm_occupancy'] = time.perf_counter() - occupancy_started
+
+    startup_timings['warm_worker'] = time.perf_counter() - started
+    return dict(startup_timings)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 3000)), debug=True)
\ No newline at end of file
+    app = create_app()
+    # Debug: Print DB config (remove password for security)
+    print(f"DB_HOST: {app.config['DB_HOST']}")
+    print(f"DB_USER: {app.config['DB_USER']}")
+    print(f"DB_PASSWORD: {'*' * len(app.config['DB_PASSWORD'])} (length: {len(app.config['DB_PASSWORD'])})")
+    print(f"DB_NAME: {app.config['DB_NAME']}")
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 3000)), debug=app.config['DEBUG'])
\ No newline at end of file
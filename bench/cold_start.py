@@ -0,0 +1,91 @@
+"""Worker cold-start timer.
+
+Starts fresh interpreters and times what a new worker goes through before and
+while serving its first requests: importing ``app``, ``create_app`` (template
+compilation), ``warm_worker`` (connections and cache) and the first two requests:
+
+    python bench/cold_start.py --runs 10
+    python bench/cold_start.py --config testing          # no database needed
+    python bench/cold_start.py --max-ms 1500             # exit non-zero when p95 total is slower
+
+Uses the same DB_* settings (.env) as the app for the production config.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ('import', 'create_app', 'warm_worker', 'first_request', 'second_request', 'total')
+
+
+def child(config, path):
+    """Run one cold start in this process and print the phase timings as JSON."""
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import app as gym
+
+    timings = {'import': time.perf_counter() - started}
+    mark = time.perf_counter()
+    app = gym.create_app(config)
+    timings['create_app'] = time.perf_counter() - mark
+    mark = time.perf_counter()
+    gym.warm_worker(app)
+    timings['warm_worker'] = time.perf_counter() - mark
+
+    client = app.test_client()
+    for phase in ('first_request', 'second_request'):
+        mark = time.perf_counter()
+        client.get(path).close()
+        timings[phase] = time.perf_counter() - mark
+    timings['total'] = time.perf_counter() - started
+    print(json.dumps(timings))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--config', default='production', help='development, production or testing')
+    parser.add_argument('--path', default='/login', help='URL requested after warm-up')
+    parser.add_argument('--max-ms', type=float, help='fail when the p95 total exceeds this')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.config, args.path)
+        return
+
+    results = {phase: [] for phase in PHASES + ('process',)}
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', '--config', args.config, '--path', args.path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        # Includes interpreter start-up and exit, which the in-process phases cannot see
+        results['process'].append(time.perf_counter() - started)
+        for phase, seconds in json.loads(out.strip().splitlines()[-1]).items():
+            results[phase].append(seconds)
+
+    print(f'{"phase":<16}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+    for phase, values in results.items():
+        values.sort()
+        print(f'{phase:<16}{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}'
+              f'{values[-1] * 1000:>10.1f}')
+
+    p95_total = percentile(results['total'], 95) * 1000
+    if args.max_ms is not None and p95_total > args.max_ms:
+        print(f'\nCold start p95 {p95_total:.0f} ms exceeds {args.max_ms:.0f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
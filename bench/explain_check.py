@@ -0,0 +1,239 @@
+"""EXPLAIN regression check for the stored procedures' queries.
+
+Reads every registered procedure (and function) from REVIEW-3.sql, pulls out
+each SELECT in its body, substitutes sample values for the parameters and
+local variables, runs EXPLAIN on it and fails when a large table is read with a
+full table scan (type ALL) or the plan needs a filesort over it, e.g.
+
+    python bench/explain_check.py                          # after bench/generate_data.py
+    python bench/explain_check.py --only sp_get_attendance_all --verbose
+    python bench/explain_check.py --list                   # print the statements; no database needed
+
+Run it on the bench dataset: on a handful of seed rows the optimizer scans
+small tables on purpose. Plans touching fewer than --min-rows estimated rows
+are not reported. Uses the same DB_* settings (.env) as the app.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from datetime import date, timedelta
+
+import pymysql
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROCEDURES_FILE = os.path.join(ROOT, 'REVIEW-3.sql')
+
+# Tables that grow with members and history; the small reference tables may be scanned
+LARGE_TABLES = {
+    'member', 'attendance', 'payment', 'payment_audit', 'member_workoutplan', 'membershipstatus',
+    'workoutset', 'workoutsession', 'workoutweeklyvolume', 'workoutpersonalrecord',
+}
+
+# Procedures whose queries are checked -> {parameter: sample to use instead of its own}. Not listed:
+# full exports (sp_export_*, which stream whole tables by design), rebuild/backfill procedures,
+# the dynamic sp_api_* statements and writes.
+REGISTRY = {
+    'sp_list_members_basic': {},
+    'sp_list_members_for_trainer': {},
+    'sp_get_member_basic': {},
+    'sp_search_members': {},
+    'sp_get_members': {},
+    'sp_get_member_detail': {},
+    'sp_get_trainer_members': {},
+    'sp_get_trainer_members_with_plans': {},
+    'sp_get_member_trainer_and_plans': {},
+    'sp_get_membership_end_dates': {},
+    'sp_get_membership_end_date_for_member': {},
+    'sp_get_active_status_all': {},
+    'sp_get_active_status_for_trainer': {},
+    'sp_get_membership_expiry': {},
+    'sp_refresh_membership_status': {},
+    'fn_membership_end_date': {},
+    'sp_get_attendance_all': {},
+    'sp_get_attendance_for_trainer': {},
+    'sp_occupancy_day': {},
+    'sp_occupancy_entries': {},
+    'sp_members_in_scope': {},
+    'sp_existing_attendance': {},
+    'sp_existing_member_contacts': {},
+    'sp_members_by_email': {},
+    'sp_existing_payments': {'p_keys': 'payment_keys'},
+    'sp_get_payment_audit_all': {'p_cursor': 'audit'},
+    'sp_get_payment_audit_for_member': {},
+    'sp_get_personal_records': {},
+    'sp_get_weekly_volume': {},
+    'sp_get_workout_sessions': {},
+}
+
+_ROUTINE_RE = re.compile(
+    r'CREATE\s+(?:PROCEDURE|FUNCTION)\s+(\w+)\s*\(.*?\n\s*BEGIN\b(.*?)\nEND\s*//', re.IGNORECASE | re.DOTALL)
+_SELECT_RE = re.compile(r'(?:^|\bTHEN\b|\bELSE\b|\bBEGIN\b)\s*((?:\(\s*)*SELECT\b)', re.IGNORECASE | re.DOTALL)
+_INTO_RE = re.compile(r'\bINTO\s+@?\w+(?:\s*,\s*@?\w+)*\s+(?=FROM\b)', re.IGNORECASE)
+_VARIABLE_RE = re.compile(r'\b[pv]_\w+\b')
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|RIGHT\b|INNER\b|CROSS\b|ORDER\b|GROUP\b|HAVING\b|LIMIT\b|UNION\b)(\w+))?',
+    re.IGNORECASE)
+
+
+def connect():
+    return pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        database=os.getenv('DB_NAME', 'GymMemberShip_WorkOutTracker'),
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+
+
+def routines(path=PROCEDURES_FILE):
+    """name -> body of every procedure and function in the file"""
+    with open(path, encoding='utf-8') as f:
+        text = re.sub(r'--[^\n]*', '', f.read())
+    return {m.group(1): m.group(2) for m in _ROUTINE_RE.finditer(text)}
+
+
+def selects(body):
+    """The top-level SELECT statements of a routine body, with ``INTO var, ...`` removed"""
+    found = []
+    for chunk in body.split(';'):
+        match = _SELECT_RE.search(chunk.strip())
+        if match:
+            found.append(_INTO_RE.sub('', chunk.strip()[match.start(1):]).strip())
+    return found
+
+
+def sample_values(conn):
+    """Representative parameter values from the database (a member with history, its trainer, a busy day)"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT MAX(Date) AS Day FROM Attendance')
+        day = cur.fetchone()['Day'] or date.today()
+        cur.execute('SELECT MemberId FROM Attendance WHERE Date = %s LIMIT 1', (day,))
+        row = cur.fetchone()
+        member = row['MemberId'] if row else 1
+        cur.execute('SELECT TrainerId, Email, PhoneNo FROM Member WHERE MemberId = %s', (member,))
+        row = cur.fetchone() or {}
+        trainer = row.get('TrainerId') or 1
+        email = row.get('Email') or 'member@example.com'
+        phone = row.get('PhoneNo') or '0000000000'
+        cur.execute('SELECT MAX(AuditId) AS AuditId FROM Payment_Audit')
+        audit = cur.fetchone()['AuditId'] or 1
+    return placeholder_values(member=member, trainer=trainer, day=day, audit=audit, email=email, phone=phone)
+
+
+def placeholder_values(member=1, trainer=1, day=None, audit=1, email='member@example.com', phone='0000000000'):
+    day = day or date.today()
+    return {
+        'audit': audit,
+        'p_member': member,
+        'p_trainer': trainer,
+        'p_date': day,
+        'p_time': '18:00:00',
+        'p_cursor': member,
+        'p_backward': 0,
+        'p_limit': 50,
+        'p_from': day - timedelta(weeks=12),
+        'p_to': day,
+        'p_term': 'Ra',
+        'v_after': member,
+        'v_prefix': 'Ra%',
+        'p_keys': f'[{{"MemberId": {member}, "Date": "{day.isoformat()}"}}]',
+        'p_members': f'[{member}]',
+        'p_emails': json.dumps([email]),
+        'p_phones': json.dumps([phone]),
+        'payment_keys': json.dumps([{'MemberId': member, 'TimeStamp': f'{day.isoformat()} 00:00:00', 'PackageId': 1}]),
+    }
+
+
+def bind(statement, values, overrides, escape):
+    """Statement with every p_/v_ name replaced by a literal; raises KeyError for a missing sample"""
+    return _VARIABLE_RE.sub(lambda m: escape(values[overrides.get(m.group(0), m.group(0))]), statement)
+
+
+def aliases(statement):
+    """alias (lower case) -> table (lower case) for the FROM/JOIN clauses of a statement"""
+    found = {}
+    for table, alias in _TABLE_RE.findall(statement):
+        found[table.lower()] = table.lower()
+        if alias:
+            found[alias.lower()] = table.lower()
+    return found
+
+
+def problems(plan, statement, min_rows):
+    """Findings for one EXPLAIN result: full scans and filesorts on large tables"""
+    tables = aliases(statement)
+    # Rows flowing out of each SELECT id (a filesort sorts the whole join of its SELECT)
+    output = {}
+    for row in plan:
+        output[row['id']] = output.get(row['id'], 1) * (row['rows'] or 1) * float(row['filtered'] or 100) / 100
+    found = []
+    for row in plan:
+        table = tables.get((row['table'] or '').lower())
+        if table not in LARGE_TABLES:
+            continue
+        extra = row['Extra'] or ''
+        if row['type'] == 'ALL' and (row['rows'] or 0) >= min_rows:
+            found.append(f"full scan of {row['table']} ({table}, ~{row['rows']} rows)")
+        if 'Using filesort' in extra and output[row['id']] >= min_rows:
+            found.append(f"filesort of ~{output[row['id']]:.0f} rows starting at {row['table']} ({table})")
+    return found
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', action='append', help='check just this procedure (repeatable)')
+    parser.add_argument('--min-rows', type=int, default=1000, help='ignore plans estimated below this many rows')
+    parser.add_argument('--list', action='store_true', help='print the bound statements and exit')
+    parser.add_argument('--verbose', action='store_true', help='print every plan row')
+    args = parser.parse_args()
+
+    bodies = routines()
+    names = args.only or sorted(REGISTRY)
+    unknown = [name for name in names if name not in bodies]
+    if unknown:
+        parser.error(f'not found in REVIEW-3.sql: {", ".join(unknown)}')
+
+    conn = None if args.list else connect()
+    values = placeholder_values() if args.list else sample_values(conn)
+    escape = (lambda v: pymysql.converters.escape_item(v, 'utf8mb4')) if args.list else conn.escape
+    failures = 0
+    for name in names:
+        for number, statement in enumerate(selects(bodies[name]), 1):
+            label = f'{name}#{number}'
+            try:
+                bound = bind(statement, values, REGISTRY.get(name, {}), escape)
+            except KeyError as e:
+                print(f'ERROR {label}: no sample value for {e.args[0]}')
+                failures += 1
+                continue
+            if args.list:
+                print(f'-- {label}\n{bound};\n')
+                continue
+            with conn.cursor() as cur:
+                try:
+                    cur.execute('EXPLAIN ' + bound)
+                    plan = cur.fetchall()
+                except pymysql.MySQLError as e:
+                    print(f'ERROR {label}: {e}')
+                    failures += 1
+                    continue
+            found = problems(plan, bound, args.min_rows)
+            print(f"{'FAIL' if found else 'ok  '} {label}" + ''.join(f'\n       {p}' for p in found))
+            if args.verbose:
+                for row in plan:
+                    print(f"       {row['id']} {row['table']!s:<12} {row['type']!s:<7} key={row['key']} "
+                          f"rows={row['rows']} {row['Extra'] or ''}")
+            failures += bool(found)
+    if conn is not None:
+        conn.close()
+    if failures:
+        print(f'\n{failures} statement(s) need an index or a rewrite')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Deterministic synthetic dataset generator for load tests.
+
+Scales the gym schema to N members, trainers and plans with years of
+attendance and payment history, e.g.
+
+    python bench/generate_data.py --members 100000 --trainers 200 --plans 500 --years 3
+
+writes ~100k members, ~45M attendance rows at the default 3 visits/week and
+~1M payments. Every bench row is tagged (``bench-`` e-mails, ``Bench`` plan
+goals) so ``--reset`` can remove a previous run without touching seed data.
+The same ``--seed`` always produces the same dataset.
+
+Uses the same DB_* settings (.env) as the app. Run against a local/throwaway
+database only.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import pymysql
+from dotenv import load_dotenv
+
+FIRST_NAMES = ['Amit', 'Priya', 'Karan', 'Sneha', 'Rahul', 'Anjali', 'Vikas', 'Neha', 'Arjun', 'Divya',
+               'Rohan', 'Pooja', 'Suresh', 'Kavya', 'Manoj', 'Isha', 'Nikhil', 'Meera', 'Aditya', 'Ritu']
+LAST_NAMES = ['Sharma', 'Rao', 'Verma', 'Gupta', 'Patel', 'Singh', 'Kumar', 'Reddy', 'Nair', 'Iyer',
+              'Das', 'Joshi', 'Mehta', 'Kapoor', 'Bose', 'Menon', 'Pillai', 'Chopra', 'Malhotra', 'Shah']
+GOALS = ['Fat Loss', 'Muscle Gain', 'Strength', 'Endurance', 'Mobility', 'Conditioning', 'Rehab', 'Powerlifting']
+MODES = ['Card', 'Cash', 'UPI', 'Net Banking', 'Wallet']
+GENDERS = ['M', 'F', 'Other']
+
+
+def connect():
+    return pymysql.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        database=os.getenv('DB_NAME', 'GymMemberShip_WorkOutTracker'),
+        autocommit=False,
+    )
+
+
+class BatchWriter:
+    """Buffers rows and flushes them as multi-row INSERTs, committing every flush."""
+
+    def __init__(self, conn, sql, batch_size):
+        self.conn = conn
+        self.sql = sql
+        self.batch_size = batch_size
+        self.rows = []
+        self.total = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with self.conn.cursor() as cur:
+            # executemany() rewrites INSERT ... VALUES into one multi-row statement per call
+            cur.executemany(self.sql, self.rows)
+        self.conn.commit()
+        self.total += len(self.rows)
+        self.rows = []
+
+
+def reset(conn):
+    """Remove rows created by previous generator runs (dependency order)."""
+    statements = [
+        "DELETE A FROM Attendance A JOIN Member M ON A.MemberId = M.MemberId WHERE M.Email LIKE 'bench-%'",
+        "DELETE P FROM Payment P JOIN Member M ON P.MemberId = M.MemberId WHERE M.Email LIKE 'bench-%'",
+        "DELETE FROM Member WHERE Email LIKE 'bench-%'",
+        "DELETE FROM WorkOutPlan WHERE Goal LIKE 'Bench %'",
+        "DELETE FROM Trainer WHERE Email LIKE 'bench-%'",
+    ]
+    with conn.cursor() as cur:
+        for sql in statements:
+            cur.execute(sql)
+            print(f'  {cur.rowcount:>10} rows  {sql[:60]}...')
+    conn.commit()
+
+
+def fetch_ids(conn, sql):
+    with conn.cursor() as cur:
+        cur.execute(sql)
+        return [row[0] for row in cur.fetchall()]
+
+
+def visit_time(rng):
+    """Check-in clustered around the 7am and 6pm peaks, with some midday traffic."""
+    bucket = rng.random()
+    if bucket < 0.4:
+        minutes = int(rng.gauss(7 * 60, 45))
+    elif bucket < 0.85:
+        minutes = int(rng.gauss(18 * 60, 50))
+    else:
+        minutes = rng.randint(9 * 60, 16 * 60)
+    minutes = max(5 * 60, min(minutes, 21 * 60))
+    duration = rng.randint(30, 120)
+    check_in = timedelta(minutes=minutes)
+    return check_in, check_in + timedelta(minutes=duration)
+
+
+def generate(args):
+    conn = connect()
+    started = time.time()
+    if args.reset:
+        print('Removing previous bench data...')
+        reset(conn)
+
+    end = date.today()
+    start = end - timedelta(days=365 * args.years)
+
+    with conn.cursor() as cur:
+        cur.execute('SELECT PackageId, Price, DurationWeeks FROM Package ORDER BY PackageId')
+        packages = cur.fetchall()
+    if not packages:
+        sys.exit('No packages found; load GymMemberShip_WorkOutTracker.sql first')
+
+    rng = random.Random(args.seed)
+
+    print(f'Trainers: {args.trainers}')
+    trainers = BatchWriter(conn, 'INSERT INTO Trainer (TrainerName, DoB, PhoneNo, Email, Password) VALUES (%s,%s,%s,%s,%s)', args.batch_size)
+    for i in range(args.trainers):
+        trainers.add((
+            f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            date(1975, 1, 1) + timedelta(days=rng.randint(0, 9000)),
+            f'8{args.seed % 10}{i:08d}',
+            f'bench-trainer-{args.seed}-{i}@example.com',
+            'trainer123',
+        ))
+    trainers.flush()
+    trainer_ids = fetch_ids(conn, f"SELECT TrainerId FROM Trainer WHERE Email LIKE 'bench-trainer-{args.seed}-%' ORDER BY TrainerId")
+
+    print(f'Plans: {args.plans}')
+    plans = BatchWriter(conn, 'INSERT INTO WorkOutPlan (DurationWeeks, Goal, TrainerId) VALUES (%s,%s,%s)', args.batch_size)
+    for i in range(args.plans):
+        plans.add((rng.choice([4, 6, 8, 12, 16, 24]), f'Bench {rng.choice(GOALS)} #{i}', rng.choice(trainer_ids)))
+    plans.flush()
+    plan_ids = fetch_ids(conn, "SELECT PlanId FROM WorkOutPlan WHERE Goal LIKE 'Bench %' ORDER BY PlanId")
+
+    print(f'Members: {args.members}')
+    members = BatchWriter(
+        conn,
+        'INSERT INTO Member (Name, Email, PhoneNo, Password, Address, DoB, JoinDate, Gender, PackageId, TrainerId) '
+        'VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)',
+        args.batch_size,
+    )
+    for i in range(args.members):
+        package = rng.choice(packages)
+        members.add((
+            f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            f'bench-member-{args.seed}-{i}@example.com',
+            f'7{args.seed % 10}{i:08d}',
+            'member123',
+            f'No.{i}, Bench Street',
+            date(1960, 1, 1) + timedelta(days=rng.randint(0, 16000)),
+            start + timedelta(days=rng.randint(0, max(1, (end - start).days - 1))),
+            rng.choice(GENDERS),
+            package[0],
+            rng.choice(trainer_ids),
+        ))
+    members.flush()
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT MemberId, JoinDate, PackageId FROM Member WHERE Email LIKE 'bench-member-{args.seed}-%' ORDER BY MemberId"
+        )
+        member_rows = cur.fetchall()
+    package_by_id = {p[0]: p for p in packages}
+
+    print('Plan assignments, payments and attendance...')
+    enrolments = BatchWriter(conn, 'INSERT IGNORE INTO Member_WorkOutPlan (MemberId, PlanId) VALUES (%s,%s)', args.batch_size)
+    payments = BatchWriter(
+        conn, 'INSERT INTO Payment (Amount, Mode, TimeStamp, MemberId, PackageId) VALUES (%s,%s,%s,%s,%s)', args.batch_size
+    )
+    attendance = BatchWriter(
+        conn, 'INSERT INTO Attendance (MemberId, Date, CheckInTime, CheckOutTime) VALUES (%s,%s,%s,%s)', args.batch_size
+    )
+    visit_probability = min(1.0, args.visits_per_week / 7.0)
+    for n, (member_id, join_date, package_id) in enumerate(member_rows, start=1):
+        # Per-member generator keeps output identical regardless of batch size or progress
+        mrng = random.Random(args.seed * 1_000_003 + member_id)
+        for plan_id in mrng.sample(plan_ids, k=min(len(plan_ids), mrng.randint(0, 3))):
+            enrolments.add((member_id, plan_id))
+
+        _, price, weeks = package_by_id[package_id]
+        paid_on = join_date
+        while paid_on <= end:
+            stamp = datetime.combine(paid_on, datetime.min.time()) + timedelta(minutes=mrng.randint(8 * 60, 20 * 60))
+            payments.add((price, mrng.choice(MODES), stamp, member_id, package_id))
+            # Most members renew on time; some lapse for a while first
+            gap = 0 if mrng.random() < 0.8 else mrng.randint(7, 120)
+            paid_on += timedelta(weeks=weeks, days=gap)
+
+        day = join_date
+        while day <= end:
+            if mrng.random() < visit_probability:
+                check_in, check_out = visit_time(mrng)
+                attendance.add((member_id, day, check_in, check_out))
+            day += timedelta(days=1)
+
+        if n % 1000 == 0:
+            print(f'  {n}/{len(member_rows)} members, {attendance.total + len(attendance.rows)} visits, '
+                  f'{payments.total + len(payments.rows)} payments ({time.time() - started:.0f}s)')
+    for writer in (enrolments, payments, attendance):
+        writer.flush()
+
+    print('Rebuilding MembershipStatus...')
+    with conn.cursor() as cur:
+        cur.execute('CALL sp_rebuild_membership_status()')
+        while cur.nextset():
+            pass
+    conn.commit()
+    conn.close()
+    print(f'Done in {time.time() - started:.0f}s: {trainers.total} trainers, {plans.total} plans, '
+          f'{members.total} members, {enrolments.total} enrolments, {payments.total} payments, '
+          f'{attendance.total} attendance rows')
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--members', type=int, default=1000)
+    parser.add_argument('--trainers', type=int, default=20)
+    parser.add_argument('--plans', type=int, default=50)
+    parser.add_argument('--years', type=float, default=1.0, help='history length for attendance and payments')
+    parser.add_argument('--visits-per-week', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per multi-row INSERT / commit')
+    parser.add_argument('--reset', action='store_true', help='delete rows from earlier bench runs first')
+    generate(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
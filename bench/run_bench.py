@@ -0,0 +1,206 @@
+"""Latency/throughput driver for the key routes and procedures.
+
+Exercises the app in-process through the Flask test client (no HTTP server
+needed) against whatever database the DB_* settings point at, usually one
+filled by ``bench/generate_data.py``:
+
+    python bench/run_bench.py --requests 200 --concurrency 4
+    python bench/run_bench.py --save-baseline bench/baseline.json
+    python bench/run_bench.py --compare bench/baseline.json --tolerance 0.25
+
+``--compare`` exits non-zero when any scenario's p95 regresses by more than
+``--tolerance`` (a fraction) against the saved baseline.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as gym  # noqa: E402
+
+app = gym.create_app()
+
+
+def scenarios(args):
+    """(name, kind, role, user_id, target) — kind is 'route' (URL) or 'proc' (SQL)."""
+    return [
+        ('members_list', 'route', 'admin', 1, '/members'),
+        ('members_list_page', 'route', 'admin', 1, f'/members?after={gym.encode_cursor([args.member_id])}'),
+        ('attendance_view_admin', 'route', 'admin', 1, '/attendance/view'),
+        ('attendance_view_trainer', 'route', 'trainer', args.trainer_id, '/attendance/view'),
+        ('attendance_view_member', 'route', 'member', args.member_id, '/attendance/view'),
+        ('membership_active_status', 'route', 'admin', 1, '/membership/active_status'),
+        ('trainer_members', 'route', 'trainer', args.trainer_id, '/trainer/members'),
+        ('member_my_trainer', 'route', 'member', args.member_id, '/member/my-trainer'),
+        ('make_payment_form', 'route', 'admin', 1, '/actions/make_payment'),
+        ('sp_get_active_status_all', 'proc', None, None, 'CALL sp_get_active_status_all()'),
+    ]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def make_call(kind, role, user_id, target):
+    """Return a zero-argument callable performing one request; truthy result means success."""
+    if kind == 'proc':
+        def call():
+            with app.app_context():
+                rows = gym.execute_query(target, silent=True)
+            return rows is not None
+        return call
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['role'] = role
+        sess['user_id'] = user_id
+        sess['user_name'] = f'bench-{role}'
+
+    def call():
+        response = client.get(target)
+        response.close()
+        return response.status_code == 200
+    return call
+
+
+def run_scenario(name, kind, role, user_id, target, args):
+    if kind == 'proc':
+        # Measure the procedure itself, not the reference-data cache
+        gym.query_cache.clear()
+    for _ in range(args.warmup):
+        make_call(kind, role, user_id, target)()
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [args.requests]
+
+    def worker():
+        call = make_call(kind, role, user_id, target)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            ok = call()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    db_errors_before = gym.DB_QUERY_ERRORS.total()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    # Most pages silence query failures and still answer 200, so count them separately
+    db_errors = gym.DB_QUERY_ERRORS.total() - db_errors_before
+
+    latencies.sort()
+    return {
+        'target': target,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'db_errors': db_errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def dataset_size():
+    counts = {}
+    with app.app_context():
+        for table in ('Member', 'Trainer', 'WorkOutPlan', 'Attendance', 'Payment'):
+            rows = gym.execute_query(f'SELECT COUNT(*) AS n FROM {table}', silent=True)
+            counts[table] = rows[0]['n'] if rows else None
+    return counts
+
+
+def compare(results, baseline, tolerance):
+    """Print per-scenario deltas against ``baseline``; return the names that regressed."""
+    regressed = []
+    print(f'\n{"scenario":<28}{"base p95":>10}{"now p95":>10}{"delta":>9}')
+    for name, now in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            print(f'{name:<28}{"-":>10}{now["p95_ms"]:>10.2f}{"new":>9}')
+            continue
+        delta = (now['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0.0
+        flag = '  REGRESSION' if delta > tolerance else ''
+        print(f'{name:<28}{base["p95_ms"]:>10.2f}{now["p95_ms"]:>10.2f}{delta:>+8.0%}{flag}')
+        if delta > tolerance:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads per scenario')
+    parser.add_argument('--trainer-id', type=int, default=1)
+    parser.add_argument('--member-id', type=int, default=1)
+    parser.add_argument('--only', action='append', help='run only the named scenario (repeatable)')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write results JSON as the new baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.20, help='allowed p95 slowdown before failing')
+    args = parser.parse_args()
+
+    results = {}
+    print(f'{"scenario":<28}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}{"errors":>8}{"db_err":>8}')
+    for name, kind, role, user_id, target in scenarios(args):
+        if args.only and name not in args.only:
+            continue
+        stats = run_scenario(name, kind, role, user_id, target, args)
+        results[name] = stats
+        print(f'{name:<28}{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}'
+              f'{stats["throughput_rps"]:>9.1f}{stats["errors"]:>8}{stats["db_errors"]:>8}')
+
+    report = {
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'pool_size': gym.db_pool.max_size,
+        'dataset': dataset_size(),
+        'scenarios': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as fh:
+                json.dump(report, fh, indent=2)
+            print(f'\nWrote {path}')
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if baseline.get('dataset') != report['dataset']:
+            print(f'\nWarning: dataset differs from baseline ({baseline.get("dataset")} vs {report["dataset"]})')
+        regressed = compare(results, baseline, args.tolerance)
+        if regressed:
+            print(f'\n{len(regressed)} scenario(s) regressed beyond {args.tolerance:.0%}: {", ".join(regressed)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one dependency (here: the MySQL primary).
+
+    Closed, calls go through. ``failure_threshold`` failures in a row open it:
+    ``before_call`` then raises ``CircuitOpenError`` at once instead of letting
+    callers wait on timeouts. After ``reset_timeout`` seconds it is half-open
+    and lets up to ``half_open_max`` trial calls through; a success closes it,
+    a failure opens it for another ``reset_timeout``. Every call admitted by
+    ``before_call`` must report back with ``record_success``, ``record_failure``
+    or ``release``, passing the trial flag ``before_call`` returned. State is
+    per process; there is no background thread.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=15.0, half_open_max=1):
+        if failure_threshold < 1:
+            raise ValueError('failure_threshold must be at least 1')
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def available(self):
+        """Whether a call would be admitted right now; does not take a trial slot"""
+        with self._lock:
+            state = self._current_state()
+            return state == self.CLOSED or (state == self.HALF_OPEN and self._trials < self.half_open_max)
+
+    def retry_after(self):
+        """Seconds until the next trial call is allowed (0 when closed)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Admit a call (returns True for a half-open trial) or raise ``CircuitOpenError``"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and self._trials < self.half_open_max:
+                self._trials += 1
+                return True
+            self.rejected += 1
+            retry_after = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpenError(
+            f'{self.name.capitalize()} unavailable (circuit open after repeated failures); retrying in {retry_after:.0f}s',
+            retry_after,
+        )
+
+    def record_success(self, trial=False):
+        with self._lock:
+            if trial:
+                self._trials -= 1
+            # Any answer proves the dependency is reachable again, trial or not
+            self._failures = 0
+            self._state = self.CLOSED
+            self._opened_at = None
+
+    def record_failure(self, trial=False, error=None):
+        with self._lock:
+            if trial:
+                self._trials -= 1
+            self._failures += 1
+            self.last_error = str(error) if error is not None else self.last_error
+            if trial or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._open()
+
+    def release(self, trial=False):
+        """Give back a trial slot without a verdict (the call never reached the dependency)"""
+        if trial:
+            with self._lock:
+                self._trials -= 1
+
+    def reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state()
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_after_seconds': (
+                    0.0 if state == self.CLOSED else max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+                ),
+                'trials_in_flight': self._trials,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+            }
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    def _open(self):
+        if self._state != self.OPEN:
+            self.times_opened += 1
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
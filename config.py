@@ -0,0 +1,156 @@
+import os
+
+from dotenv import load_dotenv
+
+# Config classes read the environment when this module is imported
+load_dotenv()
+
+
+class Config:
+    """Settings shared by every environment; values come from the environment (.env)."""
+
+    SECRET_KEY = os.getenv('FLASK_SECRET', 'dev-secret')
+    DEBUG = False
+    TESTING = False
+
+    # Primary database (DB_ENABLED = False builds the app without ever connecting)
+    DB_ENABLED = True
+    DB_HOST = os.getenv('DB_HOST', 'localhost')
+    DB_USER = os.getenv('DB_USER', 'root')
+    DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+    DB_NAME = os.getenv('DB_NAME', 'GymMemberShip_WorkOutTracker')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+    DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))
+    # Socket timeouts in seconds (read/write 0 = wait forever); keep DB_READ_TIMEOUT above the
+    # slowest legitimate statement, e.g. console SELECTs stop at CONSOLE_MAX_EXECUTION_MS
+    DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', 5))
+    DB_READ_TIMEOUT = float(os.getenv('DB_READ_TIMEOUT', 60))
+    DB_WRITE_TIMEOUT = float(os.getenv('DB_WRITE_TIMEOUT', 60))
+
+    # Circuit breaker around the primary: open after this many outage errors in a row,
+    # allow trial calls again after DB_BREAKER_RESET_SECONDS
+    DB_BREAKER_FAILURES = int(os.getenv('DB_BREAKER_FAILURES', 5))
+    DB_BREAKER_RESET_SECONDS = float(os.getenv('DB_BREAKER_RESET_SECONDS', 15))
+    DB_BREAKER_HALF_OPEN_TRIALS = int(os.getenv('DB_BREAKER_HALF_OPEN_TRIALS', 1))
+
+    # Read replicas; user/password/schema fall back to the primary's
+    DB_REPLICA_HOSTS = [h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+    DB_REPLICA_USER = os.getenv('DB_REPLICA_USER') or DB_USER
+    DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD') or DB_PASSWORD
+    DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME') or DB_NAME
+    DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE') or DB_POOL_SIZE)
+    DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', 2))
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+    REPLICA_ACQUIRE_TIMEOUT = float(os.getenv('REPLICA_ACQUIRE_TIMEOUT', 1))
+    # Reads stay on the primary for this long after the session's last write
+    READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+    # Instrumentation: statements slower than this are logged; /metrics also takes Bearer METRICS_TOKEN
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 500))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # Login: werkzeug hash method for new passwords (existing hashes are upgraded on login)
+    # and the email -> identity cache (unknown emails are kept IDENTITY_NEGATIVE_TTL)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 1024))
+    IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 60))
+    IDENTITY_NEGATIVE_TTL = float(os.getenv('IDENTITY_NEGATIVE_TTL', 10))
+
+    # Reference-data cache; entries up to QUERY_CACHE_MAX_STALE old are served while MySQL is down
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 256))
+    QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', 300))
+    QUERY_CACHE_MAX_STALE = float(os.getenv('QUERY_CACHE_MAX_STALE', 3600))
+    # Threads running a page's independent queries concurrently
+    QUERY_GATHER_WORKERS = int(os.getenv('QUERY_GATHER_WORKERS', 8))
+
+    # List pages and member search
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 200))
+    MEMBER_SEARCH_LIMIT = int(os.getenv('MEMBER_SEARCH_LIMIT', 10))
+
+    # Largest batch accepted by the attendance and workout batch endpoints
+    ATTENDANCE_BATCH_MAX = int(os.getenv('ATTENDANCE_BATCH_MAX', 1000))
+    WORKOUT_BATCH_MAX = int(os.getenv('WORKOUT_BATCH_MAX', 2000))
+    WORKOUT_PROGRESS_WEEKS = int(os.getenv('WORKOUT_PROGRESS_WEEKS', 12))
+
+    # Live occupancy: index re-sync interval, page polling, and live streams (each holds a
+    # server thread, so they are capped per process)
+    OCCUPANCY_SYNC_SECONDS = float(os.getenv('OCCUPANCY_SYNC_SECONDS', 30))
+    OCCUPANCY_POLL_SECONDS = int(os.getenv('OCCUPANCY_POLL_SECONDS', 5))
+    OCCUPANCY_STREAM_SECONDS = float(os.getenv('OCCUPANCY_STREAM_SECONDS', 300))
+    OCCUPANCY_STREAM_HEARTBEAT = float(os.getenv('OCCUPANCY_STREAM_HEARTBEAT', 15))
+    OCCUPANCY_MAX_STREAMS = int(os.getenv('OCCUPANCY_MAX_STREAMS', 2))
+
+    # Nightly membership expiry report
+    EXPIRY_HORIZON_DAYS = int(os.getenv('EXPIRY_HORIZON_DAYS', 14))
+    EXPIRY_LAPSED_DAYS = int(os.getenv('EXPIRY_LAPSED_DAYS', 30))
+    EXPIRY_RUN_AT = os.getenv('EXPIRY_RUN_AT', '02:00')
+
+    # Streaming exports, the JSON API's response compression and the admin SQL console
+    EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 500))
+    API_GZIP_MIN_BYTES = int(os.getenv('API_GZIP_MIN_BYTES', 1024))
+    API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', 5))
+    CONSOLE_ROW_LIMIT = int(os.getenv('CONSOLE_ROW_LIMIT', 500))
+    CONSOLE_MAX_EXECUTION_MS = int(os.getenv('CONSOLE_MAX_EXECUTION_MS', 30000))
+
+    # Bulk CSV import
+    IMPORT_DIR = os.getenv('IMPORT_DIR', 'imports')
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+    IMPORT_HASH_WORKERS = int(os.getenv('IMPORT_HASH_WORKERS', 4))
+
+    # Payment_Audit archival
+    AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', 'archive')
+    AUDIT_HOT_MONTHS = int(os.getenv('AUDIT_HOT_MONTHS', 12))
+    AUDIT_PARTITIONS_AHEAD = int(os.getenv('AUDIT_PARTITIONS_AHEAD', 3))
+    AUDIT_RESTORE_BATCH = int(os.getenv('AUDIT_RESTORE_BATCH', 1000))
+
+    # Seconds an ALTER may wait for its metadata lock before giving up (queries queue behind it meanwhile)
+    MIGRATE_LOCK_WAIT_SECONDS = int(os.getenv('MIGRATE_LOCK_WAIT_SECONDS', 10))
+
+    # Start-up warm-up: templates are compiled in create_app (before the fork when the
+    # server preloads), connections, cached reference data and today's occupancy per
+    # worker in warm_worker
+    WARM_TEMPLATES = False
+    WARM_POOL_CONNECTIONS = 0
+    WARM_CACHE = False
+    WARM_OCCUPANCY = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    WARM_TEMPLATES = True
+    WARM_POOL_CONNECTIONS = int(os.getenv('WARM_POOL_CONNECTIONS', 2))
+    WARM_CACHE = os.getenv('WARM_CACHE', '1') != '0'
+    WARM_OCCUPANCY = os.getenv('WARM_OCCUPANCY', '1') != '0'
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test'
+    DB_ENABLED = False
+    DB_REPLICA_HOSTS = []
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def get_config(config=None):
+    """Config class for a name or class (default: $APP_CONFIG, else development)"""
+    if config is None:
+        config = os.getenv('APP_CONFIG') or 'development'
+    if isinstance(config, str):
+        try:
+            return CONFIGS[config]
+        except KeyError:
+            raise ValueError(f'Unknown APP_CONFIG {config!r}; expected one of {", ".join(CONFIGS)}') from None
+    return config
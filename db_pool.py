@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PyMySQL connections.
+
+    Connections are opened lazily by ``connect_fn`` up to ``max_size``.
+    Idle connections are pinged before reuse once they have been idle for
+    ``ping_interval`` seconds, and are recycled after ``max_lifetime`` seconds
+    so MySQL's ``wait_timeout`` never bites a checked-out connection.
+    """
+
+    def __init__(self, connect_fn, max_size=10, timeout=10.0, max_lifetime=1800.0, ping_interval=30.0):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self._connect_fn = connect_fn
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._owners = {}
+        self._open = 0
+        # Connections opened at or before this time are closed instead of reused (close_all)
+        self._retired_before = float('-inf')
+        self._cond = threading.Condition()
+
+    # ---------- checkout / checkin ----------
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, opening one if the pool has room."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f'No database connection available within {timeout}s (pool size {self.max_size})')
+                    self._cond.wait(remaining)
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    entry = None
+                    self._open += 1
+
+            if entry is None:
+                try:
+                    entry = _PooledConnection(self._connect_fn())
+                except Exception:
+                    self._forget()
+                    raise
+            elif not self._is_usable(entry):
+                self._close(entry)
+                continue
+
+            with self._cond:
+                self._owners[id(entry.conn)] = entry
+            return entry.conn
+
+    def release(self, conn, discard=False):
+        """Return ``conn`` to the pool; broken, expired or discarded connections are closed."""
+        with self._cond:
+            entry = self._owners.pop(id(conn), None)
+        if entry is None:
+            return
+        if not discard:
+            try:
+                # End any open read snapshot so the next request sees fresh data
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._expired(entry):
+            self._close(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection and retire checked-out ones, which release() then closes."""
+        with self._cond:
+            self._retired_before = time.monotonic()
+            idle, self._idle = list(self._idle), deque()
+        for entry in idle:
+            self._close(entry)
+
+    def reset_after_fork(self):
+        """Forget every connection inherited from the parent process, without closing them.
+
+        Closing would send COM_QUIT over sockets the parent still uses; the child
+        opens its own connections on demand instead.
+        """
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._owners = {}
+        self._open = 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': len(self._owners),
+            }
+
+    # ---------- internals ----------
+    def _expired(self, entry):
+        if entry.created_at <= self._retired_before:
+            return True
+        return self.max_lifetime > 0 and time.monotonic() - entry.created_at >= self.max_lifetime
+
+    def _is_usable(self, entry):
+        if self._expired(entry):
+            return False
+        if time.monotonic() - entry.last_used < self.ping_interval:
+            return True
+        try:
+            entry.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
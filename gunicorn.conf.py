@@ -0,0 +1,34 @@
+"""Gunicorn settings, read automatically from the working directory:
+
+    gunicorn wsgi:app
+
+The app is imported and built once in the master (``preload_app``), so workers fork
+with the code and compiled templates already in memory. Each worker then opens its own
+connections and primes its cache in ``post_worker_init`` before taking requests.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 3000)}"
+# One process per core; threads cover requests waiting on MySQL
+workers = int(os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count())
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then (jittered so they do not all restart at once)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    from app import warm_worker
+
+    timings = warm_worker(worker.wsgi)
+    worker.log.info(
+        'Worker %s warm in %.0f ms (%s)', worker.pid, timings['warm_worker'] * 1000,
+        ', '.join(f'{phase} {seconds * 1000:.0f} ms' for phase, seconds in timings.items()),
+    )
@@ -0,0 +1,176 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+
+
+class ImportJobError(Exception):
+    """An import cannot start or continue (changed file, already running, bad header)."""
+
+
+def _now():
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def _fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImportJob:
+    """Streams one CSV file through ``validate`` and ``write`` in chunks, resumably.
+
+    ``validate(chunk)`` gets ``[(row_number, raw_row), ...]`` (row 1 is the first line
+    after the header) and returns ``(accepted, rejected)``: ``[(row_number, record)]``
+    and ``[(row_number, status, error)]``. ``write(accepted)`` stores the records in
+    bounded transactions and returns ``(row_number, status, error)`` for every record
+    it did not import. After each chunk the progress is saved to
+    ``<source>.state.json`` and the rows not imported are appended, with their row
+    number, status and reason, to ``<source>.rejects.csv``. Running the job again
+    resumes after the last saved chunk: counters come from that save, and reject lines
+    written after it are cut off the file before the chunk is replayed. A chunk that
+    committed just before the process died is validated again, so ``validate`` must
+    report rows that already exist as duplicates rather than import them twice.
+    """
+
+    # A 'running' state not updated for this long belongs to a process that died
+    STALE_SECONDS = 300
+
+    def __init__(self, source, kind, validate, write, chunk_size=500, on_progress=None):
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+        self.source = source
+        self.kind = kind
+        self.validate = validate
+        self.write = write
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.state_path = source + '.state.json'
+        self.rejects_path = source + '.rejects.csv'
+
+    def load_state(self):
+        """The saved progress, or None before the first run"""
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def reset(self):
+        """Forget saved progress and rejects so the next run starts at row 1"""
+        for path in (self.state_path, self.rejects_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self):
+        """Import from where the last run stopped; returns the final state"""
+        fingerprint = _fingerprint(self.source)
+        state = self.load_state()
+        if state is not None:
+            if state['kind'] != self.kind:
+                raise ImportJobError(f"{self.source} was started as a {state['kind']} import")
+            if state['fingerprint'] != fingerprint:
+                raise ImportJobError(f'{self.source} changed since its import started; restart it from row 1')
+            if state['status'] == 'done':
+                return state
+            if state['status'] == 'running' and time.time() - state['updated_ts'] < self.STALE_SECONDS:
+                raise ImportJobError(f'{self.source} is already being imported')
+        else:
+            state = {
+                'kind': self.kind,
+                'source': os.path.basename(self.source),
+                'fingerprint': fingerprint,
+                'rows_total': self._count_rows(),
+                'rows_done': 0,
+                'imported': 0,
+                'duplicate': 0,
+                'rejected': 0,
+                # Size of the reject file at the last save
+                'rejects_bytes': 0,
+                'started_at': _now(),
+                'finished_at': None,
+            }
+        self._trim_rejects(state.get('rejects_bytes', 0))
+        state.update(status='running', error=None)
+        self._save(state)
+        try:
+            with open(self.source, newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                if not reader.fieldnames:
+                    raise ImportJobError(f'{self.source} has no header row')
+                number = state['rows_done']
+                # Rows before the checkpoint were committed by an earlier run
+                for _ in islice(reader, number):
+                    pass
+                while True:
+                    chunk = [(number + offset, raw) for offset, raw in enumerate(islice(reader, self.chunk_size), 1)]
+                    if not chunk:
+                        break
+                    self._import_chunk(chunk, reader.fieldnames, state)
+                    number = chunk[-1][0]
+                    state['rows_done'] = number
+                    self._save(state)
+                    if self.on_progress:
+                        self.on_progress(state)
+        except BaseException as e:
+            # Progress up to the last saved chunk stands; the next run continues from there
+            state.update(status='failed', error=str(e) or type(e).__name__)
+            self._save(state)
+            raise
+        state.update(status='done', finished_at=_now())
+        self._save(state)
+        return state
+
+    def _import_chunk(self, chunk, fieldnames, state):
+        # state only changes once the chunk is fully handled, so a failure part-way
+        # leaves the counters matching the last save
+        accepted, failed = self.validate(chunk)
+        failed = list(failed)
+        imported = 0
+        if accepted:
+            not_written = list(self.write(accepted))
+            imported = len(accepted) - len(not_written)
+            failed.extend(not_written)
+        rejects_bytes = state.get('rejects_bytes', 0)
+        if failed:
+            raw_rows = dict(chunk)
+            with open(self.rejects_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if not f.tell():
+                    writer.writerow(['row', 'status', 'error'] + list(fieldnames))
+                for number, status, error in sorted(failed):
+                    raw = raw_rows[number]
+                    writer.writerow([number, status, error] + [raw.get(name) for name in fieldnames])
+                rejects_bytes = f.tell()
+        duplicate = sum(1 for _, status, _ in failed if status == 'duplicate')
+        state['imported'] += imported
+        state['duplicate'] += duplicate
+        state['rejected'] += len(failed) - duplicate
+        state['rejects_bytes'] = rejects_bytes
+
+    def _trim_rejects(self, size):
+        """Drop reject lines written after the last save (their chunk is about to be replayed)"""
+        try:
+            with open(self.rejects_path, 'r+b') as f:
+                if f.seek(0, os.SEEK_END) > size:
+                    f.truncate(size)
+        except FileNotFoundError:
+            pass
+
+    def _count_rows(self):
+        with open(self.source, newline='', encoding='utf-8-sig') as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+    def _save(self, state):
+        state['updated_at'] = _now()
+        state['updated_ts'] = time.time()
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.state_path)
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import re
+import time
+from contextlib import contextmanager
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+LOCK_NAME = 'gym_schema_migrations'
+
+_FILE_RE = re.compile(r'^(\d{4})_(\w+)\.(up|down)\.sql$')
+_DELIMITER_RE = re.compile(r'[ \t]*DELIMITER[ \t]+(\S+)[ \t]*(?:\r?\n|$)', re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    """A migration could not be discovered, applied or rolled back."""
+
+
+def split_statements(sql):
+    """Statements of a mysql-client style script: honours DELIMITER lines, quotes and comments"""
+    statements = []
+    buf = []
+    delimiter = ';'
+    quote = None
+    line_start = True
+    i, n = 0, len(sql)
+
+    def flush():
+        statement = ''.join(buf).strip()
+        if statement:
+            statements.append(statement)
+        buf.clear()
+
+    while i < n:
+        if quote is None and line_start:
+            match = _DELIMITER_RE.match(sql, i)
+            if match:
+                flush()
+                delimiter = match.group(1)
+                i = match.end()
+                continue
+        ch = sql[i]
+        line_start = ch == '\n'
+        if quote is not None:
+            buf.append(ch)
+            if ch == '\\' and quote != '`' and i + 1 < n:
+                buf.append(sql[i + 1])
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            i += 1
+            continue
+        if ch in '\'"`':
+            quote = ch
+        elif ch == '#' or (sql.startswith('--', i) and (i + 2 == n or sql[i + 2].isspace())):
+            # Line comment: keep the newline so line_start stays right
+            end = sql.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif sql.startswith(delimiter, i):
+            flush()
+            i += len(delimiter)
+            continue
+        buf.append(ch)
+        i += 1
+    flush()
+    return statements
+
+
+class Migration:
+    """One versioned schema change: ``NNNN_name.up.sql`` and its ``NNNN_name.down.sql``."""
+
+    def __init__(self, version, name, up_path, down_path):
+        self.version = version
+        self.name = name
+        self.up_path = up_path
+        self.down_path = down_path
+
+    @property
+    def checksum(self):
+        """SHA-256 of the up script; a mismatch means it was edited after being applied"""
+        with open(self.up_path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def statements(self, direction):
+        with open(self.up_path if direction == 'up' else self.down_path, encoding='utf-8') as f:
+            return split_statements(f.read())
+
+    def __repr__(self):
+        return f'{self.version:04d}_{self.name}'
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migrations in ``directory`` ordered by version; every version needs both scripts"""
+    found = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILE_RE.match(filename)
+        if not match:
+            continue
+        version, name, direction = int(match.group(1)), match.group(2), match.group(3)
+        entry = found.setdefault(version, {'name': name})
+        if entry['name'] != name:
+            raise MigrationError(f'Version {version:04d} is used by both {entry["name"]} and {name}')
+        entry[direction] = os.path.join(directory, filename)
+    migrations = []
+    for version, entry in sorted(found.items()):
+        missing = [d for d in ('up', 'down') if d not in entry]
+        if missing:
+            raise MigrationError(f'{version:04d}_{entry["name"]} has no {missing[0]} script')
+        migrations.append(Migration(version, entry['name'], entry['up'], entry['down']))
+    return migrations
+
+
+class MigrationRunner:
+    """Applies and rolls back the scripts in ``directory`` on one dedicated connection.
+
+    Applied versions are recorded in ``SchemaMigrations`` (created on first use) with
+    the up script's checksum. MySQL commits every DDL statement on its own, so a
+    migration that fails half way is not recorded and is simply run again: scripts
+    must be idempotent (``IF [NOT] EXISTS``, ``CALL sp_migrate_index``). Runs take a
+    ``GET_LOCK`` so two deploys cannot migrate at once, and ``lock_wait_timeout``
+    bounds how long an ALTER waits for its metadata lock behind long transactions
+    (while it waits, new queries on that table queue behind it). ``connect_fn``
+    must return a PyMySQL connection with ``DictCursor``.
+    """
+
+    def __init__(self, connect_fn, directory=MIGRATIONS_DIR, lock_wait_timeout=10, echo=print):
+        self.connect_fn = connect_fn
+        self.directory = directory
+        self.lock_wait_timeout = lock_wait_timeout
+        self.echo = echo
+
+    def status(self):
+        """One row per known or recorded version: state is applied, pending, changed or missing"""
+        migrations = discover(self.directory)
+        with self._session(lock=False) as cur:
+            applied = self._applied(cur)
+        rows = []
+        for migration in migrations:
+            record = applied.pop(migration.version, None)
+            if record is None:
+                state = 'pending'
+            else:
+                state = 'applied' if record['Checksum'] == migration.checksum else 'changed'
+            rows.append({'version': migration.version, 'name': migration.name, 'state': state,
+                         'applied_at': record['AppliedAt'] if record else None})
+        # Recorded but the scripts are gone (e.g. a newer branch migrated this database)
+        for version, record in sorted(applied.items()):
+            rows.append({'version': version, 'name': record['Name'], 'state': 'missing',
+                         'applied_at': record['AppliedAt']})
+        return rows
+
+    def up(self, target=None, dry_run=False):
+        """Apply pending migrations up to ``target`` (default: all) in version order; returns them"""
+        migrations = discover(self.directory)
+        with self._session(lock=not dry_run) as cur:
+            applied = self._applied(cur)
+            for migration in migrations:
+                record = applied.get(migration.version)
+                if record is not None and record['Checksum'] != migration.checksum:
+                    raise MigrationError(f'{migration!r} was edited after it was applied; add a new migration instead')
+            pending = [m for m in migrations
+                       if m.version not in applied and (target is None or m.version <= target)]
+            for migration in pending:
+                if dry_run:
+                    self.echo(f'Would apply {migration!r}')
+                    continue
+                elapsed = self._run(cur, migration, 'up')
+                cur.execute(
+                    'INSERT INTO SchemaMigrations (Version, Name, Checksum, DurationMs) VALUES (%s, %s, %s, %s)',
+                    (migration.version, migration.name, migration.checksum, int(elapsed * 1000)),
+                )
+                self.echo(f'Applied {migration!r} in {elapsed:.1f}s')
+        return pending
+
+    def down(self, target=None, steps=1, dry_run=False):
+        """Roll back every version above ``target``, or the last ``steps`` applied; newest first"""
+        known = {m.version: m for m in discover(self.directory)}
+        with self._session(lock=not dry_run) as cur:
+            applied = sorted(self._applied(cur), reverse=True)
+            versions = [v for v in applied if v > target] if target is not None else applied[:steps]
+            missing = [v for v in versions if v not in known]
+            if missing:
+                raise MigrationError(f'No scripts for applied version {missing[0]:04d}; cannot roll it back')
+            rolled_back = [known[v] for v in versions]
+            for migration in rolled_back:
+                if dry_run:
+                    self.echo(f'Would roll back {migration!r}')
+                    continue
+                elapsed = self._run(cur, migration, 'down')
+                cur.execute('DELETE FROM SchemaMigrations WHERE Version = %s', (migration.version,))
+                self.echo(f'Rolled back {migration!r} in {elapsed:.1f}s')
+        return rolled_back
+
+    @contextmanager
+    def _session(self, lock=True):
+        conn = self.connect_fn()
+        locked = False
+        try:
+            conn.autocommit(True)
+            cur = conn.cursor()
+            cur.execute('SET SESSION lock_wait_timeout = %s', (self.lock_wait_timeout,))
+            cur.execute(
+                'CREATE TABLE IF NOT EXISTS SchemaMigrations ('
+                ' Version INT PRIMARY KEY,'
+                ' Name VARCHAR(200) NOT NULL,'
+                ' Checksum CHAR(64) NOT NULL,'
+                ' AppliedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,'
+                ' DurationMs INT NOT NULL'
+                ') ENGINE=InnoDB'
+            )
+            if lock:
+                cur.execute('SELECT GET_LOCK(%s, 0) AS Acquired', (LOCK_NAME,))
+                if not cur.fetchone()['Acquired']:
+                    raise MigrationError('Another migration run holds the schema migration lock')
+                locked = True
+            yield cur
+        finally:
+            try:
+                if locked:
+                    conn.cursor().execute('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+            finally:
+                conn.close()
+
+    def _applied(self, cur):
+        cur.execute('SELECT Version, Name, Checksum, AppliedAt FROM SchemaMigrations ORDER BY Version')
+        return {row['Version']: row for row in cur.fetchall()}
+
+    def _run(self, cur, migration, direction):
+        started = time.monotonic()
+        for statement in migration.statements(direction):
+            cur.execute(statement)
+            # Drain result sets (CALLs return an OK packet after any SELECTs)
+            while cur.nextset():
+                pass
+        return time.monotonic() - started
@@ -0,0 +1 @@
+DROP PROCEDURE IF EXISTS sp_migrate_index;
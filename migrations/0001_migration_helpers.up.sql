@@ -0,0 +1,27 @@
+-- Helpers for the index migrations that follow (flask --app app migrate).
+-- sp_migrate_index makes p_index on p_table exactly p_columns (a comma-separated column list):
+-- no-op when it already is, otherwise one online ALTER (ALGORITHM=INPLACE, LOCK=NONE) that
+-- adds it, or drops and re-adds it under the same name, so reads and writes continue while
+-- the index builds and a re-run after a failure does no extra work.
+DROP PROCEDURE IF EXISTS sp_migrate_index;
+
+DELIMITER //
+CREATE PROCEDURE sp_migrate_index(IN p_table VARCHAR(64), IN p_index VARCHAR(64), IN p_columns VARCHAR(512))
+BEGIN
+  DECLARE v_current VARCHAR(512);
+
+  SELECT GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX SEPARATOR ',')
+  INTO v_current
+  FROM information_schema.STATISTICS
+  WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = p_table AND INDEX_NAME = p_index;
+
+  IF v_current IS NULL OR v_current <> REPLACE(p_columns, ' ', '') THEN
+    SET @migrate_sql = CONCAT('ALTER TABLE `', p_table, '` ',
+      IF(v_current IS NULL, '', CONCAT('DROP INDEX `', p_index, '`, ')),
+      'ADD INDEX `', p_index, '` (', p_columns, '), ALGORITHM=INPLACE, LOCK=NONE');
+    PREPARE stmt FROM @migrate_sql;
+    EXECUTE stmt;
+    DEALLOCATE PREPARE stmt;
+  END IF;
+END//
+DELIMITER ;
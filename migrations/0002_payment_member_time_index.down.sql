@@ -0,0 +1 @@
+CALL sp_migrate_index('Payment', 'ix_payment_member', 'MemberId');
@@ -0,0 +1,6 @@
+-- fn_membership_end_date and sp_refresh_membership_status (run by every payment trigger) read a
+-- member's latest payment: WHERE MemberId = ? ORDER BY TimeStamp DESC, PaymentId DESC LIMIT 1.
+-- (MemberId, TimeStamp) plus the implicit PaymentId primary key serves that as a backward
+-- index scan that stops at the first row instead of sorting all of the member's payments.
+-- Still leads with MemberId, so it keeps backing fk_payment_member.
+CALL sp_migrate_index('Payment', 'ix_payment_member', 'MemberId, TimeStamp');
@@ -0,0 +1 @@
+CALL sp_migrate_index('Attendance', 'ix_attendance_recent', 'Date, CheckInTime, MemberId');
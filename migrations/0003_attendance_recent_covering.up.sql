@@ -0,0 +1,5 @@
+-- Attendance pages (sp_get_attendance_all / _for_trainer) walk ix_attendance_recent newest first
+-- and sp_occupancy_day reads one Date range of it. Adding CheckOutTime makes the index covering
+-- for every Attendance column those queries read (MemberId and Date ride along from the primary
+-- key), so no row needs a clustered-index lookup.
+CALL sp_migrate_index('Attendance', 'ix_attendance_recent', 'Date, CheckInTime, MemberId, CheckOutTime');
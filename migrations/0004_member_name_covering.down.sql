@@ -0,0 +1,2 @@
+CALL sp_migrate_index('Member', 'ix_member_trainer', 'TrainerId, Name');
+CALL sp_migrate_index('Member', 'ix_member_name', 'Name');
@@ -0,0 +1,6 @@
+-- Member listings sorted by Name (sp_get_membership_end_dates, sp_get_active_status_all and
+-- their trainer-scoped versions) read MemberId, Name and Email. With Email in the index they
+-- are an in-order index scan instead of a full table scan plus filesort; MemberId comes from
+-- the primary key. Name prefix search keeps using the same leading columns.
+CALL sp_migrate_index('Member', 'ix_member_name', 'Name, Email');
+CALL sp_migrate_index('Member', 'ix_member_trainer', 'TrainerId, Name, Email');
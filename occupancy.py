@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+
+def _day(value):
+    """``date`` for a DATE column value or a 'YYYY-MM-DD' string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _seconds(value):
+    """Seconds since midnight for a TIME column value (timedelta, time or 'HH:MM[:SS]'); None stays None"""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%H:%M:%S' if value.count(':') == 2 else '%H:%M').time()
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _clock(seconds):
+    return None if seconds is None else '%02d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def _entry(row):
+    return (_seconds(row['CheckInTime']), _seconds(row['CheckOutTime']), row['TrainerId'], row['Name'], row['TrainerName'])
+
+
+class OccupancyIndex:
+    """Who is checked in, per day, held in memory so live views never scan Attendance.
+
+    Each loaded day maps MemberId -> ``(check_in, check_out, trainer_id, name,
+    trainer_name)`` with times in seconds since midnight (check_out is None until the
+    member checks out). ``loader(day)`` returns the day's Attendance rows; a day is
+    loaded on first use and reloaded at most every ``sync_interval`` seconds, which is
+    how writes made by other worker processes show up. Writes made by this process
+    are applied at once through ``apply``. Every change bumps ``version`` and wakes
+    ``wait``, which is what the server-sent event stream blocks on.
+    """
+
+    def __init__(self, loader, sync_interval=30.0, max_days=2):
+        self.sync_interval = sync_interval
+        self.max_days = max_days
+        self._loader = loader
+        self._days = OrderedDict()
+        self._cond = threading.Condition()
+        self._sync_lock = threading.Lock()
+        self.version = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.applied = 0
+
+    def rebuild(self, day):
+        """Reload ``day`` from the database now (worker start-up)"""
+        with self._sync_lock:
+            self._load(_day(day))
+
+    def apply(self, rows):
+        """Upsert Attendance rows this process just wrote; days that are not loaded are left to their first load"""
+        now = time.monotonic()
+        today = date.today()
+        with self._cond:
+            changed = False
+            for row in rows:
+                day = _day(row['Date'])
+                state = self._days.get(day)
+                if state is None:
+                    if day != today:
+                        continue
+                    # Not loaded yet: keep the row so a load already in flight cannot miss it
+                    state = self._days[day] = {'entries': {}, 'applied': {}, 'synced_at': None}
+                entry = _entry(row)
+                state['applied'][row['MemberId']] = now
+                if state['entries'].get(row['MemberId']) != entry:
+                    state['entries'][row['MemberId']] = entry
+                    changed = True
+                self.applied += 1
+            if changed:
+                self._bump()
+
+    def tracks(self, day):
+        """Whether writes for ``day`` should be applied (it is loaded, or it is today)"""
+        day = _day(day)
+        with self._cond:
+            return day in self._days or day == date.today()
+
+    def snapshot(self, day, at=None, trainer_id=None):
+        """Headcount for ``day`` at ``at`` seconds since midnight (None = everyone not checked out).
+
+        Counts cover the whole gym; with ``trainer_id`` the member list holds only
+        that trainer's clients. Loads or re-syncs the day first when it is due.
+        """
+        day = _day(day)
+        self._ensure(day)
+        with self._cond:
+            state = self._days.get(day)
+            entries = list(state['entries'].items()) if state else []
+            version = self.version
+        present = []
+        trainers = {}
+        not_checked_out = 0
+        for member_id, (check_in, check_out, member_trainer, name, trainer_name) in entries:
+            if check_out is None:
+                not_checked_out += 1
+            if at is None:
+                if check_out is not None:
+                    continue
+            elif check_in > at or (check_out is not None and check_out <= at):
+                continue
+            counts = trainers.setdefault(member_trainer, {'TrainerId': member_trainer, 'TrainerName': trainer_name, 'Present': 0})
+            counts['Present'] += 1
+            if trainer_id is None or member_trainer == trainer_id:
+                present.append({
+                    'MemberId': member_id,
+                    'Name': name,
+                    'TrainerId': member_trainer,
+                    'TrainerName': trainer_name,
+                    'CheckIn': _clock(check_in),
+                    'CheckOut': _clock(check_out),
+                    'Minutes': (at - check_in) // 60 if at is not None else None,
+                })
+        present.sort(key=lambda m: (m['CheckIn'], m['MemberId']))
+        return {
+            'date': day.isoformat(),
+            'asOf': _clock(at),
+            'version': version,
+            'present': sum(t['Present'] for t in trainers.values()),
+            'notCheckedOut': not_checked_out,
+            'trainers': sorted(trainers.values(), key=lambda t: (-t['Present'], t['TrainerName'] or '')),
+            'members': present,
+        }
+
+    def wait(self, version, timeout):
+        """Block until the index changes from ``version`` or ``timeout`` seconds pass; True on change"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.version != version, timeout)
+
+    def reset_after_fork(self):
+        """Drop everything inherited from the parent; each worker loads its own days"""
+        self._days = OrderedDict()
+        self._cond = threading.Condition()
+        self._sync_lock = threading.Lock()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                'days': len(self._days),
+                'entries': sum(len(state['entries']) for state in self._days.values()),
+                'version': self.version,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'applied': self.applied,
+                'oldest_sync_seconds': max(
+                    (now - state['synced_at'] for state in self._days.values() if state['synced_at'] is not None),
+                    default=0.0,
+                ),
+            }
+
+    def _ensure(self, day):
+        with self._cond:
+            state = self._days.get(day)
+            loaded = state is not None and state['synced_at'] is not None
+            if loaded and time.monotonic() - state['synced_at'] < self.sync_interval:
+                self._days.move_to_end(day)
+                return
+        # One thread re-syncs; the others keep serving the loaded copy instead of queueing on MySQL
+        if not self._sync_lock.acquire(blocking=not loaded):
+            return
+        try:
+            with self._cond:
+                state = self._days.get(day)
+                if state is not None and state['synced_at'] is not None and \
+                        time.monotonic() - state['synced_at'] < self.sync_interval:
+                    return
+            self._load(day)
+        except Exception:
+            if not loaded:
+                raise
+            # Serve the last good copy and retry after another interval
+            with self._cond:
+                self._days[day]['synced_at'] = time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def _load(self, day):
+        started = time.monotonic()
+        try:
+            rows = self._loader(day)
+        except Exception:
+            with self._cond:
+                self.load_errors += 1
+            raise
+        entries = {row['MemberId']: _entry(row) for row in rows}
+        with self._cond:
+            state = self._days.get(day)
+            if state is None:
+                state = self._days[day] = {'entries': {}, 'applied': {}, 'synced_at': None}
+            # Rows applied while the load ran are newer than what it read
+            for member_id, applied_at in state['applied'].items():
+                if applied_at >= started and member_id in state['entries']:
+                    entries[member_id] = state['entries'][member_id]
+            state['applied'] = {m: t for m, t in state['applied'].items() if t >= started}
+            changed = entries != state['entries']
+            state.update(entries=entries, synced_at=time.monotonic())
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+            self.loads += 1
+            if changed:
+                self._bump()
+
+    def _bump(self):
+        self.version += 1
+        self._cond.notify_all()
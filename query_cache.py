@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """In-process TTL + LRU cache for read-only query results.
+
+    Every entry records the tables it was read from so a write to any of
+    those tables can drop exactly the entries that depend on it. The cache
+    is per process: other workers only see a change once their own entry
+    expires, so keep ``ttl`` short enough to bound that staleness. Expired
+    entries stay until they are replaced or evicted, so ``get_stale`` can
+    still answer for up to ``max_stale`` seconds past expiry while the
+    database is unreachable.
+    """
+
+    def __init__(self, max_entries=256, ttl=300.0, max_stale=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    def get(self, key):
+        """Return ``(True, value)`` on a fresh hit, ``(False, None)`` otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def get_stale(self, key):
+        """Like ``get``, but also returns an entry up to ``max_stale`` seconds past its expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] + self.max_stale <= time.monotonic():
+                return False, None
+            self.stale_hits += 1
+            return True, entry[1]
+
+    def __contains__(self, key):
+        """True if ``key`` has a fresh entry; does not count as a lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def set(self, key, value, tables, ttl=None):
+        """Cache ``value`` for ``ttl`` seconds (default: the cache's ``ttl``)"""
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(tables))
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that was read from any of ``tables``."""
+        with self._lock:
+            for table in tables:
+                for key in list(self._by_table.get(table, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'stale_hits': self.stale_hits,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[2]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
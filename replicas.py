@@ -0,0 +1,91 @@
+import itertools
+import threading
+import time
+
+from db_pool import PoolTimeout
+
+
+class ReplicaSet:
+    """Round-robin read replicas, each behind its own ``ConnectionPool``.
+
+    ``acquire()`` hands out a connection from the next healthy replica, or
+    None so the caller falls back to the primary. A replica that fails to
+    connect, or whose ``lag_fn(conn)`` reports more than ``max_lag`` seconds
+    (None = replication stopped), is skipped until ``check_interval`` seconds
+    have passed. Lag is re-probed on checkout at most once per interval, so
+    there is no background thread.
+    """
+
+    def __init__(self, pools, lag_fn, max_lag=5.0, check_interval=5.0, acquire_timeout=1.0, names=None):
+        self.pools = list(pools)
+        self.names = list(names) if names else [str(i) for i in range(len(self.pools))]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.acquire_timeout = acquire_timeout
+        self._lag_fn = lag_fn
+        self._state = [{'healthy': True, 'lag': None, 'checked_at': None, 'error': None} for _ in self.pools]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """``(pool, conn)`` from a healthy replica, or None when none is usable right now"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        count = len(self.pools)
+        start = next(self._next)
+        for i in range(count):
+            index = (start + i) % count
+            pool, state = self.pools[index], self._state[index]
+            now = time.monotonic()
+            due = state['checked_at'] is None or now - state['checked_at'] >= self.check_interval
+            if not state['healthy'] and not due:
+                continue
+            try:
+                conn = pool.acquire(timeout=timeout)
+            except PoolTimeout:
+                # Busy, not broken: let the primary take this read
+                continue
+            except Exception as e:
+                self._mark(index, False, None, str(e))
+                continue
+            if due:
+                try:
+                    lag = self._lag_fn(conn)
+                except Exception as e:
+                    pool.release(conn, discard=True)
+                    self._mark(index, False, None, str(e))
+                    continue
+                if lag is None:
+                    self._mark(index, False, None, 'replication is not running')
+                elif lag > self.max_lag:
+                    self._mark(index, False, lag, f'{lag:.0f}s behind (limit {self.max_lag:.0f}s)')
+                else:
+                    self._mark(index, True, lag, None)
+                if not self._state[index]['healthy']:
+                    pool.release(conn)
+                    continue
+            return pool, conn
+        return None
+
+    def mark_down(self, pool, error):
+        """Skip the replica behind ``pool`` until its next check (e.g. it failed mid-query)"""
+        self._mark(self.pools.index(pool), False, None, str(error))
+
+    def close_all(self):
+        for pool in self.pools:
+            pool.close_all()
+
+    def reset_after_fork(self):
+        for pool in self.pools:
+            pool.reset_after_fork()
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(state, pool=pool.stats())
+                for name, pool, state in zip(self.names, self.pools, self._state)
+            }
+
+    def _mark(self, index, healthy, lag, error):
+        with self._lock:
+            self._state[index].update(healthy=healthy, lag=lag, error=error, checked_at=time.monotonic())
@@ -0,0 +1,34 @@
+"""JSON endpoints answer logged-out and wrong-role clients with a JSON error, never the login page."""
+import pytest
+
+import app as gym
+from config import TestingConfig
+
+API_CALLS = [
+    ('get', '/api/members/search?q=a', 'member'),
+    ('post', '/api/attendance/batch', 'member'),
+    ('get', '/api/occupancy', 'member'),
+    ('get', '/api/analytics/attendance', 'member'),
+    ('post', '/api/workouts/batch', None),
+]
+
+
+@pytest.fixture
+def client():
+    return gym.create_app(TestingConfig).test_client()
+
+
+@pytest.mark.parametrize('method, url, wrong_role', API_CALLS)
+def test_logged_out_gets_401_json(client, method, url, wrong_role):
+    response = getattr(client, method)(url, json=[])
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'Not logged in'}
+
+
+@pytest.mark.parametrize('method, url, wrong_role', [call for call in API_CALLS if call[2]])
+def test_wrong_role_gets_403_json(client, method, url, wrong_role):
+    with client.session_transaction() as session:
+        session['role'] = wrong_role
+    response = getattr(client, method)(url, json=[])
+    assert response.status_code == 403
+    assert response.get_json() == {'error': 'Not authorized'}
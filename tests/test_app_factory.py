@@ -0,0 +1,54 @@
+"""create_app() with the testing config: no MySQL, every setting taken from the app's config."""
+import pytest
+
+import app as gym
+from config import TestingConfig
+
+
+class TunedConfig(TestingConfig):
+    PAGE_SIZE = 7
+    ATTENDANCE_BATCH_MAX = 2
+    QUERY_CACHE_SIZE = 3
+    QUERY_GATHER_WORKERS = 2
+    OCCUPANCY_SYNC_SECONDS = 1.5
+    READ_YOUR_WRITES_SECONDS = 0.5
+
+
+@pytest.fixture
+def app():
+    return gym.create_app(TestingConfig)
+
+
+def test_builds_without_a_database(app):
+    assert app.config['TESTING'] and not app.config['DB_ENABLED']
+    assert gym.replicas is None
+    with app.app_context(), pytest.raises(RuntimeError, match='DB_ENABLED'):
+        gym.db_pool.acquire(timeout=0)
+
+
+def test_login_page_renders(app):
+    response = app.test_client().get('/login')
+    assert response.status_code == 200
+
+
+def test_settings_come_from_the_app_config():
+    app = gym.create_app(TunedConfig)
+    assert app.config['PAGE_SIZE'] == 7
+    assert gym.query_cache.max_entries == 3
+    assert gym._gather_executor._max_workers == 2
+    assert gym.occupancy.sync_interval == 1.5
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['role'] = 'admin'
+    response = client.post('/api/attendance/batch', json=[{}, {}, {}])
+    assert response.status_code == 413
+    assert response.get_json()['error'] == 'Batch too large (max 2 rows)'
+
+
+def test_rebuilding_replaces_the_process_objects():
+    gym.create_app(TunedConfig)
+    cache, executor = gym.query_cache, gym._gather_executor
+    gym.create_app(TestingConfig)
+    assert gym.query_cache is not cache and gym.query_cache.max_entries == TestingConfig.QUERY_CACHE_SIZE
+    assert gym._gather_executor is not executor
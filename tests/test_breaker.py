@@ -0,0 +1,145 @@
+"""CircuitBreaker transitions and trial accounting on a fake clock, and what the app reports to it."""
+import pymysql
+import pytest
+
+import app as gym
+import breaker
+from breaker import CircuitBreaker, CircuitOpenError
+from config import TestingConfig
+from db_pool import PoolTimeout
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, 'monotonic', clock)
+    return clock
+
+
+def tripped(clock, **kwargs):
+    cb = CircuitBreaker('database', failure_threshold=3, reset_timeout=10, **kwargs)
+    for _ in range(3):
+        cb.record_failure(cb.before_call(), error='gone away')
+    return cb
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    cb = CircuitBreaker('database', failure_threshold=3, reset_timeout=10)
+    cb.record_failure(error='gone away')
+    cb.record_failure(error='gone away')
+    cb.record_success()  # a success in between resets the count
+    cb.record_failure(error='gone away')
+    cb.record_failure(error='gone away')
+    assert cb.state == cb.CLOSED and cb.stats()['consecutive_failures'] == 2
+    cb.record_failure(error='gone away')
+    assert cb.state == cb.OPEN and cb.times_opened == 1 and cb.last_error == 'gone away'
+
+
+def test_open_rejects_with_retry_after(clock):
+    cb = tripped(clock)
+    clock.now += 4
+    with pytest.raises(CircuitOpenError) as caught:
+        cb.before_call()
+    assert caught.value.retry_after == 6
+    assert cb.retry_after() == 6 and cb.rejected == 1 and not cb.available()
+
+
+def test_half_open_trial_success_closes(clock):
+    cb = tripped(clock)
+    clock.now += 10
+    assert cb.state == cb.HALF_OPEN and cb.available()
+    assert cb.before_call() is True
+    # The one trial slot is taken: everyone else still fails fast
+    assert not cb.available()
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+    cb.record_success(trial=True)
+    assert cb.state == cb.CLOSED and cb.stats()['trials_in_flight'] == 0
+    assert cb.before_call() is False
+
+
+def test_half_open_trial_failure_reopens_for_another_timeout(clock):
+    cb = tripped(clock)
+    clock.now += 10
+    cb.record_failure(cb.before_call(), error='still down')
+    assert cb.state == cb.OPEN and cb.times_opened == 2
+    assert cb.retry_after() == 10
+    clock.now += 9.9
+    assert cb.state == cb.OPEN
+    clock.now += 0.1
+    assert cb.state == cb.HALF_OPEN
+
+
+def test_trial_slots_and_release(clock):
+    cb = tripped(clock, half_open_max=2)
+    clock.now += 10
+    first, second = cb.before_call(), cb.before_call()
+    assert first and second and cb.stats()['trials_in_flight'] == 2
+    with pytest.raises(CircuitOpenError):
+        cb.before_call()
+    # A trial that never reached the database gives its slot back without a verdict
+    cb.release(first)
+    assert cb.state == cb.HALF_OPEN and cb.stats()['trials_in_flight'] == 1
+    assert cb.before_call() is True
+    cb.release(False)  # a non-trial release changes nothing
+    assert cb.stats()['trials_in_flight'] == 2
+
+
+def test_reset_after_fork_closes(clock):
+    cb = tripped(clock)
+    cb.reset_after_fork()
+    assert cb.state == cb.CLOSED and cb.before_call() is False
+
+
+class ExhaustedPool:
+    max_size = 1
+
+    def acquire(self, timeout=None):
+        raise PoolTimeout('No database connection available within 0s (pool size 1)')
+
+    def release(self, conn, discard=False):
+        pass
+
+
+@pytest.fixture
+def app(clock, monkeypatch):
+    app = gym.create_app(TestingConfig)
+    monkeypatch.setattr(gym, 'db_pool', ExhaustedPool())
+    return app
+
+
+def test_pool_timeout_is_not_a_failure(app):
+    for _ in range(app.config['DB_BREAKER_FAILURES'] * 2):
+        with app.test_request_context('/'):
+            with pytest.raises(PoolTimeout):
+                gym.execute_query('CALL sp_list_packages()')
+            assert gym.db_error_status(PoolTimeout('busy')) == (503, {'Retry-After': '1'})
+    assert gym.db_breaker.state == CircuitBreaker.CLOSED
+    assert gym.db_breaker.stats()['consecutive_failures'] == 0
+
+
+def test_pool_timeout_releases_a_half_open_trial(app, clock):
+    cb = gym.db_breaker
+    for _ in range(cb.failure_threshold):
+        cb.record_failure(error='gone away')
+    clock.now += cb.reset_timeout
+    with app.test_request_context('/'):
+        trial = gym.guard_database()
+        gym.report_database(trial, PoolTimeout('busy'))
+    assert cb.state == cb.HALF_OPEN and cb.stats()['trials_in_flight'] == 0
+
+
+def test_only_outage_errors_count(app):
+    with app.test_request_context('/'):
+        gym.report_database(False, pymysql.err.IntegrityError(1062, 'Duplicate entry'))
+        assert gym.db_breaker.stats()['consecutive_failures'] == 0
+        gym.report_database(False, pymysql.err.OperationalError(2003, "Can't connect to MySQL server"))
+        assert gym.db_breaker.stats()['consecutive_failures'] == 1
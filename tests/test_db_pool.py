@@ -0,0 +1,37 @@
+"""ConnectionPool checkout, release and shutdown with fake connections (no MySQL)."""
+from db_pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_close_all_closes_idle_now_and_checked_out_on_release():
+    pool = ConnectionPool(FakeConnection, max_size=3)
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close_all()
+    assert idle.closed and not busy.closed
+    assert pool.stats() == {'size': 3, 'open': 1, 'idle': 0, 'in_use': 1}
+
+    pool.release(busy)
+    assert busy.closed
+    assert pool.stats()['open'] == 0
+
+
+def test_connections_opened_after_close_all_are_reused():
+    pool = ConnectionPool(FakeConnection, max_size=1)
+    pool.close_all()
+    conn = pool.acquire()
+    pool.release(conn)
+    assert not conn.closed and pool.acquire() is conn
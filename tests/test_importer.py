@@ -0,0 +1,166 @@
+"""ImportJob checkpoints, resume and reject-file bookkeeping (no database: validate/write are fakes)."""
+import csv
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from importer import ImportJob, ImportJobError
+
+
+class Killed(BaseException):
+    """The process dies: nothing after this point runs, not even the failure save."""
+
+
+class FakeTable:
+    """Rows 'stored' by write(); multiples of 3 are invalid, stored rows come back as duplicates."""
+
+    def __init__(self):
+        self.rows = set()
+
+    def validate(self, chunk):
+        accepted, rejected = [], []
+        for number, raw in chunk:
+            value = int(raw['value'])
+            if value % 3 == 0:
+                rejected.append((number, 'invalid', 'multiple of 3'))
+            elif value in self.rows:
+                rejected.append((number, 'duplicate', 'already stored'))
+            else:
+                accepted.append((number, value))
+        return accepted, rejected
+
+    def write(self, accepted):
+        self.rows.update(value for _, value in accepted)
+        return []
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'values.csv'
+    path.write_text('value\n' + ''.join(f'{i}\n' for i in range(1, 11)), encoding='utf-8')
+    return str(path)
+
+
+def job_for(source, table, chunk_size=4):
+    return ImportJob(source, 'values', table.validate, table.write, chunk_size=chunk_size)
+
+
+def kill_at_save(job, after):
+    """Let ``after`` saves through, then die on the next one (before it reaches disk)"""
+    save, calls = job._save, []
+
+    def dying_save(state):
+        if len(calls) == after:
+            raise Killed()
+        calls.append(state['rows_done'])
+        save(state)
+
+    job._save = dying_save
+
+
+def reject_rows(source):
+    with open(source + '.rejects.csv', newline='', encoding='utf-8') as f:
+        return [(int(row['row']), row['status']) for row in csv.DictReader(f)]
+
+
+def test_full_run_counts_and_rejects(source):
+    state = job_for(source, FakeTable()).run()
+    assert state['status'] == 'done'
+    assert (state['rows_done'], state['imported'], state['duplicate'], state['rejected']) == (10, 7, 0, 3)
+    assert reject_rows(source) == [(3, 'invalid'), (6, 'invalid'), (9, 'invalid')]
+
+
+def test_rerun_after_kill_matches_last_save(source):
+    table = FakeTable()
+    job = job_for(source, table)
+    # Saves: start, chunk 1 (rows 1-4); chunk 2 (rows 5-8) commits and writes its rejects, then the process dies
+    kill_at_save(job, after=2)
+    with pytest.raises(Killed):
+        job.run()
+    saved = job.load_state()
+    assert (saved['status'], saved['rows_done'], saved['imported'], saved['rejected']) == ('running', 4, 3, 1)
+    assert reject_rows(source) == [(3, 'invalid'), (6, 'invalid')]  # row 6 was written after the save
+
+    resumed = job_for(source, table)
+    resumed.STALE_SECONDS = 0
+    state = resumed.run()
+    assert state['status'] == 'done' and state['rows_done'] == 10
+    # Rows 5, 7 and 8 were committed before the kill, so the replay reports them as duplicates
+    assert (state['imported'], state['duplicate'], state['rejected']) == (4, 3, 3)
+    assert reject_rows(source) == [(3, 'invalid'), (5, 'duplicate'), (6, 'invalid'),
+                                   (7, 'duplicate'), (8, 'duplicate'), (9, 'invalid')]
+    assert state['rejects_bytes'] == Path(source + '.rejects.csv').stat().st_size
+
+
+def test_failed_chunk_leaves_counters_at_last_save(source):
+    table = FakeTable()
+    write, calls = table.write, []
+
+    def failing_write(accepted):
+        calls.append(accepted)
+        if len(calls) == 2:
+            raise ConnectionError('MySQL went away')
+        return write(accepted)
+
+    job = ImportJob(source, 'values', table.validate, failing_write, chunk_size=4)
+    with pytest.raises(ConnectionError):
+        job.run()
+    state = job.load_state()
+    assert (state['status'], state['error']) == ('failed', 'MySQL went away')
+    assert (state['rows_done'], state['imported'], state['rejected']) == (4, 3, 1)
+    assert state['rejects_bytes'] == Path(source + '.rejects.csv').stat().st_size
+
+    state = job_for(source, table).run()
+    assert (state['imported'], state['duplicate'], state['rejected']) == (7, 0, 3)
+
+
+def test_trim_rejects(source):
+    job = job_for(source, FakeTable())
+    rejects = Path(job.rejects_path)
+    rejects.write_text('row,status\n1,invalid\n2,invalid\n', encoding='utf-8')
+    job._trim_rejects(len('row,status\n1,invalid\n'))
+    assert rejects.read_text(encoding='utf-8') == 'row,status\n1,invalid\n'
+    job._trim_rejects(1000)  # never grows the file
+    assert rejects.read_text(encoding='utf-8') == 'row,status\n1,invalid\n'
+    job.reset()
+    job._trim_rejects(0)  # no file yet is fine
+
+
+def test_running_state_blocks_a_second_run_until_stale(source):
+    table = FakeTable()
+    job = job_for(source, table)
+    kill_at_save(job, after=1)
+    with pytest.raises(Killed):
+        job.run()
+    with pytest.raises(ImportJobError, match='already being imported'):
+        job_for(source, table).run()
+
+    state_file = Path(job.state_path)
+    state = json.loads(state_file.read_text(encoding='utf-8'))
+    state['updated_ts'] = time.time() - ImportJob.STALE_SECONDS
+    state_file.write_text(json.dumps(state), encoding='utf-8')
+    assert job_for(source, table).run()['status'] == 'done'
+
+
+def test_changed_file_is_refused(source):
+    job = job_for(source, FakeTable())
+    kill_at_save(job, after=2)
+    with pytest.raises(Killed):
+        job.run()
+    with open(source, 'a', encoding='utf-8') as f:
+        f.write('11\n')
+    resumed = job_for(source, FakeTable())
+    resumed.STALE_SECONDS = 0
+    with pytest.raises(ImportJobError, match='changed since its import started'):
+        resumed.run()
+
+
+def test_other_kind_is_refused_and_done_is_not_rerun(source):
+    table = FakeTable()
+    first = job_for(source, table).run()
+    with pytest.raises(ImportJobError, match='started as a values import'):
+        ImportJob(source, 'members', table.validate, table.write).run()
+    again = job_for(source, table).run()
+    assert again['finished_at'] == first['finished_at'] and again['imported'] == 7
@@ -0,0 +1,6 @@
+"""Production WSGI entry point: ``gunicorn wsgi:app`` (server settings in gunicorn.conf.py)."""
+import os
+
+from app import create_app
+
+app = create_app(os.getenv('APP_CONFIG') or 'production')